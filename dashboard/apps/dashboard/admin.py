@@ -10,11 +10,12 @@ from django.http import HttpResponse
 from django.utils.decorators import method_decorator
 from django.utils.html import format_html
 
-from dashboard.apps.dashboard.spreadsheets import Export
+from dashboard.apps.dashboard.exports import person_rates_workbook
 from .models import (Person, Rate, Area, Product, Cost, Budget,
                      ProductStatus, ProductGroupStatus, Saving, Link,
                      PersonCost, Department, Skill)
 from .permissions import ReadOnlyPermissions, FinancePermissions
+from .views import start_export_job
 from .filters import (
     IsVisibleFilter, IsCivilServantFilter, IsCurrentStaffFilter, HasRateFilter)
 
@@ -87,13 +88,10 @@ class PersonAdmin(ReadOnlyAdmin, FinancePermissions):
     def export_person_rates_view(self, request, *args, **kwargs):
         if not self.is_finance(request.user):
             raise PermissionDenied
-        today = date.today()
-        export = Export({'date': today, 'title': 'Rate Export'})
-
-        fname = '%s_%s.xlsx' % (
-            'RateData',
-            today.strftime('%Y-%m-%d'))
-        workbook = export.export()
+        params = {'date': date.today().isoformat()}
+        if request.GET.get('background'):
+            return start_export_job(request, 'person_rates', params)
+        workbook, fname = person_rates_workbook(params)
         response = HttpResponse(
             content_type="application/vnd.ms-excel")
         response['Content-Disposition'] = 'attachment; filename=%s' \
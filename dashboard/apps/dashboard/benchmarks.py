@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+timings of the slow parts of the dashboard, see the `benchmark` command
+"""
+from collections import OrderedDict
+from datetime import date
+from io import BytesIO
+import logging
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from .dataset import write_float_tasks
+from .models import Person, Product
+
+logger = logging.getLogger(__name__)
+
+
+def measure(name, func, *args, trace_memory=False, **kwargs):
+    """
+    run a function once and measure it. tracing memory slows down every
+    allocation, so the peak memory is measured in a run of its own.
+    :param name: name of the measurement
+    :param trace_memory: True to measure the peak memory allocated instead
+    of the time taken and the number of queries
+    :return: a dictionary of the name and either the seconds taken and
+    number of queries or the peak memory allocated in KiB
+    """
+    result = OrderedDict([('name', name)])
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result['peak_memory_kib'] = round(peak / 1024, 1)
+        logger.info('%(name)s: %(peak_memory_kib)s KiB', result)
+        return result
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        func(*args, **kwargs)
+        seconds = time.perf_counter() - started
+    result['seconds'] = round(seconds, 4)
+    result['queries'] = len(queries)
+    logger.info('%(name)s: %(seconds)ss, %(queries)s queries', result)
+    return result
+
+
+def _services_json():
+    # imported here as the views pull in the whole of the api
+    from .views import services_json
+    request = RequestFactory().get('/api/services')
+    request.user = User.objects.filter(is_active=True).first()
+    return services_json(request)
+
+
+def _sync_tasks():
+    from .management.commands.sync import sync_tasks
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_float_tasks(data_dir)
+        sync_tasks(settings.FLOAT_TASK_SYNC_STARTING_POINT, date.today(),
+                   data_dir)
+
+
+def _cache_gen(products):
+    from .management.commands.cache import Command
+    for product in products:
+        Command.generate(product)
+
+
+def _products_spreadsheet(products):
+    from .spreadsheets import Products
+    Products(products, settings.PEOPLE_COST_CALCATION_STARTING_POINT).save(
+        BytesIO())
+
+
+def _rates_spreadsheet():
+    from .spreadsheets import Export
+    Export({'date': date.today()}).export().save(BytesIO())
+
+
+def _payroll_upload(start_date, end_date):
+    """
+    match a payroll row for each civil servant and save the upload.
+    the .xls file itself is not read.
+    """
+    from dashboard.apps.reports.forms import PayrollUploadForm
+    form = PayrollUploadForm()
+    form.cleaned_data = {}
+    form.matches = {'staff_number': 0, 'name': 0, 'not_found': 0}
+    form.seconds = 0
+    form.load_people()
+    payroll = []
+    names = Person.objects.filter(
+        is_contractor=False, name__contains=' ').values_list('name', flat=True)
+    for row, name in enumerate(names):
+        init, surname = name.split(' ', 1)
+        matched = form.get_person(row, {
+            'Staff': '', 'Surname': surname.upper(), 'Init': init})
+        if matched:
+            payroll.append({
+                'person': matched, 'rate': 250, 'start': start_date,
+                'end': end_date, 'staff_number': 900000 + row,
+                'additional': {'ERNIC': 300, 'ASLC': 100}})
+    form.cleaned_data = {'payroll_file': payroll}
+    form.save()
+
+
+def run_benchmarks(sample_size=5, trace_memory=False):
+    """
+    measure the slow parts of the dashboard against the data in the
+    database. the cache should be empty, see the `benchmark` command.
+    :param sample_size: number of products to profile and cache
+    :param trace_memory: True to measure the peak memory instead of the
+    time, see `measure`
+    :return: a list of measurements, see `measure`
+    """
+    products = list(Product.objects.visible().select_related('area'))
+    sample = products[:sample_size]
+    today = date.today()
+    month_start = today.replace(day=1)
+    benchmarks = [
+        ('profile', lambda: [
+            product.profile(
+                calculation_start_date=settings.PEOPLE_COST_CALCATION_STARTING_POINT,
+                ignore_cache=True)
+            for product in sample]),
+        ('services_json', _services_json),
+        ('services_json cached', _services_json),
+        ('cache gen', lambda: _cache_gen(sample)),
+        ('products spreadsheet', lambda: _products_spreadsheet(products)),
+        ('rates spreadsheet', _rates_spreadsheet),
+        ('payroll upload', lambda: _payroll_upload(month_start, today)),
+        # last as it deletes the tasks in the time window, which are not
+        # from float
+        ('sync_tasks', _sync_tasks),
+    ]
+    return [measure(name, func, trace_memory=trace_memory)
+            for name, func in benchmarks]
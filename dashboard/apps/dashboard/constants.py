@@ -25,6 +25,13 @@ STATUS_TYPES = Choices(
     ('PAUSED',  4, 'Paused'),
 )
 
+EXPORT_STATUSES = Choices(
+    ('PENDING',  1, 'Pending'),
+    ('RUNNING',  2, 'Running'),
+    ('DONE',  3, 'Done'),
+    ('FAILED',  4, 'Failed'),
+)
+
 PAYROLL_COSTS = [
     'ASLC',
     'A/L Sacrifice',
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+synthetic data for measuring performance, see the `generate_dataset` and
+`benchmark` commands
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+import logging
+import os
+import random
+
+from django.db import transaction
+
+from dashboard.libs.date_tools import get_workdays
+from dashboard.libs.rate_converter import RATE_TYPES, last_date_in_month
+from .constants import COST_TYPES
+from .models import (
+    Area, Budget, Cost, Department, Person, PersonCost, Product, Rate, Saving,
+    Task)
+
+logger = logging.getLogger(__name__)
+
+# number of areas, products and people, and years of tasks for each scale.
+# 'large' is about the size of the production data.
+SCALES = {
+    'small': {'areas': 3, 'products': 10, 'people': 30, 'years': 1},
+    'medium': {'areas': 8, 'products': 60, 'people': 200, 'years': 2},
+    'large': {'areas': 15, 'products': 200, 'people': 600, 'years': 3},
+}
+
+# prefix of the float ids of generated objects
+FLOAT_ID_PREFIX = 'generated'
+
+
+def _float_id(kind, idx):
+    return '{}-{}-{}'.format(FLOAT_ID_PREFIX, kind, idx)
+
+
+def _months(start_date, end_date):
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+class DatasetGenerator():
+    """
+    generate areas, products, people, rates, person costs, budgets, costs,
+    savings and tasks with weekly repeats in bulk. the same seed gives the
+    same dataset.
+    """
+
+    def __init__(self, areas, products, people, years, start_date=None,
+                 seed=0):
+        self.counts = {'areas': areas, 'products': products,
+                       'people': people}
+        self.start_date = start_date or date(date.today().year - years, 4, 1)
+        self.end_date = self.start_date.replace(
+            year=self.start_date.year + years) - timedelta(days=1)
+        self.random = random.Random(seed)
+
+    def _money(self, low, high):
+        return Decimal(self.random.randint(low, high))
+
+    def make_areas(self):
+        department = Department.objects.create(
+            float_id=_float_id('department', 0), name='Generated department')
+        Area.objects.bulk_create([
+            Area(name='Area {}'.format(idx), float_id=_float_id('area', idx))
+            for idx in range(self.counts['areas'])
+        ])
+        self.areas = list(Area.objects.filter(
+            float_id__startswith=_float_id('area', '')))
+        return department
+
+    def make_products(self):
+        products = []
+        for idx in range(self.counts['products']):
+            discovery = self.start_date + timedelta(
+                days=self.random.randint(0, 180))
+            alpha = discovery + timedelta(days=self.random.randint(30, 90))
+            beta = alpha + timedelta(days=self.random.randint(60, 180))
+            products.append(Product(
+                name='Product {}'.format(idx),
+                float_id=_float_id('product', idx),
+                area=self.random.choice(self.areas),
+                discovery_date=discovery,
+                alpha_date=alpha,
+                beta_date=beta,
+                live_date=beta + timedelta(days=self.random.randint(60, 180)),
+            ))
+        Product.objects.bulk_create(products)
+        self.products = list(Product.objects.filter(
+            float_id__startswith=_float_id('product', '')))
+
+    def make_people(self, department):
+        people = []
+        for idx in range(self.counts['people']):
+            is_contractor = self.random.random() < 0.3
+            people.append(Person(
+                name='Person{0} Surname{0:05d}'.format(idx),
+                float_id=_float_id('person', idx),
+                is_contractor=is_contractor,
+                job_title=self.random.choice(
+                    ['Developer', 'Designer', 'Product Manager',
+                     'Delivery Manager', 'User Researcher']),
+                staff_number=None if is_contractor else 100000 + idx,
+                department=department,
+            ))
+        Person.objects.bulk_create(people)
+        self.people = list(Person.objects.filter(
+            float_id__startswith=_float_id('person', '')))
+
+    def make_rates(self):
+        rates = []
+        person_costs = []
+        for person in self.people:
+            # a new rate every 6 months
+            for month in list(_months(self.start_date, self.end_date))[::6]:
+                if person.is_contractor:
+                    rates.append(Rate(
+                        person=person, start_date=month,
+                        rate_type=RATE_TYPES.DAY,
+                        rate=self._money(350, 750)))
+                else:
+                    rates.append(Rate(
+                        person=person, start_date=month,
+                        rate_type=RATE_TYPES.YEAR,
+                        rate=self._money(30000, 70000)))
+            if person.is_contractor:
+                continue
+            # monthly payroll costs
+            for month in _months(self.start_date, self.end_date):
+                for name in ['ERNIC', 'ASLC']:
+                    person_costs.append(PersonCost(
+                        person=person, name=name, type=COST_TYPES.MONTHLY,
+                        start_date=month, end_date=last_date_in_month(month),
+                        cost=self._money(200, 600)))
+        Rate.objects.bulk_create(rates)
+        PersonCost.objects.bulk_create(person_costs)
+
+    def make_product_costs(self):
+        budgets, costs, savings = [], [], []
+        for product in self.products:
+            for month in list(_months(self.start_date, self.end_date))[::12]:
+                budgets.append(Budget(
+                    product=product, start_date=month,
+                    budget=self._money(100000, 1000000)))
+            costs.append(Cost(
+                product=product, name='Hosting', type=COST_TYPES.MONTHLY,
+                start_date=product.alpha_date, cost=self._money(100, 2000)))
+            costs.append(Cost(
+                product=product, name='Licences', type=COST_TYPES.ONE_OFF,
+                start_date=product.beta_date, cost=self._money(1000, 10000)))
+            savings.append(Saving(
+                product=product, name='Saving', type=COST_TYPES.ANNUALLY,
+                start_date=product.live_date, cost=self._money(5000, 50000)))
+        Budget.objects.bulk_create(budgets)
+        Cost.objects.bulk_create(costs)
+        Saving.objects.bulk_create(savings)
+
+    def task_data(self, idx, person, product, start_date):
+        """
+        a task in the format of the float api
+        """
+        weeks = self.random.randint(1, 4)
+        end_date = start_date + timedelta(days=7 * weeks - 3)
+        repeat_state = Task.WEEKLY if self.random.random() < 0.2 else 0
+        if repeat_state:
+            end_date = start_date + timedelta(days=self.random.randint(0, 4))
+            repeat_end = start_date + timedelta(weeks=weeks + 2)
+        else:
+            repeat_end = None
+        return {
+            'task_id': _float_id('task', idx),
+            'task_name': 'Task {}'.format(idx),
+            'people_id': person.float_id,
+            'project_id': product.float_id,
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d'),
+            'repeat_state': repeat_state,
+            'repeat_end': repeat_end and repeat_end.strftime('%Y-%m-%d'),
+            'hours_pd': self.random.choice(['2', '4', '7.5']),
+        }
+
+    def make_tasks(self):
+        tasks = []
+        for person in self.people:
+            products = self.random.sample(
+                self.products, min(len(self.products), 3))
+            # a task starting on a monday every month for each product
+            for month in _months(self.start_date, self.end_date):
+                monday = month + timedelta(days=(7 - month.weekday()) % 7)
+                for product in products:
+                    data = self.task_data(len(tasks), person, product, monday)
+                    tasks.append(self.make_task(data, person, product))
+        Task.objects.bulk_create(tasks, batch_size=1000)
+
+    @staticmethod
+    def make_task(data, person, product):
+        """
+        make a task from float data the same way `sync_tasks` does
+        """
+        start_date = date(*map(int, data['start_date'].split('-')))
+        end_date = date(*map(int, data['end_date'].split('-')))
+        return Task(
+            name=data['task_name'],
+            float_id=data['task_id'],
+            person=person,
+            product=product,
+            start_date=start_date,
+            end_date=end_date,
+            repeat_state=data['repeat_state'],
+            repeat_end=data['repeat_end'] and date(
+                *map(int, data['repeat_end'].split('-'))),
+            days=get_workdays(start_date, end_date) *
+            Decimal(data['hours_pd']) / Decimal('8'),
+            raw_data=data,
+        )
+
+    @transaction.atomic
+    def generate(self):
+        """
+        :return: a dictionary of the number of objects generated
+        """
+        department = self.make_areas()
+        self.make_products()
+        self.make_people(department)
+        self.make_rates()
+        self.make_product_costs()
+        self.make_tasks()
+        counts = {
+            model.__name__: model.objects.count()
+            for model in [Area, Product, Person, Rate, PersonCost, Budget,
+                          Cost, Saving, Task]
+        }
+        logger.info('generated %s from %s to %s', counts, self.start_date,
+                    self.end_date)
+        return counts
+
+
+def write_float_tasks(data_dir):
+    """
+    write the tasks in the database in the format of the float api, so that
+    `sync_tasks` can be run against them
+    :param data_dir: directory to write tasks.json in
+    """
+    people = {}
+    tasks = Task.objects.exclude(raw_data=None).values_list(
+        'person__float_id', 'raw_data')
+    for people_id, task in tasks:
+        people.setdefault(people_id, []).append(task)
+    with open(os.path.join(data_dir, 'tasks.json'), 'w') as fw:
+        fw.write(json.dumps({'people': [
+            {'people_id': people_id, 'tasks': tasks}
+            for people_id, tasks in people.items()
+        ]}))
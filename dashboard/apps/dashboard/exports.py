@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+workbooks rendered by export jobs, see `models.export.EXPORTS`
+"""
+from datetime import date, datetime
+
+from django.conf import settings
+
+from dashboard.libs.date_tools import parse_date
+from .models import Product
+from .spreadsheets import Products, Export
+
+
+def products_queryset(show):
+    """
+    :param show: 'visible', 'all' or the id of a product
+    :return: a queryset of products
+    """
+    if show == 'visible':
+        return Product.objects.visible()
+    elif show == 'all':
+        return Product.objects.all()
+    return Product.objects.filter(pk=show)
+
+
+def products_filename(show):
+    return '{}_{}_{}.xlsx'.format(
+        'ProductData', show, datetime.now().strftime('%Y-%m-%d_%H:%M:%S'))
+
+
+def products_workbook(params):
+    show = params.get('show', 'visible')
+    spreadsheet = Products(
+        products_queryset(show).select_related('area'),
+        settings.PEOPLE_COST_CALCATION_STARTING_POINT
+    )
+    return spreadsheet, products_filename(show)
+
+
+def person_rates_filename(on):
+    return '%s_%s.xlsx' % ('RateData', on.strftime('%Y-%m-%d'))
+
+
+def person_rates_workbook(params):
+    on = parse_date(params['date']) if params.get('date') else date.today()
+    export = Export({'date': on, 'title': 'Rate Export'})
+    return export.export(), person_rates_filename(on)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+command for measuring performance
+"""
+from collections import OrderedDict
+from datetime import datetime
+import json
+import logging
+import os
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from dashboard.apps.dashboard.benchmarks import run_benchmarks
+from dashboard.apps.dashboard.dataset import DatasetGenerator, SCALES
+from dashboard.apps.dashboard.models import WorkdayCalendar
+
+logger = logging.getLogger(name='command')
+
+BENCHMARK_DIR = os.path.join(settings.BASE_DIR, '../var/benchmarks')
+
+# an empty cache for each run, which leaves the cache of the site alone
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = ('Time the slow parts of the dashboard with generated data at'
+            ' several scales and write the results as json. the generated'
+            ' data is rolled back after each scale.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', nargs='*', choices=sorted(SCALES), default=['small'])
+        parser.add_argument(
+            '--existing', action='store_true',
+            help='measure the data in the database instead of generating')
+        parser.add_argument('--sample-size', type=int, default=5,
+                            help='number of products to profile and cache')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('-o', '--output', type=str)
+
+    @staticmethod
+    def run(sample_size, generator=None):
+        """
+        run the benchmarks in a transaction, which is rolled back
+        :param generator: a `DatasetGenerator` or None to use existing data
+        :return: a dictionary of the number of objects and the measurements
+        """
+        with override_settings(CACHES=BENCHMARK_CACHES), transaction.atomic():
+            counts = None
+            if generator:
+                counts = generator.generate()
+                WorkdayCalendar.objects.populate(
+                    generator.start_date, generator.end_date)
+            if not User.objects.filter(is_active=True).exists():
+                User.objects.create_user('benchmark')
+            # the time and the memory are measured in separate runs from
+            # the same data and an empty cache, see `measure`
+            runs = []
+            for trace_memory in (False, True):
+                cache.clear()
+                with transaction.atomic():
+                    runs.append(run_benchmarks(
+                        sample_size=sample_size, trace_memory=trace_memory))
+                    transaction.set_rollback(True)
+            transaction.set_rollback(True)
+        results = [OrderedDict(list(timing.items()) + list(memory.items()))
+                   for timing, memory in zip(*runs)]
+        return {'counts': counts, 'results': results}
+
+    def handle(self, *args, **options):
+        started = datetime.now()
+        runs = []
+        if options['existing']:
+            logger.info('- benchmark existing data')
+            run = self.run(options['sample_size'])
+            run['scale'] = 'existing'
+            runs.append(run)
+        else:
+            for scale in options['scales']:
+                logger.info('- benchmark %s scale', scale)
+                generator = DatasetGenerator(
+                    seed=options['seed'], **SCALES[scale])
+                run = self.run(options['sample_size'], generator)
+                run['scale'] = scale
+                runs.append(run)
+
+        output = options['output'] or os.path.join(
+            BENCHMARK_DIR, started.strftime('benchmark-%Y%m%d%H%M%S.json'))
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as fw:
+            fw.write(json.dumps({
+                'started_at': started.isoformat(),
+                'database': connection.vendor,
+                'runs': runs,
+            }, indent=2))
+        logger.info('- results written to %s', output)
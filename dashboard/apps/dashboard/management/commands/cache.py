@@ -11,7 +11,10 @@ from django.core.cache import cache
 from django.conf import settings
 
 from dashboard.apps.dashboard.models import Product
+from dashboard.apps.dashboard.models.unit_of_work import unit_of_work
 from dashboard.libs.date_tools import slice_time_window, financial_year_tuple
+from dashboard.libs.cache_tools import (
+    mark_data_version, CACHE_GENERATION_KEY)
 from .helpers import contains_any
 
 
@@ -76,23 +79,17 @@ class Command(BaseCommand):
     @staticmethod
     def generate_cache_for_time_windows(product, calculation_start_date=None):
         """
-        call both `stats_between` and `current_fte` with
-        flag `ignore_cache=True` for all time windows
+        generate the cache of both `stats_between` and `current_fte`
+        with flag `ignore_cache=True` for all time windows. they are
+        worked out together by `stats_in_windows` and `fte_in_windows`.
         """
         time_windows = get_product_time_windows(product)
-        for start, end in time_windows:
-            if start and end:
-                product.stats_between(
-                    start,
-                    end,
-                    calculation_start_date=calculation_start_date,
-                    ignore_cache=True
-                )
-            product.current_fte(
-                start_date=start,
-                end_date=end,
-                ignore_cache=True
-            )
+        product.stats_in_windows(
+            [(start, end) for start, end in time_windows if start and end],
+            calculation_start_date=calculation_start_date,
+            ignore_cache=True
+        )
+        product.fte_in_windows(time_windows, ignore_cache=True)
 
     @staticmethod
     def generate_cache_for_profile(product, calculation_start_date=None):
@@ -111,12 +108,14 @@ class Command(BaseCommand):
         :param product: product object
         """
         logging.info('- generating caching for product "%s"', product)
-        cls.generate_cache_for_time_windows(
-            product,
-            calculation_start_date=settings.PEOPLE_COST_CALCATION_STARTING_POINT)
-        cls.generate_cache_for_profile(
-            product,
-            calculation_start_date=settings.PEOPLE_COST_CALCATION_STARTING_POINT)
+        with unit_of_work():
+            cls.generate_cache_for_time_windows(
+                product,
+                calculation_start_date=settings.PEOPLE_COST_CALCATION_STARTING_POINT)
+            cls.generate_cache_for_profile(
+                product,
+                calculation_start_date=settings.PEOPLE_COST_CALCATION_STARTING_POINT)
+        mark_data_version(CACHE_GENERATION_KEY)
 
     @staticmethod
     def remove():
@@ -124,6 +123,7 @@ class Command(BaseCommand):
         remove cache
         """
         cache.clear()
+        mark_data_version(CACHE_GENERATION_KEY)
 
     def handle(self, *args, **options):
         if options['action'] == 'gen':
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+command for generating a synthetic dataset
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+
+from dashboard.apps.dashboard.dataset import DatasetGenerator, SCALES
+from dashboard.libs.date_tools import parse_date
+
+logger = logging.getLogger(name='command')
+
+
+class Command(BaseCommand):
+    help = ('Generate a synthetic dataset of areas, products, people, rates,'
+            ' costs and tasks. meant for an empty database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', choices=sorted(SCALES), default='small',
+            help='preset numbers of objects, default to small')
+        parser.add_argument('--areas', type=int)
+        parser.add_argument('--products', type=int)
+        parser.add_argument('--people', type=int)
+        parser.add_argument('--years', type=int,
+                            help='years of tasks, rates and costs')
+        parser.add_argument('-s', '--start-date', type=parse_date)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sizes = dict(SCALES[options['scale']])
+        for key in sizes:
+            if options[key]:
+                sizes[key] = options[key]
+        counts = DatasetGenerator(
+            start_date=options['start_date'], seed=options['seed'], **sizes
+        ).generate()
+        for model, count in sorted(counts.items()):
+            logger.info('- %s: %s', model, count)
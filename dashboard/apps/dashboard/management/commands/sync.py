@@ -20,6 +20,7 @@ from dashboard.libs.floatapi import many
 from dashboard.apps.dashboard.models import (
     Area, Person, Product, Task, Department, Skill)
 from dashboard.libs.date_tools import get_workdays, parse_date
+from dashboard.libs.cache_tools import mark_data_version, LAST_SYNC_KEY
 
 FLOAT_DATA_DIR = settings.location('../var/float')
 
@@ -398,6 +399,7 @@ class Command(BaseCommand):
         logging.info('- sync database with exported Float data.')
         resources = options['resources'] or self.resources
         sync(start_date, end_date, resources, data_dir=output_dir)
+        mark_data_version(LAST_SYNC_KEY)
         if not options['keep']:
             shutil.rmtree(output_dir, ignore_errors=True)
             logging.info('- remove directory %s', output_dir)
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+command for keeping the workday calendar up to date
+"""
+import logging
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dashboard.apps.dashboard.models import WorkdayCalendar
+from dashboard.libs.date_tools import parse_date
+
+logger = logging.getLogger(name='command')
+
+
+class Command(BaseCommand):
+    help = 'Populate the workday calendar with bank holidays from gov.uk'
+
+    def add_arguments(self, parser):
+        default_end_date = date.today() + timedelta(
+            weeks=settings.DEFAULT_TASK_SYNC_WEEKS)
+        parser.add_argument('-s', '--start-date', type=parse_date,
+                            default=settings.FLOAT_TASK_SYNC_STARTING_POINT)
+        parser.add_argument('-e', '--end-date', type=parse_date,
+                            default=default_end_date)
+
+    def handle(self, *args, **options):
+        start_date = options['start_date']
+        end_date = options['end_date']
+        logger.info('- populate workday calendar from %s to %s',
+                    start_date, end_date)
+        days = WorkdayCalendar.objects.populate(start_date, end_date)
+        logger.info('- workday calendar has %s days.', days)
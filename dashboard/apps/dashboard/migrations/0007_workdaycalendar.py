@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2017-05-22 10:14
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_auto_20170403_1240'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkdayCalendar',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('is_workday', models.BooleanField()),
+                ('workday_ordinal', models.PositiveIntegerField()),
+            ],
+            options={
+                'ordering': ('date',),
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2017-05-23 09:31
+from __future__ import unicode_literals
+
+import datetime
+
+from django.db import migrations, models
+
+
+def fill_grouping_fields(apps, schema_editor):
+    WorkdayCalendar = apps.get_model('dashboard', 'WorkdayCalendar')
+    for day in WorkdayCalendar.objects.all():
+        start_of_financial_year = datetime.date(day.date.year, 4, 6)
+        if day.date >= start_of_financial_year:
+            day.financial_year = day.date.year
+        else:
+            day.financial_year = day.date.year - 1
+        day.month_start = day.date.replace(day=1)
+        day.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_workdaycalendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workdaycalendar',
+            name='financial_year',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='workdaycalendar',
+            name='month_start',
+            field=models.DateField(db_index=True, default=datetime.date(1970, 1, 1)),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_grouping_fields, migrations.RunPython.noop),
+    ]
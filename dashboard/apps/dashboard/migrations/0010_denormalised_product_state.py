@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_denormalised_fields(apps, schema_editor):
+    LogEntry = apps.get_model('admin', 'LogEntry')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    today = datetime.date.today()
+    for model_name, status_model_name in [
+            ('Product', 'ProductStatus'),
+            ('ProductGroup', 'ProductGroupStatus')]:
+        model = apps.get_model('dashboard', model_name)
+        content_type = ContentType.objects.filter(
+            app_label='dashboard', model=model_name.lower()).first()
+        for obj in model.objects.all():
+            if content_type:
+                last_entry = LogEntry.objects.filter(
+                    content_type_id=content_type.id,
+                    object_id=str(obj.id)).order_by('-action_time').first()
+                if last_entry:
+                    obj.last_updated_at = last_entry.action_time
+            obj.current_status = obj.statuses.filter(
+                start_date__lte=today).order_by('-start_date', '-id').first()
+            upcoming = obj.statuses.filter(
+                start_date__gt=today).order_by('start_date').first()
+            if upcoming:
+                obj.current_status_until = upcoming.start_date
+            obj.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin', '0002_logentry_remove_auto_add'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('dashboard', '0009_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='last_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='current_status_until',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='current_status',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dashboard.ProductStatus'),
+        ),
+        migrations.AddField(
+            model_name='productgroup',
+            name='last_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='productgroup',
+            name='current_status_until',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='productgroup',
+            name='current_status',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dashboard.ProductGroupStatus'),
+        ),
+        migrations.RunPython(fill_denormalised_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_exportjob_started_at'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='workdaycalendar',
+            name='financial_year',
+        ),
+        migrations.RemoveField(
+            model_name='workdaycalendar',
+            name='month_start',
+        ),
+    ]
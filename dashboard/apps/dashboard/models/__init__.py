@@ -9,3 +9,5 @@ from .product import Product, ProductGroup, ProductStatus, ProductGroupStatus
 from .task import Task
 from .department import Department
 from .skill import Skill
+from .workday import WorkdayCalendar
+from .export import ExportJob
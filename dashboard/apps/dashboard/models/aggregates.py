@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+set based calculations done in the database
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+
+from dashboard.libs.rate_converter import RATE_TYPES
+from .cost import Rate, PersonCost
+from .person import Person
+from .task import Task
+from .unit_of_work import current_unit_of_work
+from .workday import WorkdayCalendar
+
+
+# people costs of a non repeating task can be worked out in the database when
+# the person has a single flat day rate in the time window and no additional
+# costs: overlap workdays / task workdays * days * rate.
+# every other task in the time windows is returned by id together with the
+# index of the time window, so that it can be calculated in python.
+PEOPLE_COSTS_SQL = """
+WITH time_window (idx, start_date, end_date) AS (
+    VALUES {time_windows}
+),
+task_window AS (
+    SELECT
+        task.id AS task_id,
+        task.product_id,
+        task.person_id,
+        task.repeat_state,
+        task.days,
+        task.start_date,
+        task.end_date,
+        time_window.idx,
+        GREATEST(task.start_date, time_window.start_date) AS overlap_start,
+        LEAST(task.end_date, time_window.end_date) AS overlap_end
+    FROM {task} task
+    JOIN time_window
+        ON task.start_date <= time_window.end_date
+        AND CASE WHEN task.repeat_state > 0
+                 THEN task.repeat_end + (task.end_date - task.start_date)
+                 ELSE task.end_date END >= time_window.start_date
+    WHERE task.product_id IN %s
+        -- monthly repeating tasks are not costed, see Task.people_costs
+        AND task.repeat_state IN (0, 1)
+),
+classified AS (
+    SELECT
+        task_window.task_id,
+        task_window.product_id,
+        task_window.idx,
+        person.is_contractor,
+        (
+            task_window.repeat_state = 0
+            AND (rate.rate_type IS NULL OR rate.rate_type = %s)
+            AND NOT EXISTS (
+                SELECT 1 FROM {rate} later_rate
+                WHERE later_rate.person_id = task_window.person_id
+                    AND later_rate.start_date > task_window.overlap_start
+                    AND later_rate.start_date <= task_window.overlap_end)
+            AND NOT EXISTS (
+                SELECT 1 FROM {personcost} personcost
+                WHERE personcost.person_id = task_window.person_id)
+            AND task_start.date IS NOT NULL
+            AND task_end.date IS NOT NULL
+            AND overlap_start.date IS NOT NULL
+            AND overlap_end.date IS NOT NULL
+        ) AS eligible,
+        COALESCE(rate.rate, 0) AS rate,
+        task_window.days,
+        task_end.workday_ordinal - task_start.workday_ordinal +
+            task_start.is_workday::int AS task_workdays,
+        overlap_end.workday_ordinal - overlap_start.workday_ordinal +
+            overlap_start.is_workday::int AS overlap_workdays
+    FROM task_window
+    JOIN {person} person ON person.id = task_window.person_id
+    LEFT JOIN LATERAL (
+        SELECT on_rate.rate, on_rate.rate_type FROM {rate} on_rate
+        WHERE on_rate.person_id = task_window.person_id
+            AND on_rate.start_date <= task_window.overlap_start
+        ORDER BY on_rate.start_date DESC
+        LIMIT 1
+    ) rate ON TRUE
+    LEFT JOIN {calendar} task_start
+        ON task_start.date = task_window.start_date
+    LEFT JOIN {calendar} task_end
+        ON task_end.date = task_window.end_date
+    LEFT JOIN {calendar} overlap_start
+        ON overlap_start.date = task_window.overlap_start
+    LEFT JOIN {calendar} overlap_end
+        ON overlap_end.date = task_window.overlap_end
+)
+SELECT product_id, idx, is_contractor, NULL, SUM(
+    CASE WHEN task_workdays > 0
+         THEN rate * days * overlap_workdays / task_workdays
+         ELSE 0 END)
+FROM classified
+WHERE eligible
+GROUP BY product_id, idx, is_contractor
+UNION ALL
+SELECT product_id, idx, is_contractor, task_id, NULL
+FROM classified
+WHERE NOT eligible
+"""
+
+
+def _clip(time_window, calculation_start_date):
+    """
+    clip a time window by the calculation start date. an open ended
+    time window runs from the start or to the end of each task.
+    :return: a tuple of date objects or None when nothing is left
+    """
+    start_date, end_date = time_window
+    start_date = start_date or date.min
+    end_date = end_date or date.max
+    if calculation_start_date and calculation_start_date > start_date:
+        start_date = calculation_start_date
+    if start_date > end_date:
+        return None
+    return start_date, end_date
+
+
+def aggregate_people_costs(product_ids, time_windows,
+                           calculation_start_date=None):
+    """
+    run the people costs query for products in a list of time windows
+    :param product_ids: a list of product ids
+    :param time_windows: a list of tuples of date objects
+    :param calculation_start_date: date when calculation for people costs
+    using tasks and rates start
+    :return: a tuple of a dictionary of the totals calculated in the
+    database, keyed by (product_id, time window index, is_contractor), and
+    a list of (product_id, time window index, is_contractor, task_id) for
+    the tasks left to be calculated in python
+    """
+    clipped = [
+        (idx, _clip(time_window, calculation_start_date))
+        for idx, time_window in enumerate(time_windows)
+    ]
+    clipped = [(idx, tw) for idx, tw in clipped if tw]
+    if not product_ids or not clipped:
+        return {}, []
+
+    sql = PEOPLE_COSTS_SQL.format(
+        time_windows=', '.join(['(%s, %s::date, %s::date)'] * len(clipped)),
+        task=Task._meta.db_table,
+        person=Person._meta.db_table,
+        rate=Rate._meta.db_table,
+        personcost=PersonCost._meta.db_table,
+        calendar=WorkdayCalendar._meta.db_table,
+    )
+    params = [value for idx, (sdate, edate) in clipped
+              for value in (idx, sdate, edate)]
+    params += [tuple(product_ids), int(RATE_TYPES.DAY)]
+
+    totals = {}
+    fallbacks = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for product_id, idx, is_contractor, task_id, cost in cursor.fetchall():
+            if task_id is None:
+                totals[(product_id, idx, is_contractor)] = cost
+            else:
+                fallbacks.append((product_id, idx, is_contractor, task_id))
+    return totals, fallbacks
+
+
+def people_costs_in_windows(product_ids, time_windows,
+                            calculation_start_date=None):
+    """
+    contractor and non-contractor people costs for many products and
+    time windows. most of the work is done in a single query, only
+    repeating tasks, people with more than one rate or with additional
+    costs in a time window and days not yet in the workday calendar are
+    calculated in python.
+    :param product_ids: a list of product ids
+    :param time_windows: a list of tuples of date objects
+    :param calculation_start_date: date when calculation for people costs
+    using tasks and rates start
+    :return: a dictionary keyed by (product_id, time_window) with
+    dictionaries of 'contractor' and 'non-contractor' costs as values
+    """
+    result = {
+        (product_id, time_window): {
+            'contractor': Decimal('0'),
+            'non-contractor': Decimal('0'),
+        }
+        for product_id in product_ids
+        for time_window in time_windows
+    }
+
+    def _add(product_id, idx, is_contractor, cost):
+        key = 'contractor' if is_contractor else 'non-contractor'
+        result[(product_id, time_windows[idx])][key] += cost
+
+    totals, fallbacks = aggregate_people_costs(
+        product_ids, time_windows, calculation_start_date)
+    for (product_id, idx, is_contractor), cost in totals.items():
+        _add(product_id, idx, is_contractor, cost)
+
+    tasks = Task.objects.select_related('person').in_bulk(
+        {task_id for _, _, _, task_id in fallbacks})
+    unit = current_unit_of_work()
+    if unit is not None:
+        unit.load_persons({task.person_id for task in tasks.values()})
+    for product_id, idx, is_contractor, task_id in fallbacks:
+        start_date, end_date = time_windows[idx]
+        cost = tasks[task_id].people_costs(
+            start_date, end_date,
+            calculation_start_date=calculation_start_date)
+        _add(product_id, idx, is_contractor, cost)
+    return result
@@ -30,7 +30,7 @@ class Area(models.Model):
         :param end_date: end date of time window, a date object
         :param freq: an optional parameter to slice the time window into
         sub windows. value of freq should be an offset aliases supported by
-        pandas date_range, e.g. MS for month start.
+        `slice_time_window`, e.g. MS for month start.
         :param calculation_start_date: date when calculation for people costs
         using tasks and rates start
         :return: a dictionary representing the profile
@@ -41,8 +41,9 @@ class Area(models.Model):
             for p in group.products.all()
         ]
         products = self.products.visible().exclude(
-            id__in=product_ids_in_a_group)
-        product_groups = [group for group in ProductGroup.objects.all()
+            id__in=product_ids_in_a_group).select_related('current_status')
+        product_groups = [group for group in
+                          ProductGroup.objects.select_related('current_status')
                           if group.area and group.area.id == self.id]
         if product_ids is not None:
             products = products.filter(id__in=product_ids)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+budgets of a product or product group over time, looked up in memory
+"""
+from bisect import bisect_right
+from decimal import Decimal
+
+
+class BudgetTimeline():
+    """
+    the budget on any date is the latest budget started on or before the
+    date, a step function looked up by bisection
+    """
+
+    def __init__(self, steps=()):
+        """
+        :param steps: an iterable of tuples of the start date and the
+        amount of a budget
+        """
+        steps = sorted(steps, key=lambda step: step[0])
+        self.dates = [start_date for start_date, _ in steps]
+        self.amounts = [amount for _, amount in steps]
+
+    @classmethod
+    def of_budgets(cls, budgets):
+        """
+        :param budgets: a list or queryset of budget objects
+        """
+        return cls((budget.start_date, budget.budget) for budget in budgets)
+
+    @classmethod
+    def merge(cls, timelines):
+        """
+        the sum of the budgets of many timelines, e.g. of the products
+        in a product group
+        :param timelines: a list of `BudgetTimeline` objects
+        """
+        dates = sorted({day for timeline in timelines
+                        for day in timeline.dates})
+        return cls(
+            (day, sum(timeline.on(day) for timeline in timelines))
+            for day in dates)
+
+    def on(self, on):
+        """
+        :param on: a date object
+        :return: a decimal for the budget on the date
+        """
+        idx = bisect_right(self.dates, on)
+        return self.amounts[idx - 1] if idx else Decimal('0')
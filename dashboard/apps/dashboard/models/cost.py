@@ -11,7 +11,7 @@ from dateutil.rrule import MONTHLY, YEARLY, DAILY
 from ..constants import COST_TYPES
 from dashboard.libs.rate_converter import RATE_TYPES
 from dashboard.libs.date_tools import (
-    get_overlap, dates_between)
+    get_overlap, count_dates_between)
 from dashboard.libs.rate_converter import RateConverter, dec_workdays
 
 
@@ -43,6 +43,32 @@ class AditionalCostsMixin():
 
         return sum(map(cost_of_cost, costs)) or Decimal('0')
 
+    @staticmethod
+    def additional_costs_in(costs, start_date, end_date):
+        """
+        same as `additional_costs` for costs already loaded, so that they
+        can be reused for many time windows
+        :param costs: a list of cost or saving objects
+        """
+        return sum(cost.cost_between(start_date, end_date)
+                   for cost in AditionalCostsMixin.costs_in(
+                       costs, start_date, end_date)) or Decimal('0')
+
+    @staticmethod
+    def costs_in(costs, start_date, end_date):
+        """
+        same as `get_costs_between` for costs already loaded
+        :param costs: a list of cost or saving objects
+        :return: a list of the costs in the time window
+        """
+        if start_date and end_date:
+            costs = [
+                cost for cost in costs
+                if (cost.end_date is None or cost.end_date >= start_date) and
+                cost.start_date <= end_date
+            ]
+        return list(costs)
+
 
 class BaseCost(models.Model):
     type = models.PositiveSmallIntegerField(
@@ -66,11 +92,11 @@ class BaseCost(models.Model):
                 return self.cost
             return Decimal('0')
 
-        dates = dates_between(start_date, end_date, self.freq,
-                              bymonthday=self.bymonthday,
-                              byyearday=self.byyearday)
+        occurrences = count_dates_between(
+            start_date, end_date, self.freq,
+            bymonthday=self.bymonthday, byyearday=self.byyearday)
 
-        return len(dates) * self.cost
+        return occurrences * self.cost
 
     def rate_between(self, start_date, end_date):
         if not self.end_date:
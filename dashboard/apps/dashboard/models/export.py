@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from hashlib import sha224
+import json
+import logging
+import tempfile
+
+from django.conf import settings
+from django.contrib.postgres.fields import JSONField
+from django.core.files import File
+from django.core.files.storage import get_storage_class
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from ..constants import EXPORT_STATUSES
+from ..permissions import user_is_finance
+from .unit_of_work import unit_of_work
+
+
+logger = logging.getLogger(__name__)
+
+# kind of export to the dotted path of a function taking the params of
+# a job and returning a tuple of the workbook and the file name.
+# anything with a `save` method taking a file object works as workbook.
+EXPORTS = {
+    'products': 'dashboard.apps.dashboard.exports.products_workbook',
+    'person_rates': 'dashboard.apps.dashboard.exports.person_rates_workbook',
+    'journal': 'reports.forms.journal_workbook',
+}
+
+# exports anyone can download, the rest are for finance only
+PUBLIC_EXPORTS = ['products']
+
+
+def export_storage():
+    """
+    the storage for generated exports. local file system by default.
+    """
+    return get_storage_class(settings.EXPORT_STORAGE)(
+        **settings.EXPORT_STORAGE_OPTIONS)
+
+
+class ExportJobManager(models.Manager):
+
+    def expire_stalled(self, params_hash=None):
+        """
+        mark the jobs pending or running for longer than
+        EXPORT_JOB_TIMEOUT_SECONDS as failed, as their worker has most
+        likely died or never picked them up
+        :param params_hash: only expire the jobs of this export
+        :return: number of jobs marked as failed
+        """
+        now = timezone.now()
+        timed_out = now - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT_SECONDS)
+        jobs = self.all()
+        if params_hash:
+            jobs = jobs.filter(params_hash=params_hash)
+        return jobs.filter(
+            models.Q(status=EXPORT_STATUSES.PENDING,
+                     created_at__lt=timed_out) |
+            models.Q(status=EXPORT_STATUSES.RUNNING,
+                     started_at__lt=timed_out)
+        ).update(status=EXPORT_STATUSES.FAILED, error='timed out',
+                 finished_at=now)
+
+    def request(self, kind, params, user=None):
+        """
+        get a job for an export. an identical export requested within
+        EXPORT_JOB_REUSE_SECONDS is reused unless it failed, see
+        `expire_stalled` for jobs which never finish.
+        :param kind: a key of EXPORTS
+        :param params: a json serialisable dictionary for the export
+        :param user: the user requesting the export
+        :return: a tuple of the job and whether it is newly created
+        """
+        if kind not in EXPORTS:
+            raise ValueError('unknown export {}'.format(kind))
+        params = json.loads(json.dumps(params, cls=DjangoJSONEncoder))
+        params_hash = sha224(json.dumps(
+            [kind, params], sort_keys=True).encode('utf-8')).hexdigest()
+        now = timezone.now()
+        with transaction.atomic():
+            # two requests for the same export wait for each other here,
+            # so that only one of them creates a job
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))',
+                               [params_hash])
+            self.expire_stalled(params_hash)
+            job = self.filter(
+                params_hash=params_hash,
+                created_at__gte=now - timedelta(
+                    seconds=settings.EXPORT_JOB_REUSE_SECONDS)
+            ).exclude(
+                status=EXPORT_STATUSES.FAILED
+            ).order_by('-created_at').first()
+            if job:
+                return job, False
+            job = self.create(kind=kind, params=params,
+                              params_hash=params_hash, requested_by=user)
+        return job, True
+
+
+class ExportJob(models.Model):
+    """
+    a spreadsheet export rendered in the background
+    """
+    kind = models.CharField(max_length=32)
+    params = JSONField(default=dict)
+    params_hash = models.CharField(max_length=56, db_index=True)
+    status = models.PositiveSmallIntegerField(
+        choices=EXPORT_STATUSES, default=EXPORT_STATUSES.PENDING)
+    filename = models.CharField(max_length=255, blank=True)
+    file = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='+', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ExportJobManager()
+
+    def __str__(self):
+        return '{} export {}'.format(self.kind, self.id)
+
+    @property
+    def is_finished(self):
+        return self.status in (EXPORT_STATUSES.DONE, EXPORT_STATUSES.FAILED)
+
+    def can_user_access(self, user):
+        return self.kind in PUBLIC_EXPORTS or user_is_finance(user)
+
+    def run(self):
+        """
+        render the export and save it in the export storage
+        """
+        self.status = EXPORT_STATUSES.RUNNING
+        self.started_at = timezone.now()
+        self.save(update_fields=['status', 'started_at'])
+        try:
+            with unit_of_work(), tempfile.TemporaryFile() as fobj:
+                workbook, filename = import_string(
+                    EXPORTS[self.kind])(self.params)
+                workbook.save(fobj)
+                fobj.seek(0)
+                name = export_storage().save(
+                    'exports/{}/{}'.format(self.id, filename), File(fobj))
+        except Exception as exc:
+            logger.exception('export job %s failed', self.id)
+            self.status = EXPORT_STATUSES.FAILED
+            self.error = str(exc)
+        else:
+            self.status = EXPORT_STATUSES.DONE
+            self.filename = filename
+            self.file = name
+        self.finished_at = timezone.now()
+        self.save()
+
+    def open(self):
+        """
+        :return: the generated file opened for reading
+        """
+        return export_storage().open(self.file, 'rb')
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': EXPORT_STATUSES.for_value(self.status).constant,
+            'filename': self.filename,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from collections import defaultdict
 from datetime import date, timedelta
 from decimal import Decimal
 
@@ -185,3 +186,16 @@ class Person(models.Model, AditionalCostsMixin):
             for t in tasks
         )
         return time_spent
+
+    def time_on_products(self, start_date=None, end_date=None):
+        """
+        get the days spent by the person on each product in a time window,
+        from a single query for the tasks in the time window.
+        :param start_date: start date of the time window, a date object
+        :param end_date: end date of the time window, a date object
+        :return: product id to number of days, a dictionary
+        """
+        result = defaultdict(lambda: Decimal('0'))
+        for task in self.tasks.between(start_date, end_date):
+            result[task.product_id] += task.time_spent(start_date, end_date)
+        return dict(result)
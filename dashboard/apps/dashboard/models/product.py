@@ -1,20 +1,33 @@
 # -*- coding: utf-8 -*-
+from collections import defaultdict
 from datetime import date, timedelta
 from decimal import Decimal
 
 from django.db import models
 from django.contrib.contenttypes.models import ContentType
-from django.contrib.admin.models import LogEntry
 from django.core import urlresolvers
 from django.contrib.postgres.fields import JSONField
 from django.utils.translation import ugettext_lazy
 
 from dashboard.libs.date_tools import (
     financial_year_tuple, slice_time_window, get_workdays)
-from dashboard.libs.cache_tools import method_cache
+from dashboard.libs.cache_tools import method_cache, method_cache_many
 from ..constants import RAG_TYPES, STATUS_TYPES, COST_TYPES
+from .aggregates import people_costs_in_windows
+from .budget_timeline import BudgetTimeline
 from .cost import Cost, AditionalCostsMixin, Budget, Saving
 from .link import Link
+from .task_index import TaskIndex
+from .unit_of_work import current_unit_of_work
+
+
+# parts of a product or product group profile, see `BaseProduct.profile`
+PROFILE_FIELDS = (
+    'status', 'service_area', 'description', 'managers', 'discovery_date',
+    'alpha_date', 'beta_date', 'live_date', 'end_date', 'first_date',
+    'last_date', 'financial', 'financial_rag', 'budget', 'current_fte',
+    'cost_to_date', 'phase', 'costs', 'savings', 'links', 'last_updated'
+)
 
 
 class BaseProduct(models.Model):
@@ -33,6 +46,11 @@ class BaseProduct(models.Model):
     live_date = models.DateField(null=True, blank=True,
                                  verbose_name='live start')
     end_date = models.DateField(null=True, blank=True)
+    # kept up to date by the signals in `dashboard.apps.dashboard.signals`
+    last_updated_at = models.DateTimeField(
+        null=True, blank=True, editable=False)
+    current_status_until = models.DateField(
+        null=True, blank=True, editable=False)
 
     @property
     def admin_url(self):
@@ -70,11 +88,19 @@ class BaseProduct(models.Model):
         last time the product was updated through the admin interface
         :return: a date time object or None
         """
-        last_entry = LogEntry.objects.filter(
-            content_type_id=ContentType.objects.get_for_model(self).id,
-            object_id=self.id).order_by('-action_time').first()
-        if last_entry:
-            return last_entry.action_time
+        return self.last_updated_at
+
+    def record_update(self, action_time):
+        """
+        record a change made through the admin interface, see `last_updated`
+        :param action_time: a date time object
+        """
+        type(self).objects.filter(pk=self.pk).filter(
+            models.Q(last_updated_at__isnull=True) |
+            models.Q(last_updated_at__lt=action_time)
+        ).update(last_updated_at=action_time)
+        if not self.last_updated_at or self.last_updated_at < action_time:
+            self.last_updated_at = action_time
 
     def financial_rag(self, calculation_start_date=None):
         """
@@ -101,12 +127,35 @@ class BaseProduct(models.Model):
         :param on: optional date object. if empty use today's date
         :return: a rag object
         """
+        today = date.today()
         if not on:
-            on = date.today()
+            on = today
+        # `current_status` is out of date from `current_status_until` until
+        # it is refreshed by the `refresh_current_statuses` task
+        if on == today and not (self.current_status_until and
+                                today >= self.current_status_until):
+            return self.current_status
         status = self.statuses.filter(
             start_date__lte=on).order_by('-start_date', '-id').first()
         return status
 
+    def update_current_status(self):
+        """
+        point `current_status` to the status of today and record the start
+        date of the next status, from when the pointer is out of date.
+        called whenever a status is saved or deleted and daily by the
+        `refresh_current_statuses` task, see `status`.
+        """
+        today = date.today()
+        self.current_status = self.statuses.filter(
+            start_date__lte=today).order_by('-start_date', '-id').first()
+        upcoming = self.statuses.filter(
+            start_date__gt=today).order_by('start_date').first()
+        self.current_status_until = upcoming.start_date if upcoming else None
+        type(self).objects.filter(pk=self.pk).update(
+            current_status=self.current_status,
+            current_status_until=self.current_status_until)
+
     def stats_on(self, on, calculation_start_date=None):
         """
         key statistics snapshot on a given date
@@ -115,9 +164,10 @@ class BaseProduct(models.Model):
         using tasks and rates start
         """
         try:
-            return self.stats_between(
-                self.first_date, on - timedelta(days=1),
-                calculation_start_date=calculation_start_date)
+            time_window = (self.first_date, on - timedelta(days=1))
+            return self.stats_in_windows(
+                [time_window],
+                calculation_start_date=calculation_start_date)[time_window]
         except ValueError:  # when no first_date
             return {
                 'contractor': Decimal('0'),
@@ -163,6 +213,43 @@ class BaseProduct(models.Model):
         }
         return stats
 
+    def stats_in_windows(self, time_windows, calculation_start_date=None,
+                         ignore_cache=False):
+        """
+        key statistics in many time windows, same as calling `stats_between`
+        for each of them and sharing its cache. the time windows not in the
+        cache are worked out together, see `compute_stats_in_windows`.
+        :param time_windows: a list of tuples of date objects
+        :param calculation_start_date: date when calculation for people costs
+        using tasks and rates start
+        :param ignore_cache: True to work out all the time windows
+        :return: a dictionary of time window to the stats in it
+        """
+        calls = {
+            time_window: (time_window,
+                          {'calculation_start_date': calculation_start_date})
+            for time_window in time_windows
+        }
+        return method_cache_many(
+            BaseProduct.stats_between, self, calls,
+            lambda missing: self.compute_stats_in_windows(
+                missing, calculation_start_date),
+            ignore_cache=ignore_cache)
+
+    def compute_stats_in_windows(self, time_windows,
+                                 calculation_start_date=None):
+        """
+        work out key statistics in many time windows without the cache
+        :return: a dictionary of time window to the stats in it
+        """
+        return {
+            (start_date, end_date): self.stats_between(
+                start_date, end_date,
+                calculation_start_date=calculation_start_date,
+                ignore_cache=True)
+            for start_date, end_date in time_windows
+        }
+
     def key_dates(self, freq=None):
         """
         key dates of the product. these include the start of
@@ -170,7 +257,7 @@ class BaseProduct(models.Model):
         start of time frames and end of last time frame sliced by frequency.
         :param freq: an optional parameter to slice the time window into
         sub windows. value of freq should be an offset aliases supported by
-        pandas date_range, e.g. MS for month start.
+        `slice_time_window`, e.g. MS for month start.
         :return: a dictionary
         """
         phase_start_dates = {
@@ -248,29 +335,48 @@ class BaseProduct(models.Model):
         statistics on key dates
         :param freq: an optional parameter to slice the time window into
         sub windows. value of freq should be an offset aliases supported by
-        pandas date_range, e.g. MS for month start.
+        `slice_time_window`, e.g. MS for month start.
         :param calculation_start_date: date when calculation for people costs
         using tasks and rates start
         return: a dictionary
         """
+        key_dates = self.key_dates(freq)
+        try:
+            first_date = self.first_date
+        except ValueError:  # when no first_date, see `stats_on`
+            return {
+                k: {**{'stats': self.stats_on(
+                    v['date'],
+                    calculation_start_date=calculation_start_date)}, **v}
+                for k, v in key_dates.items()
+            }
+        # the same time windows as `stats_on`, looked up together
+        stats = self.stats_in_windows(
+            [(first_date, v['date'] - timedelta(days=1))
+             for v in key_dates.values()],
+            calculation_start_date=calculation_start_date)
         return {
-            k: {**{'stats': self.stats_on(
-                v['date'],
-                calculation_start_date=calculation_start_date)}, **v}
-            for k, v in self.key_dates(freq).items()
+            k: {**{'stats': stats[
+                (first_date, v['date'] - timedelta(days=1))]}, **v}
+            for k, v in key_dates.items()
         }
 
     def stats_in_time_frames(self, start_date, end_date, freq,
-                             calculation_start_date=None):
+                             calculation_start_date=None,
+                             time_frames_start=None, time_frames_end=None):
         """
         cumulative stats of time frames sliced by freq
         :param start_date: start date of time window, a date object
         :param end_date: end date of time window, a date object
         :param freq: an optional parameter to slice the time window into
         sub windows. value of freq should be an offset aliases supported by
-        pandas date_range, e.g. MS for month start.
+        `slice_time_window`, e.g. MS for month start.
         :param calculation_start_date: date when calculation for people costs
         using tasks and rates start
+        :param time_frames_start: optional date object. only include the
+        time frames ending on or after it
+        :param time_frames_end: optional date object. only include the
+        time frames starting on or before it
         :return: a dictionary
         """
         if not start_date:
@@ -288,6 +394,13 @@ class BaseProduct(models.Model):
                 start_date, end_date, freq, extend=True)
         else:
             time_windows = [(start_date, end_date)]
+        time_windows = [
+            (sdate, edate) for sdate, edate in time_windows
+            if (not time_frames_start or edate >= time_frames_start) and
+            (not time_frames_end or sdate <= time_frames_end)
+        ]
+        stats = self.stats_in_windows(
+            time_windows, calculation_start_date=calculation_start_date)
         result = {}
         for sdate, edate in time_windows:
             # use '{sdate}~{edate}' as the dictionary key.
@@ -295,8 +408,7 @@ class BaseProduct(models.Model):
             # leave it open to change when a better way emerges.
             key = '{}~{}'.format(sdate.strftime('%Y-%m-%d'),
                                  edate.strftime('%Y-%m-%d'))
-            result[key] = self.stats_between(
-                sdate, edate, calculation_start_date=calculation_start_date)
+            result[key] = stats[(sdate, edate)]
         return result
 
     @property
@@ -317,71 +429,102 @@ class BaseProduct(models.Model):
 
     @method_cache(timeout=24 * 60 * 60)
     def profile(self, start_date=None, end_date=None, freq='MS',
-                calculation_start_date=None):
+                calculation_start_date=None, fields=None,
+                time_frames_start=None, time_frames_end=None):
         """
         get the profile of a product group in a time window.
         :param start_date: start date of time window, a date object
         :param end_date: end date of time window, a date object
         :param freq: an optional parameter to slice the time window into
         sub windows. value of freq should be an offset aliases supported by
-        pandas date_range, e.g. MS for month start.
+        `slice_time_window`, e.g. MS for month start.
         :param calculation_start_date: date when calculation for people costs
         using tasks and rates start
+        :param fields: an optional list of names from PROFILE_FIELDS. only
+        these parts of the profile are worked out. if not specified, the
+        full profile is returned. id, name and type are always included.
+        :param time_frames_start: optional date object. only include the
+        time frames ending on or after it
+        :param time_frames_end: optional date object. only include the
+        time frames starting on or before it
         :return: a dictionary representing the profile
         """
-        status = self.status()
-        status = status.as_dict() if status else {}
-        if self.area:
-            service_area = {
-                'id': self.area.id,
-                'name': self.area.name,
-            }
-        else:
-            service_area = {}
-        try:
-            first_date = self.first_date
-        except ValueError:
-            first_date = None
-        try:
-            last_date = self.last_date
-        except ValueError:
-            last_date = None
-        result = {
-            'id': self.id,
-            'name': self.name,
-            'status': status,
-            'type': self.__class__.__name__,
-            'service_area': service_area,
-            'description': self.description,
-            'managers': self.managers,
-            'discovery_date': self.discovery_date,
-            'alpha_date': self.alpha_date,
-            'beta_date': self.beta_date,
-            'live_date': self.live_date,
-            'end_date': self.end_date,
-            'first_date': first_date,
-            'last_date': last_date,
-            'financial': {
+        def _status():
+            status = self.status()
+            return status.as_dict() if status else {}
+
+        def _service_area():
+            if self.area:
+                return {'id': self.area.id, 'name': self.area.name}
+            return {}
+
+        def _date(name):
+            try:
+                return getattr(self, name)
+            except ValueError:
+                return None
+
+        sections = {
+            'status': _status,
+            'service_area': _service_area,
+            'description': lambda: self.description,
+            'managers': lambda: self.managers,
+            'discovery_date': lambda: self.discovery_date,
+            'alpha_date': lambda: self.alpha_date,
+            'beta_date': lambda: self.beta_date,
+            'live_date': lambda: self.live_date,
+            'end_date': lambda: self.end_date,
+            'first_date': lambda: _date('first_date'),
+            'last_date': lambda: _date('last_date'),
+            'financial': lambda: {
                 'time_frames': self.stats_in_time_frames(
                     start_date, end_date, freq,
-                    calculation_start_date=calculation_start_date),
+                    calculation_start_date=calculation_start_date,
+                    time_frames_start=time_frames_start,
+                    time_frames_end=time_frames_end),
                 'key_dates': self.stats_on_key_dates(
                     freq, calculation_start_date)
             },
-            'financial_rag': self.financial_rag(calculation_start_date),
-            'budget': self.budget(),
-            'current_fte': self.current_fte(
+            'financial_rag': lambda: self.financial_rag(
+                calculation_start_date),
+            'budget': lambda: self.budget(),
+            'current_fte': lambda: self.current_fte(
                 start_date=start_date,
                 end_date=end_date),
-            'cost_to_date': self.cost_to_date(calculation_start_date=calculation_start_date),
-            'phase': self.phase,
-            'costs': {c.id: c.as_dict() for c in self.costs.all()},
-            'savings': {s.id: s.as_dict() for s in self.savings.all()},
-            'links': [l.as_dict() for l in self.links.all()],
-            'last_updated': self.last_updated
+            'cost_to_date': lambda: self.cost_to_date(
+                calculation_start_date=calculation_start_date),
+            'phase': lambda: self.phase,
+            'costs': lambda: {c.id: c.as_dict() for c in self.costs.all()},
+            'savings': lambda: {s.id: s.as_dict() for s in self.savings.all()},
+            'links': lambda: [l.as_dict() for l in self.links.all()],
+            'last_updated': lambda: self.last_updated
         }
+        if fields is None:
+            fields = PROFILE_FIELDS
+        unknown = set(fields) - set(PROFILE_FIELDS)
+        if unknown:
+            raise ValueError('unknown profile fields {}'.format(
+                ','.join(sorted(unknown))))
+        result = {
+            'id': self.id,
+            'name': self.name,
+            'type': self.__class__.__name__,
+        }
+        for name in fields:
+            result[name] = sections[name]()
         return result
 
+    def budget_timeline(self):
+        """
+        the budgets over time, shared by the unit of work in progress
+        if any, see `load_budget_timeline`
+        :return: a `BudgetTimeline` object
+        """
+        unit = current_unit_of_work()
+        if unit is not None:
+            return unit.budget_timeline(self)
+        return self.load_budget_timeline()
+
     def can_user_change(self, user):
         ctype = ContentType.objects.get_for_model(self.__class__)
         perm = '{}.change_{}'.format(ctype.app_label, ctype.model)
@@ -406,6 +549,9 @@ class Product(BaseProduct, AditionalCostsMixin):
     is_billable = models.BooleanField(default=True)
     area = models.ForeignKey('Area', related_name='products',
                              verbose_name='service area', null=True)
+    current_status = models.ForeignKey(
+        'ProductStatus', related_name='+', null=True, blank=True,
+        editable=False, on_delete=models.SET_NULL)
     visible = models.BooleanField(default=True)
     raw_data = JSONField(null=True)
 
@@ -500,6 +646,26 @@ class Product(BaseProduct, AditionalCostsMixin):
     def __str__(self):
         return self.name
 
+    def task_index(self):
+        """
+        the tasks of the product in an index, shared by the unit of work
+        in progress if any
+        :return: a `TaskIndex` object
+        """
+        unit = current_unit_of_work()
+        if unit is not None:
+            return unit.task_index(self)
+        return TaskIndex(self.tasks.all())
+
+    def tasks_between(self, start_date, end_date):
+        """
+        the tasks with any time spent in a time window, from the unit
+        of work in progress if any
+        """
+        if current_unit_of_work() is not None:
+            return self.task_index().between(start_date, end_date)
+        return self.tasks.between(start_date, end_date)
+
     def people_costs(self, start_date, end_date, contractor_only=False,
                      non_contractor_only=False, calculation_start_date=None):
         """
@@ -517,20 +683,16 @@ class Product(BaseProduct, AditionalCostsMixin):
             raise ValueError('only one of contractor_only and'
                              ' non_contractor_only can be true')
 
-        tasks = self.tasks.between(start_date, end_date)
+        time_window = (start_date, end_date)
+        costs = people_costs_in_windows(
+            [self.id], [time_window],
+            calculation_start_date=calculation_start_date
+        )[(self.id, time_window)]
         if contractor_only:
-            tasks = tasks.filter(person__is_contractor=True)
+            return costs['contractor']
         elif non_contractor_only:
-            tasks = tasks.filter(person__is_contractor=False)
-
-        spending_per_task = [
-            task.people_costs(
-                start_date,
-                end_date,
-                calculation_start_date=calculation_start_date
-            )
-            for task in tasks]
-        return sum(spending_per_task)
+            return costs['non-contractor']
+        return costs['contractor'] + costs['non-contractor']
 
     def people_additional_costs(self, start_date, end_date, name=True,
                                 calculation_start_date=None):
@@ -542,7 +704,7 @@ class Product(BaseProduct, AditionalCostsMixin):
         :param calculation_start_date: date when calculation for people costs
         :return: a decimal for total spending
         """
-        tasks = self.tasks.between(start_date, end_date)
+        tasks = self.tasks_between(start_date, end_date)
         additinal_task_costs = [
             task.people_costs(
                 start_date,
@@ -562,6 +724,44 @@ class Product(BaseProduct, AditionalCostsMixin):
             start_date, end_date, non_contractor_only=True,
             calculation_start_date=calculation_start_date) - aditional_costs
 
+    def compute_stats_in_windows(self, time_windows,
+                                 calculation_start_date=None):
+        """
+        work out key statistics in many time windows in one go. people
+        costs of all the time windows come from a single query, additional
+        costs, savings and budgets are loaded once and worked out in python.
+        :return: a dictionary of time window to the stats in it
+        """
+        people_costs = people_costs_in_windows(
+            [self.id], time_windows,
+            calculation_start_date=calculation_start_date)
+        costs = list(self.costs.all())
+        savings = list(self.savings.all())
+        budgets = self.budget_timeline()
+
+        result = {}
+        for start_date, end_date in time_windows:
+            contractor_cost = people_costs[
+                (self.id, (start_date, end_date))]['contractor']
+            non_contractor_cost = people_costs[
+                (self.id, (start_date, end_date))]['non-contractor']
+            additional_costs = self.additional_costs_in(
+                costs, start_date, end_date)
+            total = contractor_cost + non_contractor_cost + additional_costs
+            # same as `stats_between`, the budget on the next day
+            budget = budgets.on(end_date + timedelta(days=1))
+            result[(start_date, end_date)] = {
+                'contractor': contractor_cost,
+                'non-contractor': non_contractor_cost,
+                'additional': additional_costs,
+                'budget': budget,
+                'savings': self.additional_costs_in(
+                    savings, start_date, end_date),
+                'total': total,
+                'remaining': budget - total
+            }
+        return result
+
     def cost_to(self, d, calculation_start_date=None):
         """
         cost of the product from the start to date d
@@ -601,9 +801,10 @@ class Product(BaseProduct, AditionalCostsMixin):
         """
         if not on:
             on = date.today()
-        budget = self.budgets.filter(start_date__lte=on)\
-            .order_by('-start_date').first()
-        return budget.budget if budget else Decimal('0')
+        return self.budget_timeline().on(on)
+
+    def load_budget_timeline(self):
+        return BudgetTimeline.of_budgets(self.budgets.all())
 
     @property
     def final_budget(self):
@@ -631,7 +832,19 @@ class Product(BaseProduct, AditionalCostsMixin):
             return Decimal('0')
 
         return sum(task.time_spent(start_date, end_date)
-                   for task in self.tasks.all())
+                   for task in self.tasks_between(start_date, end_date))
+
+    @staticmethod
+    def fte_window(start_date=None, end_date=None):
+        """
+        the time window of `current_fte`
+        :return: a tuple of date objects
+        """
+        if not end_date:
+            end_date = date.today() - timedelta(days=1)
+        if not start_date:
+            start_date = end_date - timedelta(days=7)
+        return start_date, end_date
 
     @method_cache(timeout=24 * 60 * 60)
     def current_fte(self, start_date=None, end_date=None):
@@ -644,15 +857,46 @@ class Product(BaseProduct, AditionalCostsMixin):
         :param end_date: date object for the end date.
         if not specified, use the date of yesterday.
         """
-        if not end_date:
-            end_date = date.today() - timedelta(days=1)
-        if not start_date:
-            start_date = end_date - timedelta(days=7)
+        start_date, end_date = self.fte_window(start_date, end_date)
         workdays = get_workdays(start_date, end_date)
         if workdays == 0:  # avoid zero division
             return Decimal('0')
         return self.time_spent(start_date, end_date) / workdays
 
+    def fte_in_windows(self, time_windows, ignore_cache=False):
+        """
+        FTE in many time windows, same as calling `current_fte` for each
+        of them and sharing its cache. the time windows not in the cache
+        are worked out together, see `compute_fte_in_windows`.
+        :param time_windows: a list of tuples of date objects or None
+        :param ignore_cache: True to work out all the time windows
+        :return: a dictionary of time window to the FTE in it
+        """
+        calls = {time_window: (time_window, {})
+                 for time_window in time_windows}
+        return method_cache_many(
+            Product.current_fte, self, calls, self.compute_fte_in_windows,
+            ignore_cache=ignore_cache)
+
+    def compute_fte_in_windows(self, time_windows):
+        """
+        work out FTE in many time windows without the cache, with the tasks
+        loaded once, see `task_index`
+        :return: a dictionary of time window to the FTE in it
+        """
+        index = self.task_index()
+        ftes = {}
+        for time_window in time_windows:
+            start_date, end_date = self.fte_window(*time_window)
+            workdays = get_workdays(start_date, end_date)
+            if workdays == 0:  # avoid zero division
+                ftes[time_window] = Decimal('0')
+                continue
+            ftes[time_window] = sum(
+                task.time_spent(start_date, end_date)
+                for task in index.between(start_date, end_date)) / workdays
+        return ftes
+
     def savings_between(self, start_date=None, end_date=None):
         """
         returns total savings for the product
@@ -764,53 +1008,142 @@ class ProductGroup(BaseProduct):
         Product,
         related_name='product_groups',
         limit_choices_to=lambda: {'id__in': Product.objects.visible()})
+    current_status = models.ForeignKey(
+        'ProductGroupStatus', related_name='+', null=True, blank=True,
+        editable=False, on_delete=models.SET_NULL)
+
+    def load_products(self):
+        """
+        the products in the group together with their service areas
+        :return: a list of product objects
+        """
+        return list(self.products.select_related('area'))
+
+    def product_list(self):
+        """
+        the products in the group, shared by the unit of work in progress
+        if any, see `load_products`
+        :return: a list of product objects
+        """
+        unit = current_unit_of_work()
+        if unit is not None:
+            return unit.products_of(self)
+        return self.load_products()
+
+    def visible_products(self):
+        """
+        the products in the group whose costs and savings count towards
+        those of the group
+        :return: a list of product objects
+        """
+        return [p for p in self.product_list() if p.visible]
 
     @property
     def budgets(self):
-        return Budget.objects.filter(
-            product_id__in=[p.id for p in self.products.all()])
+        return Budget.objects.filter(product__product_groups=self)
 
     @property
     def savings(self):
-        return Saving.objects.filter(
-            product_id__in=[p.id for p in self.products.all()])
+        return Saving.objects.filter(product__product_groups=self)
+
+    def load_date_range(self):
+        """
+        the earliest first date and the latest last date of the products
+        :return: a tuple of two date objects, either of them None when
+        the date of any of the products is not known
+        """
+        products = self.product_list()
+        try:
+            first_date = min(p.first_date for p in products)
+        except ValueError:
+            first_date = None
+        try:
+            last_date = max(p.last_date for p in products)
+        except ValueError:
+            last_date = None
+        return first_date, last_date
+
+    def date_range(self):
+        """
+        the first and last dates, shared by the unit of work in progress
+        if any, see `load_date_range`
+        """
+        unit = current_unit_of_work()
+        if unit is not None:
+            return unit.date_range(self)
+        return self.load_date_range()
 
     @property
     def first_date(self):
-        return min([p.first_date for p in self.products.all()])
+        """
+        :return: a date object
+        :raises: ValueError when the first date of any of the products
+        is not known
+        """
+        first_date, _ = self.date_range()
+        if first_date is None:
+            raise ValueError('no first date for {}'.format(self))
+        return first_date
 
     @property
     def last_date(self):
-        return max([p.last_date for p in self.products.all()])
+        """
+        :return: a date object
+        :raises: ValueError when the last date of any of the products
+        is not known
+        """
+        _, last_date = self.date_range()
+        if last_date is None:
+            raise ValueError('no last date for {}'.format(self))
+        return last_date
 
     def budget(self, on=None):
-        return sum([p.budget(on) for p in self.products.all()])
+        """
+        get the total budget of the products on a date
+        :param on: optional date object. if empty use today's date
+        :return: a decimal for the budget
+        """
+        if not on:
+            on = date.today()
+        return self.budget_timeline().on(on)
+
+    def load_budget_timeline(self):
+        """
+        the budgets of the products in one query, merged into one timeline
+        """
+        budgets = defaultdict(list)
+        for budget in self.budgets:
+            budgets[budget.product_id].append(budget)
+        return BudgetTimeline.merge([
+            BudgetTimeline.of_budgets(product_budgets)
+            for product_budgets in budgets.values()
+        ])
 
     @property
     def costs(self):
-        return Cost.objects.filter(
-            product_id__in=[p.id for p in self.products.all()])
+        return Cost.objects.filter(product__product_groups=self)
 
     def cost_to_date(self, calculation_start_date=None):
-        return sum([p.cost_to_date(calculation_start_date) for p in self.products.all()])
+        return sum([p.cost_to_date(calculation_start_date)
+                    for p in self.product_list()])
 
     def total_cost(self, calculation_start_date):
-        return sum([p.total_cost(calculation_start_date) for p in self.products.all()])
+        return sum([p.total_cost(calculation_start_date)
+                    for p in self.product_list()])
 
     @property
     def area(self):
-        areas = [p.area for p in self.products.all() if p.area]
+        areas = [p.area for p in self.product_list() if p.area]
         if len({c.id for c in areas}) == 1:
             return areas[0]
 
     @property
     def links(self):
-        return Link.objects.filter(
-            product_id__in=[p.id for p in self.products.visible()])
+        return Link.objects.filter(product__in=self.products.visible())
 
     @property
     def final_budget(self):
-        return sum(p.final_budget for p in self.products.all())
+        return sum(p.final_budget for p in self.product_list())
 
     def current_fte(self, start_date=None, end_date=None):
         """
@@ -823,7 +1156,7 @@ class ProductGroup(BaseProduct):
         if not specified, use the date of yesterday.
         """
         return sum(p.current_fte(start_date, end_date)
-                   for p in self.products.all())
+                   for p in self.product_list())
 
     def people_costs(self, start_date, end_date, contractor_only=False,
                      non_contractor_only=False, calculation_start_date=None):
@@ -840,11 +1173,11 @@ class ProductGroup(BaseProduct):
         """
         return sum(p.people_costs(start_date, end_date, contractor_only,
                                   non_contractor_only, calculation_start_date)
-                   for p in self.products.filter(visible=True))
+                   for p in self.visible_products())
 
     def additional_costs(self, start_date, end_date):
         return sum(p.additional_costs(start_date, end_date) for p in
-                   self.products.filter(visible=True))
+                   self.visible_products())
 
     def savings_between(self, start_date=None, end_date=None):
         """
@@ -856,7 +1189,40 @@ class ProductGroup(BaseProduct):
         if not specified, use the date of today.
         """
         return sum(p.savings_between(start_date, end_date) for p in
-                   self.products.filter(visible=True))
+                   self.visible_products())
+
+    def compute_stats_in_windows(self, time_windows,
+                                 calculation_start_date=None):
+        """
+        work out key statistics in many time windows by adding up those of
+        the products, which are found in their cache or worked out together,
+        see `stats_in_windows`. the budget is that of the group.
+        :return: a dictionary of time window to the stats in it
+        """
+        result = {
+            time_window: {
+                'contractor': Decimal('0'),
+                'non-contractor': Decimal('0'),
+                'additional': Decimal('0'),
+                'savings': Decimal('0'),
+            }
+            for time_window in time_windows
+        }
+        for product in self.visible_products():
+            product_stats = product.stats_in_windows(
+                time_windows, calculation_start_date=calculation_start_date)
+            for time_window, stats in result.items():
+                for name in stats:
+                    stats[name] += product_stats[time_window][name]
+
+        budgets = self.budget_timeline()
+        for (start_date, end_date), stats in result.items():
+            stats['total'] = (stats['contractor'] + stats['non-contractor'] +
+                              stats['additional'])
+            # same as `stats_between`, the budget on the next day
+            stats['budget'] = budgets.on(end_date + timedelta(days=1))
+            stats['remaining'] = stats['budget'] - stats['total']
+        return result
 
 
 class Status(models.Model):
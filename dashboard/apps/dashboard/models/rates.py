@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+rates of many people worked out in memory
+"""
+from bisect import bisect_right
+from collections import defaultdict, OrderedDict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from dashboard.libs.rate_converter import (
+    RATE_TYPES, dec_workdays, average_rate_from_segments, last_date_in_month)
+from ..constants import COST_TYPES
+from .cost import AditionalCostsMixin, Rate, PersonCost
+
+
+class PersonRates():
+    """
+    the rates and additional costs of a list of people, loaded in two
+    queries. the methods give the same results as those of `Person`
+    with the same names.
+    """
+
+    def __init__(self, persons=()):
+        """
+        :param persons: a list or queryset of person objects
+        """
+        self.rates = defaultdict(list)
+        self.rate_dates = {}
+        self.costs = defaultdict(list)
+        self.loaded = set()
+        self.load(persons)
+
+    def load(self, persons):
+        """
+        load the rates and additional costs of more people
+        :param persons: a list or queryset of person objects
+        """
+        person_ids = {person.id for person in persons} - self.loaded
+        if not person_ids:
+            return
+        self.loaded |= person_ids
+        for rate in Rate.objects.filter(
+                person_id__in=person_ids).order_by('start_date'):
+            self.rates[rate.person_id].append(rate)
+        for person_id in person_ids:
+            self.rate_dates[person_id] = [
+                rate.start_date for rate in self.rates[person_id]]
+        for cost in PersonCost.objects.filter(person_id__in=person_ids):
+            self.costs[cost.person_id].append(cost)
+
+    def rate_object_on(self, person, on):
+        """
+        same as `person.rates.on(on)`
+        :return: a rate object or None
+        """
+        idx = bisect_right(self.rate_dates.get(person.id, []), on)
+        if idx:
+            return self.rates[person.id][idx - 1]
+
+    def rates_between(self, person, start_date, end_date):
+        """
+        same as `person.rates.between(start_date, end_date)`
+        :return: a list of rate objects
+        """
+        rates = [rate for rate in self.rates[person.id]
+                 if start_date < rate.start_date <= end_date]
+        first = self.rate_object_on(person, start_date)
+        if first:
+            rates.insert(0, first)
+        return rates
+
+    def rate_type(self, person):
+        rate = self.rate_object_on(person, date.today())
+        if rate:
+            return RATE_TYPES.for_value(rate.rate_type).display
+
+    def _costs_in(self, person, start_date, end_date, name=None):
+        costs = AditionalCostsMixin.costs_in(
+            self.costs[person.id], start_date, end_date)
+        if name and isinstance(name, str):
+            costs = [cost for cost in costs if cost.name == name]
+        return costs
+
+    def additional_rate(self, person, start_date, end_date, name=None,
+                        predict_based_on=None):
+        costs = self._costs_in(person, start_date, end_date, name=name)
+        if not person.is_contractor and not costs:
+            # estimate from the last set of monthly costs, same as
+            # `Person.additional_rate`
+            rate = self.rate_object_on(
+                person, predict_based_on or date.today())
+            if rate:
+                start_date = rate.start_date
+                end_date = last_date_in_month(rate.start_date)
+                costs = [
+                    cost for cost in self._costs_in(
+                        person, start_date, end_date, name=name)
+                    if cost.type == COST_TYPES.MONTHLY
+                ]
+
+        if not costs:
+            return Decimal('0')
+
+        # ordered by end date descending with no end date first, which
+        # is how postgres orders nulls
+        last_cost = max(
+            costs, key=lambda c: (c.end_date is None, c.end_date or date.min))
+        if last_cost.end_date:
+            if last_cost.end_date <= end_date:
+                end_date = last_cost.end_date
+            if last_cost.end_date <= start_date:
+                start_date = last_cost.start_date
+        return sum([c.rate_between(start_date, end_date) for c in costs])
+
+    def base_rate_between(self, person, start_date, end_date):
+        rate_list = self.rates_between(person, start_date, end_date)
+        segments = []
+        for n, rate in enumerate(rate_list):
+            start = max(rate.start_date, start_date)
+            try:
+                end = rate_list[n + 1].start_date - timedelta(days=1)
+            except IndexError:
+                end = end_date
+            segments.append(
+                (start, end, rate.rate_between(start, end))
+            )
+
+        total_workdays = dec_workdays(start_date, end_date)
+        average_rate = average_rate_from_segments(segments, total_workdays)
+        return average_rate or Decimal('0')
+
+    def rate_between(self, person, start_date, end_date):
+        average_rate = self.base_rate_between(person, start_date, end_date)
+        if not average_rate:
+            return Decimal('0')
+        return average_rate + self.additional_rate(
+            person, start_date, end_date)
+
+    def base_rate_on(self, person, on):
+        rate = self.rate_object_on(person, on)
+        if not rate:
+            return Decimal('0')
+        return rate.rate_on(on)
+
+    def rate_on(self, person, on):
+        base_rate = self.base_rate_on(person, on)
+        if not base_rate:
+            return Decimal('0')
+        return base_rate + self.additional_rate(person, on, on)
+
+    def of(self, person):
+        """
+        :return: the rates of a person with the same interface as
+        the person, e.g. for `Task.people_costs`
+        """
+        return PersonRatesOf(self, person)
+
+
+class PersonRatesOf():
+    """
+    the rates of one person in a `PersonRates`
+    """
+
+    def __init__(self, person_rates, person):
+        self.person_rates = person_rates
+        self.person = person
+
+    def rate_between(self, start_date, end_date):
+        return self.person_rates.rate_between(
+            self.person, start_date, end_date)
+
+    def additional_rate(self, start_date, end_date, name=None,
+                        predict_based_on=None):
+        return self.person_rates.additional_rate(
+            self.person, start_date, end_date, name=name,
+            predict_based_on=predict_based_on)
+
+
+def people_costs_breakdown(tasks, start_date, end_date, names=(),
+                           rates=None, task_window=None):
+    """
+    people costs of tasks in a time window broken down by person, with
+    the rates of all the people loaded at once
+    :param tasks: a list or queryset of tasks
+    :param start_date: start date of the time window, a date object
+    :param end_date: end date of the time window, a date object
+    :param names: names of the additional costs to break the costs down by
+    :param rates: optional `PersonRates` object with the rates of the people
+    of the tasks already loaded
+    :param task_window: optional callable taking a task and returning the
+    time window to count it in, instead of the same time window for all
+    :return: an ordered dictionary of person to a dictionary of 'days',
+    'total', 'additional' for all additional costs, 'base' for the total
+    without additional costs and the additional costs of each of the names
+    """
+    tasks = list(tasks)
+    if rates is None:
+        rates = PersonRates({task.person for task in tasks})
+    breakdown = OrderedDict()
+    for task in tasks:
+        if task_window:
+            time_window = task_window(task)
+        else:
+            time_window = (start_date, end_date)
+        detail = breakdown.setdefault(task.person, defaultdict(Decimal))
+        detail['days'] += task.time_spent(*time_window)
+        costs = task.people_costs_breakdown(
+            *time_window, names=names, rates=rates.of(task.person))
+        for key, cost in costs.items():
+            detail[key] += cost
+    for detail in breakdown.values():
+        detail['base'] = detail['total'] - detail['additional']
+    return breakdown
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+tasks indexed by the time they span, for finding the tasks in many time
+windows without a query for each
+"""
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+
+def _effective_end_date(task):
+    # repeating tasks without a repeat end are left out by
+    # `TaskManager.between` too
+    if task.repeat_state > 0 and not task.repeat_end:
+        return None
+    return task.effective_end_date
+
+
+class TaskIndex():
+    """
+    tasks sorted by start date together with the effective end date of
+    each of them, which includes the weekly repeats. the tasks overlapping
+    a time window start between the start of the time window minus the
+    longest span of a task and the end of the time window, which are
+    found by bisection.
+    """
+
+    def __init__(self, tasks):
+        """
+        :param tasks: a list or queryset of tasks
+        """
+        spans = [
+            (task.start_date, end_date, task) for task, end_date in (
+                (task, _effective_end_date(task)) for task in tasks)
+            if end_date
+        ]
+        spans.sort(key=lambda span: span[0])
+        self.start_dates = [start_date for start_date, _, _ in spans]
+        self.end_dates = [end_date for _, end_date, _ in spans]
+        self.tasks = [task for _, _, task in spans]
+        self.longest = max(
+            (end_date - start_date for start_date, end_date, _ in spans),
+            default=timedelta(0))
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def between(self, start_date, end_date):
+        """
+        same tasks as `TaskManager.between` with both dates
+        :param start_date: a date object for the start of the time window
+        :param end_date: a date object for the end of the time window
+        :return: a list of tasks
+        """
+        low = bisect_left(self.start_dates, start_date - self.longest)
+        high = bisect_right(self.start_dates, end_date)
+        return [
+            self.tasks[idx] for idx in range(low, high)
+            if self.end_dates[idx] >= start_date
+        ]
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+a unit of work for a request, an export or a celery task, in which each
+person and their rates and costs, the tasks and budgets of each
+product and the products of each product group are loaded from the
+database once
+"""
+from contextlib import contextmanager
+import threading
+
+from .person import Person
+from .rates import PersonRates
+from .task_index import TaskIndex
+
+_local = threading.local()
+
+
+class UnitOfWork():
+    """
+    identity map of people together with their rates and costs, the
+    tasks and budgets of products and the products of product groups.
+    changes made to them in the database during the unit of work are not
+    picked up, so it is meant for reading.
+    """
+
+    def __init__(self):
+        self.persons = {}
+        self.rates = PersonRates()
+        self.task_indexes = {}
+        self.budget_timelines = {}
+        self.group_products = {}
+        self.date_ranges = {}
+
+    def load_persons(self, person_ids):
+        """
+        load the people not in the identity map yet and their rates and
+        costs, three queries for any number of people
+        :param person_ids: an iterable of person ids
+        """
+        missing = set(person_ids) - set(self.persons)
+        if missing:
+            persons = Person.objects.in_bulk(missing)
+            self.persons.update(persons)
+            self.rates.load(persons.values())
+
+    def person(self, person_id):
+        """
+        :return: the person object of the id
+        """
+        self.load_persons([person_id])
+        return self.persons[person_id]
+
+    def rates_of(self, person_id):
+        """
+        :return: the rates of a person, see `PersonRates.of`
+        """
+        return self.rates.of(self.person(person_id))
+
+    def task_index(self, product):
+        """
+        :return: the tasks of a product, see `TaskIndex`
+        """
+        if product.id not in self.task_indexes:
+            self.task_indexes[product.id] = TaskIndex(product.tasks.all())
+        return self.task_indexes[product.id]
+
+    def budget_timeline(self, product):
+        """
+        :param product: a product or product group
+        :return: the budgets of it, see `BudgetTimeline`
+        """
+        key = (type(product), product.id)
+        if key not in self.budget_timelines:
+            self.budget_timelines[key] = product.load_budget_timeline()
+        return self.budget_timelines[key]
+
+    def products_of(self, product_group):
+        """
+        :return: the products in a product group, see
+        `ProductGroup.load_products`
+        """
+        if product_group.id not in self.group_products:
+            self.group_products[product_group.id] = (
+                product_group.load_products())
+        return self.group_products[product_group.id]
+
+    def date_range(self, product_group):
+        """
+        :return: the first and last dates of a product group, see
+        `ProductGroup.load_date_range`
+        """
+        if product_group.id not in self.date_ranges:
+            self.date_ranges[product_group.id] = (
+                product_group.load_date_range())
+        return self.date_ranges[product_group.id]
+
+
+def current_unit_of_work():
+    """
+    :return: the unit of work in progress in this thread or None
+    """
+    return getattr(_local, 'unit_of_work', None)
+
+
+@contextmanager
+def unit_of_work():
+    """
+    run a block, or a function when used as decorator, in a unit of work.
+    a unit of work already in progress is carried on.
+    """
+    unit = current_unit_of_work()
+    if unit is not None:
+        yield unit
+        return
+    _local.unit_of_work = UnitOfWork()
+    try:
+        yield _local.unit_of_work
+    finally:
+        _local.unit_of_work = None
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from django.db import connection, models, transaction
+
+from dashboard.libs.date_tools import get_bank_holidays
+
+
+class WorkdayCalendarManager(models.Manager):
+
+    @transaction.atomic
+    def populate(self, start_date, end_date):
+        """
+        (re)build the calendar so that it covers at least the time window
+        defined by start date and end date. the existing coverage is kept,
+        which makes sure the workday ordinals stay contiguous. only the days
+        missing or changed are written, in one transaction, so readers never
+        see a partly built calendar.
+        :param start_date: a date object for the start of the time window
+        :param end_date: a date object for the end of the time window
+        :return: number of days in the calendar
+        """
+        # two runs wait for each other here, so that they do not insert
+        # the same days. locking rows would not cover the missing days
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))',
+                           [self.model._meta.db_table])
+        existing = {
+            day: (is_workday, ordinal)
+            for day, is_workday, ordinal in self.values_list(
+                'date', 'is_workday', 'workday_ordinal')
+        }
+        if existing:
+            start_date = min(start_date, min(existing))
+            end_date = max(end_date, max(existing))
+        bank_holidays = set(get_bank_holidays())
+        days = []
+        ordinal = 0
+        for offset in range((end_date - start_date).days + 1):
+            day = start_date + timedelta(days=offset)
+            is_workday = day.weekday() < 5 and day not in bank_holidays
+            ordinal += is_workday
+            if existing.get(day) != (is_workday, ordinal):
+                days.append(self.model(
+                    date=day, is_workday=is_workday, workday_ordinal=ordinal))
+        # changed days, e.g. after a new bank holiday which shifts the
+        # later ordinals, are deleted and inserted again with the new ones
+        changed = [day.date for day in days if day.date in existing]
+        if changed:
+            self.filter(date__in=changed).delete()
+        self.bulk_create(days, batch_size=1000)
+        return (end_date - start_date).days + 1
+
+
+class WorkdayCalendar(models.Model):
+    """
+    one row per calendar day. `workday_ordinal` is the cumulative number
+    of workdays from the start of the calendar up to and including the day,
+    so the number of workdays in a time window can be worked out in the
+    database from the rows of its start date and end date.
+    """
+    date = models.DateField(primary_key=True)
+    is_workday = models.BooleanField()
+    workday_ordinal = models.PositiveIntegerField()
+
+    objects = WorkdayCalendarManager()
+
+    class Meta:
+        ordering = ('date',)
+
+    def __str__(self):
+        return self.date.strftime('%Y-%m-%d')
@@ -1,9 +1,31 @@
 # -*- coding: utf-8 -*-
+from decimal import Decimal
+
 from rest_framework import serializers
 
 from .models import Person, Product, Department, Skill
 
 
+def current_persons():
+    """
+    queryset of current persons with everything `PersonSerializer` needs
+    """
+    return Person.objects.filter(is_current=True).select_related(
+        'department').prefetch_related('skills')
+
+
+def _current_persons_of(instance):
+    """
+    current persons of a department or a skill. use the prefetched
+    `current_persons` if available.
+    """
+    try:
+        return instance.current_persons
+    except AttributeError:
+        return current_persons().filter(
+            id__in=instance.persons.values('id'))
+
+
 class PersonProductSerializer(serializers.ModelSerializer):
 
     time_spent = serializers.SerializerMethodField()
@@ -12,7 +34,10 @@ class PersonProductSerializer(serializers.ModelSerializer):
         person = self.context['person']
         start_date = self.context['start_date']
         end_date = self.context.get('end_date')
-        days = person.time_on_product(obj, start_date, end_date)
+        if 'time_on_products' in self.context:
+            days = self.context['time_on_products'].get(obj.id, Decimal('0'))
+        else:
+            days = person.time_on_product(obj, start_date, end_date)
         return {
             'from': start_date,
             'to': end_date,
@@ -30,7 +55,7 @@ class SkillSerializer(serializers.ModelSerializer):
 
     def get_persons(self, instance):
         return PersonSerializer(
-            instance.persons.filter(is_current=True),
+            _current_persons_of(instance),
             read_only=True,
             many=True
         ).data
@@ -46,7 +71,7 @@ class DepartmentSerializer(serializers.ModelSerializer):
 
     def get_persons(self, instance):
         return PersonSerializer(
-            instance.persons.filter(is_current=True),
+            _current_persons_of(instance),
             read_only=True,
             many=True
         ).data
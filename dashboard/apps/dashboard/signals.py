@@ -4,12 +4,18 @@ import urllib.parse
 from django.utils.html import strip_tags
 from django.conf import settings
 from django.dispatch import receiver
+from django.contrib.admin.models import LogEntry
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_save, post_delete
 from django.template.loader import get_template
 from django.core.mail import send_mail
 
-from .models import Person
+from dashboard.libs.cache_tools import (
+    mark_data_version, CACHE_GENERATION_KEY)
+from .models import (
+    Person, Product, ProductGroup, ProductStatus, ProductGroupStatus)
 
 
 @receiver(post_save, sender=Person)
@@ -38,3 +44,58 @@ def send_email_on_person_creation(sender, **kwargs):
         emails,
         html_message=html
     )
+
+
+@receiver(post_save, sender=LogEntry)
+def record_product_update(sender, instance, **kwargs):
+    """
+    keep `last_updated` of products and product groups up to date
+    """
+    if kwargs.get('raw') or instance.content_type_id is None:
+        return
+    try:
+        model = ContentType.objects.get_for_id(
+            instance.content_type_id).model_class()
+    except ContentType.DoesNotExist:
+        return
+    if model in (Product, ProductGroup):
+        model(pk=instance.object_id).record_update(instance.action_time)
+
+
+@receiver(post_save, sender=LogEntry)
+def mark_admin_change(sender, **kwargs):
+    """
+    change the data version of the json endpoints on any change made in
+    the admin
+    """
+    if kwargs.get('raw'):
+        return
+    mark_data_version(CACHE_GENERATION_KEY)
+
+
+@receiver([post_save, post_delete], sender=ProductStatus)
+def update_product_status(sender, instance, **kwargs):
+    """
+    keep `current_status` of the product up to date
+    """
+    if kwargs.get('raw'):
+        return
+    try:
+        product = instance.product
+    except ObjectDoesNotExist:  # deleted together with its statuses
+        return
+    product.update_current_status()
+
+
+@receiver([post_save, post_delete], sender=ProductGroupStatus)
+def update_product_group_status(sender, instance, **kwargs):
+    """
+    keep `current_status` of the product group up to date
+    """
+    if kwargs.get('raw'):
+        return
+    try:
+        product_group = instance.product_group
+    except ObjectDoesNotExist:  # deleted together with its statuses
+        return
+    product_group.update_current_status()
@@ -1,25 +1,31 @@
 # -*- coding: utf-8 -*-
-from datetime import date
+from datetime import date, timedelta
 
-from openpyxl.styles import Style, Font
-from openpyxl.workbook import Workbook
-
-from dashboard.libs.date_tools import parse_date
+from dashboard.libs.date_tools import parse_date, financial_year_tuple
 from .models import Person
+from .models.rates import PersonRates
 
 
 CURRENCY_FORMAT = '£#,##0.00'
 
 
 class Products:
-
-    date_style = Style(number_format='DD/MM/YYYY')
-    header_style = Style(font=Font(bold=True))
-    currency_style = Style(number_format='£#,##0.00')
+    """
+    spreadsheet of products in write only mode. rows are generated one at
+    a time and written to a temporary file by openpyxl, so the workbook is
+    never held in memory as a whole.
+    """
 
     def __init__(self, products, calculation_start_date=None):
-        self.workbook = Workbook()
-        self.fill_main_sheet(self.workbook.active, products, calculation_start_date)
+        # openpyxl is imported when a spreadsheet is made, rather than when
+        # the admin loads the report forms using this module on start up
+        from openpyxl.styles import Style, Font
+        from openpyxl.workbook import Workbook
+        self.date_style = Style(number_format='DD/MM/YYYY')
+        self.header_style = Style(font=Font(bold=True))
+        self.currency_style = Style(number_format='£#,##0.00')
+        self.workbook = Workbook(write_only=True)
+        self.fill_main_sheet(self.workbook.create_sheet(), products, calculation_start_date)
         # create the monthly spend sheet when there is one product.
         # there is no use case for monthly spend sheet for multiple
         # products. if it's needed, column alignment needs to be
@@ -28,7 +34,46 @@ class Products:
             self.fill_monthly_spend_sheet(
                 self.workbook.create_sheet(), products[0], calculation_start_date)
 
-    def fill_product_info(self, product, sheet, row, calculation_start_date, include_header=False):
+    def cell(self, sheet, value, style=None):
+        """
+        a cell for a write only sheet
+        """
+        from openpyxl.writer.write_only import WriteOnlyCell
+        cell = WriteOnlyCell(sheet, value=value)
+        if style:
+            cell.style = style
+        return cell
+
+    def product_fields(self, product, calculation_start_date):
+        """
+        :return: a list of (header, style, value) for a product
+        """
+        # costs and FTE of the stages and costs of the financial years in
+        # one go
+        stages = [
+            (product.discovery_date, product.alpha_date),
+            (product.alpha_date, product.beta_date),
+            (product.beta_date, product.live_date),
+            (product.live_date, product.end_date),
+        ]
+        stage_windows = [
+            (start, end - timedelta(days=1)) if start and end else None
+            for start, end in stages
+        ]
+        years = [date.today().year + offset for offset in range(-2, 2)]
+        year_windows = [financial_year_tuple(year) for year in years]
+        stats = product.stats_in_windows(
+            [tw for tw in stage_windows[:3] if tw] + year_windows,
+            calculation_start_date=calculation_start_date)
+        ftes = product.fte_in_windows([tw for tw in stage_windows if tw])
+
+        def _total(time_window):
+            if time_window:
+                return stats[time_window]['total']
+
+        def _fte(time_window):
+            if time_window:
+                return ftes[time_window]
 
         fields = [
             # (header, style, value)
@@ -41,27 +86,20 @@ class Products:
             ('Beta date', self.date_style, product.beta_date),
             ('Live date', self.date_style, product.live_date),
             ('End date', self.date_style, product.end_date),
-            ('Discovery fte', None, product.discovery_fte),
-            ('Alpha fte', None, product.alpha_fte),
-            ('Beta fte', None, product.beta_fte),
-            ('Live fte', None, product.live_fte),
+            ('Discovery fte', None, _fte(stage_windows[0])),
+            ('Alpha fte', None, _fte(stage_windows[1])),
+            ('Beta fte', None, _fte(stage_windows[2])),
+            ('Live fte', None, _fte(stage_windows[3])),
             ('Final budget', self.currency_style, product.final_budget),
-            ('Cost of discovery', self.currency_style,
-             product.cost_of_discovery(calculation_start_date=calculation_start_date)),
-            ('Cost of alpha', self.currency_style,
-             product.cost_of_alpha(calculation_start_date=calculation_start_date)),
-            ('Cost of beta', self.currency_style,
-             product.cost_of_beta(calculation_start_date=calculation_start_date))
+            ('Cost of discovery', self.currency_style, _total(stage_windows[0])),
+            ('Cost of alpha', self.currency_style, _total(stage_windows[1])),
+            ('Cost of beta', self.currency_style, _total(stage_windows[2])),
         ]
 
-        def _financial_year_col(year):
-            header = 'Cost in FY {}-{}'.format(str(year)[2:], str(year + 1)[2:])
-            return header, self.currency_style, product.cost_in_fy(
-                year, calculation_start_date=calculation_start_date)
-
         fields += [
-            _financial_year_col(date.today().year + offset)
-            for offset in range(-2, 2)
+            ('Cost in FY {}-{}'.format(str(year)[2:], str(year + 1)[2:]),
+             self.currency_style, _total(time_window))
+            for year, time_window in zip(years, year_windows)
         ]
 
         fields += [
@@ -71,19 +109,19 @@ class Products:
             ('Savings enabled', self.currency_style, product.savings_enabled),
             ('Visible', None, product.visible),
         ]
-
-        for idx, (header, style, value) in enumerate(fields):
-            column = idx + 1
-            if include_header:
-                header_cell = sheet.cell(row=row, column=column)
-                header_cell.style = self.header_style
-                header_cell.value = header
-                body_cell = sheet.cell(row=row + 1, column=column)
-            else:
-                body_cell = sheet.cell(row=row, column=column)
-            body_cell.value = value
-            if style:
-                body_cell.style = style
+        return fields
+
+    def product_rows(self, sheet, products, calculation_start_date):
+        """
+        generate the header row followed by a row for each product
+        """
+        for idx, product in enumerate(products):
+            fields = self.product_fields(product, calculation_start_date)
+            if idx == 0:
+                yield [self.cell(sheet, header, self.header_style)
+                       for header, _, _ in fields]
+            yield [self.cell(sheet, value, style)
+                   for _, style, value in fields]
 
     def fill_main_sheet(self, sheet, products, calculation_start_date):
         sheet.title = 'Products info'
@@ -91,36 +129,33 @@ class Products:
         # row 1 i.e. header, will always be viewable,
         # no matter where the user scrolls in the spreadsheet
         sheet.freeze_panes = 'A2'
-
-        # fill first product together with headers
-        self.fill_product_info(
-            products[0], sheet, 1, calculation_start_date, include_header=True)
-        row = 3
-        for product in products[1:]:
-            self.fill_product_info(product, sheet, row, calculation_start_date)
-            row += 1
+        for row in self.product_rows(sheet, products, calculation_start_date):
+            sheet.append(row)
 
     def fill_monthly_spend_sheet(self, sheet, product, calculation_start_date):
         sheet.title = 'Monthly spend'
         time_frames = product.profile(
             freq='MS', calculation_start_date=calculation_start_date
         )['financial']['time_frames']
-        row_names = ['budget', 'savings', 'total', 'remaining']
-        for idx, name in enumerate(row_names):
-            row_header = sheet.cell(row=idx + 2, column=1)
-            row_header.style = self.header_style
-            row_header.value = name
-
-        for idx, time_frame in enumerate(sorted(time_frames.keys())):
-            column = idx + 2
-            col_header = sheet.cell(row=1, column=column)
-            col_header.style = self.header_style
-            col_header.value = parse_date(time_frame.split('~')[0]).strftime('%b %y')
-
-            for idx, row_name in enumerate(row_names):
-                cell = sheet.cell(row=idx + 2, column=column)
-                cell.style = self.currency_style
-                cell.value = round(time_frames[time_frame][row_name], 0)
+        time_frames = sorted(time_frames.items())
+        sheet.append([None] + [
+            self.cell(
+                sheet,
+                parse_date(key.split('~')[0]).strftime('%b %y'),
+                self.header_style)
+            for key, _ in time_frames
+        ])
+        for row_name in ['budget', 'savings', 'total', 'remaining']:
+            sheet.append([self.cell(sheet, row_name, self.header_style)] + [
+                self.cell(sheet, round(stats[row_name], 0), self.currency_style)
+                for _, stats in time_frames
+            ])
+
+    def save(self, fileobj):
+        """
+        save the workbook into a file object
+        """
+        self.workbook.save(fileobj)
 
 
 class Export():
@@ -129,42 +164,43 @@ class Export():
         self.title = title
 
     def export(self):
+        from openpyxl.workbook import Workbook
         wb = Workbook()
         self.write(wb)
         return wb
 
     def write(self, wb):
+        from openpyxl.styles import Style, Font
         bold_font = Font(bold=True)
         bold_style = Style(font=bold_font)
         currency_style = Style(number_format=CURRENCY_FORMAT)
 
+        people = list(Person.objects.all())
+        rates = PersonRates(people)
+        on = self.cleaned_data['date']
+
         fields = (
-            ('Name', 'name', {}, None),
-            ('Type', 'type', {}, None),
-            ('Current', 'is_current', {}, None),
-            ('Rate', 'base_rate_on', {'on': self.cleaned_data['date']},
+            ('Name', lambda person: person.name, None),
+            ('Type', lambda person: person.type, None),
+            ('Current', lambda person: person.is_current, None),
+            ('Rate', lambda person: rates.base_rate_on(person, on),
              currency_style),
-            ('Rate Type', 'rate_type', {}, None),
-            ('Applied Daily Rate', 'rate_on', {'on': self.cleaned_data['date']},
+            ('Rate Type', rates.rate_type, None),
+            ('Applied Daily Rate', lambda person: rates.rate_on(person, on),
              currency_style),
         )
 
         sheet = wb.active
         sheet.title = self.title
-        for col, (heading, f, kwargs, style) in enumerate(fields):
+        for col, (heading, f, style) in enumerate(fields):
             cell = sheet.cell(row=1, column=col + 1)
             cell.style = bold_style
             cell.value = heading
         sheet.freeze_panes = sheet['A2']
 
-        people = Person.objects.filter()
-
-        for row, product in enumerate(people):
-            for col, (heading, f, kwargs, style) in enumerate(fields):
-                val = getattr(product, f)
-                if callable(val):
-                    val = val(**kwargs)
+        for row, person in enumerate(people):
+            for col, (heading, f, style) in enumerate(fields):
                 cell = sheet.cell(row=row + 2, column=col + 1)
                 if style:
                     cell.style = style
-                cell.value = val
+                cell.value = f(person)
@@ -6,11 +6,14 @@ import logging
 from django.core.cache import cache
 from django.core.management import call_command
 from django.conf import settings
+from django.utils import timezone
 
 from celery import shared_task, group
 from celery.task import periodic_task
 
-from .models import Product
+from .models import Product, ProductGroup
+from .constants import EXPORT_STATUSES
+from .models.export import ExportJob, export_storage
 from .management.commands.cache import Command
 
 
@@ -49,6 +52,21 @@ def sync_float():
     cache_products.delay()
 
 
+@periodic_task(run_every=timedelta(days=1))
+@single_instance_task(60*10)
+def refresh_workday_calendar():
+    call_command('workdays')
+
+
+@periodic_task(run_every=timedelta(days=1))
+@single_instance_task(60*10)
+def refresh_current_statuses():
+    today = date.today()
+    for model in [Product, ProductGroup]:
+        for obj in model.objects.filter(current_status_until__lte=today):
+            obj.update_current_status()
+
+
 @shared_task()
 @single_instance_task(60*10)
 def cache_products():
@@ -69,3 +87,24 @@ def cache_product(product_id):
 
     logging.info('- generating caching for product "%s"', product)
     Command.generate(product)
+
+
+@shared_task()
+def run_export_job(job_id):
+    job = ExportJob.objects.get(pk=job_id)
+    logging.info('- running %s', job)
+    job.run()
+
+
+@periodic_task(run_every=timedelta(days=1))
+@single_instance_task(60*10)
+def remove_old_export_jobs():
+    storage = export_storage()
+    ExportJob.objects.expire_stalled()
+    # a job still running is left for its worker to finish
+    for job in ExportJob.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=1)).exclude(
+                status=EXPORT_STATUSES.RUNNING):
+        if job.file:
+            storage.delete(job.file)
+        job.delete()
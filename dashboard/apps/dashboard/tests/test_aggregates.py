@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import pytest
+from model_mommy import mommy
+
+from dashboard.libs.date_tools import slice_time_window
+from dashboard.apps.dashboard.constants import COST_TYPES
+from dashboard.apps.dashboard.models import (
+    Product, Person, Rate, PersonCost, Task, WorkdayCalendar)
+from dashboard.apps.dashboard.models.aggregates import (
+    aggregate_people_costs, people_costs_in_windows)
+
+
+def make_products():
+    products = [mommy.make(Product) for _ in range(2)]
+    contractor = mommy.make(Person, is_contractor=True)
+    non_contractor = mommy.make(Person, is_contractor=False)
+    multi_rate = mommy.make(Person, is_contractor=False)
+    with_costs = mommy.make(Person, is_contractor=False)
+    mommy.make(Rate, person=contractor, rate=Decimal('400'),
+               start_date=date(2016, 1, 1))
+    mommy.make(Rate, person=non_contractor, rate=Decimal('333.33'),
+               start_date=date(2016, 1, 1))
+    mommy.make(Rate, person=multi_rate, rate=Decimal('300'),
+               start_date=date(2016, 1, 1))
+    mommy.make(Rate, person=multi_rate, rate=Decimal('320'),
+               start_date=date(2016, 3, 15))
+    mommy.make(Rate, person=with_costs, rate=Decimal('250'),
+               start_date=date(2016, 1, 1))
+    mommy.make(PersonCost, person=with_costs, name='ERNIC',
+               type=COST_TYPES.MONTHLY, cost=Decimal('42'),
+               start_date=date(2016, 2, 1), end_date=date(2016, 2, 29))
+
+    simple_tasks = []
+    for product in products:
+        for person in [contractor, non_contractor]:
+            for sdate, edate, days in [
+                    (date(2016, 1, 4), date(2016, 1, 29), Decimal('10')),
+                    (date(2016, 2, 22), date(2016, 3, 11), Decimal('7.5')),
+                    (date(2016, 3, 24), date(2016, 4, 1), Decimal('3.25')),
+            ]:
+                simple_tasks.append(mommy.make(
+                    Task, product=product, person=person, start_date=sdate,
+                    end_date=edate, days=days))
+        mommy.make(Task, product=product, person=multi_rate,
+                   start_date=date(2016, 3, 1), end_date=date(2016, 3, 31),
+                   days=Decimal('15'))
+        mommy.make(Task, product=product, person=with_costs,
+                   start_date=date(2016, 1, 25), end_date=date(2016, 2, 12),
+                   days=Decimal('6'))
+        mommy.make(Task, product=product, person=contractor,
+                   start_date=date(2016, 1, 4), end_date=date(2016, 1, 5),
+                   repeat_state=Task.WEEKLY, repeat_end=date(2016, 3, 28),
+                   days=Decimal('1'))
+    return products, simple_tasks
+
+
+def python_people_costs(product, start_date, end_date,
+                        calculation_start_date=None):
+    costs = {'contractor': Decimal('0'), 'non-contractor': Decimal('0')}
+    for task in product.tasks.between(start_date, end_date):
+        key = 'contractor' if task.person.is_contractor else 'non-contractor'
+        costs[key] += task.people_costs(
+            start_date, end_date,
+            calculation_start_date=calculation_start_date)
+    return costs
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('calculation_start_date', [
+    None, date(2016, 2, 10), date(2017, 1, 1)])
+def test_people_costs_in_windows_same_as_python(calculation_start_date):
+    WorkdayCalendar.objects.populate(date(2015, 1, 1), date(2017, 12, 31))
+    products, _ = make_products()
+    time_windows = slice_time_window(
+        date(2016, 1, 1), date(2016, 4, 30), 'MS', extend=True)
+    time_windows += [(date(2016, 1, 1), date(2016, 12, 31)),
+                     (date(2016, 1, 15), date(2016, 3, 18))]
+
+    result = people_costs_in_windows(
+        [p.id for p in products], time_windows,
+        calculation_start_date=calculation_start_date)
+
+    for product in products:
+        for sdate, edate in time_windows:
+            expected = python_people_costs(
+                product, sdate, edate, calculation_start_date)
+            actual = result[(product.id, (sdate, edate))]
+            for key in ['contractor', 'non-contractor']:
+                assert abs(actual[key] - expected[key]) < Decimal('0.01')
+
+
+@pytest.mark.django_db
+def test_aggregate_people_costs_falls_back_to_python():
+    WorkdayCalendar.objects.populate(date(2015, 1, 1), date(2017, 12, 31))
+    products, simple_tasks = make_products()
+    _, fallbacks = aggregate_people_costs(
+        [p.id for p in products], [(date(2016, 1, 1), date(2016, 12, 31))])
+    fallback_ids = {task_id for _, _, _, task_id in fallbacks}
+    assert len(fallback_ids) == 6  # 3 tasks for each product
+    assert not fallback_ids & {t.id for t in simple_tasks}
+
+
+@pytest.mark.django_db
+def test_aggregate_people_costs_without_calendar():
+    products, simple_tasks = make_products()
+    totals, fallbacks = aggregate_people_costs(
+        [p.id for p in products], [(date(2016, 1, 1), date(2016, 12, 31))])
+    assert totals == {}
+    assert len(fallbacks) == len(simple_tasks) + 6
+
+
+@pytest.mark.django_db
+def test_workday_calendar():
+    WorkdayCalendar.objects.populate(date(2016, 4, 27), date(2016, 5, 2))
+    WorkdayCalendar.objects.populate(date(2016, 5, 1), date(2016, 5, 6))
+    days = WorkdayCalendar.objects.all()
+    assert [d.date for d in days if not d.is_workday] == [
+        date(2016, 4, 30), date(2016, 5, 1), date(2016, 5, 2)]
+    assert [d.workday_ordinal for d in days] == [1, 2, 3, 3, 3, 3, 4, 5, 6, 7]
+
+
+@pytest.mark.django_db
+def test_workday_calendar_refresh():
+    WorkdayCalendar.objects.populate(date(2016, 4, 27), date(2016, 5, 6))
+    with CaptureQueriesContext(connection) as queries:
+        WorkdayCalendar.objects.populate(date(2016, 4, 27), date(2016, 5, 6))
+    assert not [q for q in queries
+                if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+
+    # without the bank holiday on 2 May only the days from then change
+    with patch('dashboard.apps.dashboard.models.workday.get_bank_holidays',
+               return_value=[]), \
+            CaptureQueriesContext(connection) as queries:
+        WorkdayCalendar.objects.populate(date(2016, 4, 27), date(2016, 5, 6))
+    writes = [q['sql'].split()[0] for q in queries
+              if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+    assert writes == ['DELETE', 'INSERT']
+    assert [d.workday_ordinal for d in WorkdayCalendar.objects.all()] == [
+        1, 2, 3, 3, 3, 4, 5, 6, 7, 8]
@@ -8,6 +8,7 @@ import pytest
 
 from ..constants import COST_TYPES, PAYROLL_COSTS
 from ..models import Cost, Product, Person, PersonCost, Rate, Task
+from ..models.rates import PersonRates, people_costs_breakdown
 
 
 class CostTestCase(TestCase):
@@ -235,3 +236,70 @@ def test_person_cost_prediction(start_date, end_date):
 
     assert rate == p.additional_rate(
         start_date, end_date, predict_based_on=date(2015, 5, 31))
+    assert rate == PersonRates([p]).additional_rate(
+        p, start_date, end_date, predict_based_on=date(2015, 5, 31))
+
+
+@pytest.mark.django_db
+def test_people_costs_breakdown():
+    product = mommy.make(Product)
+    contractor = mommy.make(Person, is_contractor=True)
+    civil_servant = mommy.make(Person, is_contractor=False)
+    mommy.make(Rate, person=contractor, start_date=date(2015, 1, 1),
+               rate=Decimal('400'))
+    mommy.make(Rate, person=civil_servant, start_date=date(2015, 1, 1),
+               rate_type=COST_TYPES.MONTHLY, rate=Decimal('2000'))
+    for name, cost in [('ERNIC', '100'), ('ASLC', '50')]:
+        mommy.make(PersonCost, person=civil_servant, name=name,
+                   start_date=date(2015, 5, 1), end_date=date(2015, 5, 31),
+                   type=COST_TYPES.MONTHLY, cost=Decimal(cost))
+    for person in [contractor, civil_servant]:
+        mommy.make(Task, product=product, person=person, days=Decimal('5'),
+                   start_date=date(2015, 5, 4), end_date=date(2015, 5, 15))
+        mommy.make(Task, product=product, person=person, days=Decimal('1'),
+                   start_date=date(2015, 5, 19), end_date=date(2015, 5, 19),
+                   repeat_state=Task.WEEKLY, repeat_end=date(2015, 6, 9))
+    start_date, end_date = date(2015, 5, 1), date(2015, 5, 31)
+
+    breakdown = people_costs_breakdown(
+        product.tasks.all(), start_date, end_date, names=PAYROLL_COSTS)
+
+    assert set(breakdown) == {contractor, civil_servant}
+    for person, detail in breakdown.items():
+        tasks = product.tasks.filter(person=person)
+        assert detail['days'] == sum(
+            t.time_spent(start_date, end_date) for t in tasks)
+        assert detail['total'] == sum(
+            t.people_costs(start_date, end_date) for t in tasks)
+        for name in PAYROLL_COSTS:
+            assert detail[name] == sum(
+                t.people_costs(start_date, end_date, additional_cost_name=name)
+                for t in tasks)
+        assert detail['base'] == detail['total'] - detail['additional']
+    assert breakdown[contractor]['additional'] == Decimal('0')
+    assert breakdown[civil_servant]['ERNIC'] > 0
+    assert abs(breakdown[civil_servant]['additional'] -
+               breakdown[civil_servant]['ERNIC'] -
+               breakdown[civil_servant]['ASLC']) < Decimal('0.01')
+
+    # a weekly task on the bank holiday of 25 May
+    monday = mommy.make(
+        Task, product=product, person=civil_servant, days=Decimal('1'),
+        start_date=date(2015, 5, 18), end_date=date(2015, 5, 18),
+        repeat_state=Task.WEEKLY, repeat_end=date(2015, 6, 8))
+    assert monday.people_costs_breakdown(
+        start_date, end_date, names=PAYROLL_COSTS)['total'] == \
+        monday.people_costs(date(2015, 5, 18), date(2015, 5, 18))
+    monday.delete()
+
+    # each task counted in a time window of its own
+    rates = PersonRates([contractor, civil_servant])
+    breakdown = people_costs_breakdown(
+        product.tasks.all(), start_date, end_date, rates=rates,
+        task_window=lambda task: (task.start_date, task.end_date))
+    for person, detail in breakdown.items():
+        tasks = product.tasks.filter(person=person)
+        assert detail['days'] == sum(
+            t.time_spent(t.start_date, t.end_date) for t in tasks)
+        assert detail['total'] == sum(
+            t.people_costs(t.start_date, t.end_date) for t in tasks)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+import json
+import os
+
+import pytest
+
+from dashboard.apps.dashboard.benchmarks import measure
+from dashboard.apps.dashboard.dataset import (
+    DatasetGenerator, write_float_tasks)
+from dashboard.apps.dashboard.models import Person, Product, Task
+
+
+@pytest.mark.django_db
+def test_generate_dataset(tmpdir):
+    counts = DatasetGenerator(
+        areas=2, products=4, people=6, years=1, start_date=date(2016, 4, 1),
+        seed=1).generate()
+
+    assert counts['Area'] == 2
+    assert counts['Product'] == 4
+    assert counts['Person'] == 6
+    # a task a month on 3 products for each person
+    assert counts['Task'] == 6 * 3 * 12
+    assert Task.objects.filter(repeat_state=Task.WEEKLY).exists()
+    assert not Person.objects.filter(
+        is_contractor=False, staff_number=None).exists()
+    for product in Product.objects.all():
+        assert product.budgets.exists()
+        assert product.discovery_date < product.alpha_date
+
+    write_float_tasks(str(tmpdir))
+    with open(os.path.join(str(tmpdir), 'tasks.json')) as fr:
+        data = json.loads(fr.read())
+    assert sum(len(item['tasks']) for item in data['people']) == \
+        counts['Task']
+
+
+@pytest.mark.django_db
+def test_measure():
+    result = measure('count products', lambda: list(Product.objects.all()))
+    assert result['name'] == 'count products'
+    assert result['queries'] == 1
+    assert result['seconds'] >= 0
+    assert 'peak_memory_kib' not in result
+
+    result = measure('count products', lambda: list(Product.objects.all()),
+                     trace_memory=True)
+    assert result['peak_memory_kib'] >= 0
+    assert 'seconds' not in result
@@ -1,13 +1,22 @@
 # -*- coding: utf-8 -*-
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
-
-from django.test import TestCase
+from unittest.mock import patch
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from model_mommy import mommy
+from openpyxl import load_workbook
 
 
-from dashboard.apps.dashboard.models import Product, Area, Person, PersonCost, Rate, Task
-from dashboard.apps.dashboard.constants import COST_TYPES
+from dashboard.apps.dashboard.models import (
+    Product, Area, Person, PersonCost, Rate, Task, ExportJob)
+from dashboard.apps.dashboard.constants import COST_TYPES, EXPORT_STATUSES
+from dashboard.apps.dashboard.tasks import remove_old_export_jobs
 
 
 class BaseExportTestCase(TestCase):
@@ -89,3 +98,120 @@ class ExportTestCase(BaseExportTestCase):
         response = self.client.get(
             '/admin/dashboard/person/export_rates/')
         self.assertEqual(response.status_code, 200)
+
+
+class ExportJobTestCase(BaseExportTestCase):
+
+    def setUp(self):
+        super().setUp()
+        storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage_dir)
+        override = override_settings(
+            EXPORT_STORAGE_OPTIONS={'location': storage_dir})
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_identical_exports_are_reused(self):
+        job, created = ExportJob.objects.request('products', {'show': 'all'})
+        self.assertTrue(created)
+        same_job, created = ExportJob.objects.request('products', {'show': 'all'})
+        self.assertFalse(created)
+        self.assertEqual(job, same_job)
+        other_job, created = ExportJob.objects.request(
+            'products', {'show': 'visible'})
+        self.assertTrue(created)
+
+        job.status = EXPORT_STATUSES.FAILED
+        job.save()
+        _, created = ExportJob.objects.request('products', {'show': 'all'})
+        self.assertTrue(created)
+
+    def test_stalled_export_is_not_reused(self):
+        job, _ = ExportJob.objects.request('products', {'show': 'all'})
+        job.status = EXPORT_STATUSES.RUNNING
+        job.started_at = timezone.now() - timedelta(
+            seconds=settings.EXPORT_JOB_TIMEOUT_SECONDS + 1)
+        job.save()
+        new_job, created = ExportJob.objects.request(
+            'products', {'show': 'all'})
+        self.assertTrue(created)
+        job.refresh_from_db()
+        self.assertEqual(job.status, EXPORT_STATUSES.FAILED)
+
+        # a job running for less time is still reused
+        new_job.status = EXPORT_STATUSES.RUNNING
+        new_job.started_at = timezone.now()
+        new_job.save()
+        same_job, created = ExportJob.objects.request(
+            'products', {'show': 'all'})
+        self.assertFalse(created)
+        self.assertEqual(same_job, new_job)
+
+    def test_pending_export_never_picked_up_is_not_reused(self):
+        job, _ = ExportJob.objects.request('products', {'show': 'all'})
+        ExportJob.objects.filter(pk=job.pk).update(
+            created_at=timezone.now() - timedelta(
+                seconds=settings.EXPORT_JOB_TIMEOUT_SECONDS + 1))
+        new_job, created = ExportJob.objects.request(
+            'products', {'show': 'all'})
+        self.assertTrue(created)
+        job.refresh_from_db()
+        self.assertEqual(job.status, EXPORT_STATUSES.FAILED)
+        self.assertEqual(job.error, 'timed out')
+
+    def test_running_exports_are_not_removed(self):
+        running, _ = ExportJob.objects.request('products', {'show': 'all'})
+        done, _ = ExportJob.objects.request('products', {'show': 'visible'})
+        ExportJob.objects.filter(pk=running.pk).update(
+            status=EXPORT_STATUSES.RUNNING, started_at=timezone.now())
+        ExportJob.objects.filter(pk=done.pk).update(
+            status=EXPORT_STATUSES.DONE)
+        ExportJob.objects.update(
+            created_at=timezone.now() - timedelta(days=2))
+        remove_old_export_jobs()
+        self.assertEqual(list(ExportJob.objects.all()), [running])
+
+    def test_products_export_in_background(self):
+        response = self.client.get('/products/export/all/?background=1')
+        job = ExportJob.objects.get()
+        self.assertRedirects(response, '/exports/%s/' % job.id)
+
+        response = self.client.get('/api/exports/%s' % job.id)
+        self.assertEqual(response.json()['status'], 'PENDING')
+        response = self.client.get('/exports/%s/download' % job.id)
+        self.assertEqual(response.status_code, 404)
+
+        job.run()
+        response = self.client.get('/api/exports/%s' % job.id)
+        self.assertEqual(response.json()['status'], 'DONE')
+        download_url = response.json()['download_url']
+        response = self.client.get(download_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response['Content-Disposition'].endswith(job.filename))
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(workbook.active['A2'].value, self.product.id)
+
+    def test_person_rates_export_in_background(self):
+        self.client.login(username='test_finance', password='Admin123')
+        response = self.client.get(
+            '/admin/dashboard/person/export_rates/?background=1')
+        job = ExportJob.objects.get()
+        self.assertRedirects(response, '/exports/%s/' % job.id)
+        job.run()
+        self.assertEqual(job.status, EXPORT_STATUSES.DONE)
+        response = self.client.get('/exports/%s/download' % job.id)
+        self.assertEqual(response.status_code, 200)
+
+        self.client.logout()
+        self.client.login(username='test_dm', password='Admin123')
+        response = self.client.get('/exports/%s/download' % job.id)
+        self.assertEqual(response.status_code, 403)
+
+    def test_failed_export(self):
+        job, _ = ExportJob.objects.request('products', {'show': 'all'})
+        with patch('dashboard.apps.dashboard.exports.Products',
+                   side_effect=ValueError('boom')):
+            job.run()
+        self.assertEqual(job.status, EXPORT_STATUSES.FAILED)
+        self.assertEqual(job.error, 'boom')
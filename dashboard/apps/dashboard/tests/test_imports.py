@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+# libraries only imported when they are used. requests is not one of them
+# as coreapi, used by rest framework, imports it anyway.
+LAZY_IMPORTS = ['numpy', 'pandas', 'fuzzywuzzy', 'openpyxl', 'xlrd']
+
+SCRIPT = '''
+import sys
+
+import django
+from django.core.management import call_command
+django.setup()
+call_command('check', verbosity=0)
+print(' '.join(name for name in {lazy_imports!r} if name in sys.modules))
+'''
+
+
+def test_lazy_imports():
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+    output = subprocess.check_output(
+        [sys.executable, '-c', SCRIPT.format(lazy_imports=LAZY_IMPORTS)],
+        env=env, universal_newlines=True)
+    imported = output.splitlines()[-1].split()
+    assert imported == [], 'imported on start up: {}'.format(imported)
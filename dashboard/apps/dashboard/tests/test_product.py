@@ -1,15 +1,20 @@
 # -*- coding: utf-8 -*-
 from datetime import date, timedelta
 from decimal import Decimal
+from unittest.mock import patch
 
 import pytest
 from model_mommy import mommy
 from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from dashboard.libs.date_tools import parse_date, get_workdays
 from dashboard.apps.dashboard.models import (
     Product, Area, Task, Person, Rate, Cost, ProductStatus, Budget,
-    PersonCost)
+    PersonCost, Saving)
+from dashboard.apps.dashboard.models.unit_of_work import unit_of_work
+from dashboard.apps.dashboard.tasks import refresh_current_statuses
 from dashboard.apps.dashboard.constants import COST_TYPES, STATUS_TYPES
 
 
@@ -144,6 +149,31 @@ def test_product_profiles_with_frequency():
         assert sum(v[key] for v in profile['financial']['time_frames'].values()) == expected
 
 
+@pytest.mark.django_db
+def test_product_profile_time_frames_window():
+    profile = make_product().profile(
+        freq='W', time_frames_start=date(2016, 1, 5),
+        time_frames_end=date(2016, 1, 10))
+    assert sorted(profile['financial']['time_frames'].keys()) == [
+        '2016-01-03~2016-01-09',
+        '2016-01-10~2016-01-16',
+    ]
+
+
+@pytest.mark.django_db
+def test_product_profile_fields():
+    product = make_product()
+    with patch.object(Product, 'stats_in_time_frames') as time_frames:
+        profile = product.profile(fields=['budget', 'current_fte'])
+    assert not time_frames.called
+    assert set(profile.keys()) == {
+        'id', 'name', 'type', 'budget', 'current_fte'}
+    assert profile['current_fte'] == product.current_fte()
+
+    with pytest.raises(ValueError):
+        product.profile(fields=['budget', 'unknown'])
+
+
 @pytest.mark.django_db
 def test_product_people_costs():
     product = make_product()
@@ -223,6 +253,37 @@ def test_product_costs():
         end_date=date(2018, 7, 31)) == Decimal('400')
 
 
+@pytest.mark.django_db
+def test_product_stats_in_windows():
+    product = make_product()
+    mommy.make(Cost, product=product, start_date=date(2016, 1, 4),
+               type=COST_TYPES.ONE_OFF, cost=Decimal('50'))
+    mommy.make(Cost, product=product, start_date=date(2015, 12, 31),
+               end_date=date(2016, 2, 29), type=COST_TYPES.MONTHLY,
+               cost=Decimal('55'))
+    mommy.make(Saving, product=product, start_date=date(2016, 1, 15),
+               type=COST_TYPES.ONE_OFF, cost=Decimal('20'))
+    mommy.make(Budget, product=product, budget=1000,
+               start_date=date(2016, 1, 1))
+    mommy.make(Budget, product=product, budget=1500,
+               start_date=date(2016, 1, 11))
+    time_windows = [
+        (date(2015, 12, 1), date(2015, 12, 31)),
+        (date(2016, 1, 1), date(2016, 1, 10)),
+        (date(2016, 1, 1), date(2016, 1, 31)),
+        (date(2016, 1, 11), date(2016, 3, 31)),
+    ]
+
+    stats = product.stats_in_windows(time_windows)
+
+    assert sorted(stats) == time_windows
+    for start, end in time_windows:
+        assert stats[(start, end)] == product.stats_between(
+            start, end, ignore_cache=True)
+    assert stats[time_windows[1]]['budget'] == Decimal('1500')
+    assert stats[time_windows[2]]['savings'] == Decimal('20')
+
+
 @pytest.mark.django_db
 def test_product_visible():
     visible_area = mommy.make(Area, visible=True)
@@ -259,6 +320,23 @@ def test_product_current_fte():
     assert product.current_fte(start_date, end_date) == time_spent / workdays
 
 
+@pytest.mark.django_db
+def test_product_fte_in_windows():
+    product = make_product()
+    time_windows = [
+        (None, None),
+        (start_date, end_date),
+        (start_date, start_date + timedelta(days=6)),
+        (end_date - timedelta(days=2), None),
+        (end_date + timedelta(days=1), end_date + timedelta(days=7)),
+    ]
+    ftes = product.fte_in_windows(time_windows, ignore_cache=True)
+    assert set(ftes) == set(time_windows)
+    for time_window in time_windows:
+        assert ftes[time_window] == product.current_fte(
+            *time_window, ignore_cache=True)
+
+
 @pytest.mark.django_db
 def test_product_status():
     product = make_product()
@@ -288,6 +366,52 @@ def test_product_status():
     assert product.status(on=today + timedelta(days=75)) == status3
 
 
+@pytest.mark.django_db
+def test_product_current_status():
+    product = make_product()
+    today = date.today()
+    status1 = mommy.make(
+        ProductStatus, product=product, status=STATUS_TYPES.OK,
+        start_date=today - timedelta(days=100))
+    status2 = mommy.make(
+        ProductStatus, product=product, status=STATUS_TYPES.AT_RISK,
+        start_date=today - timedelta(days=50))
+    status3 = mommy.make(
+        ProductStatus, product=product, status=STATUS_TYPES.IN_TROUBLE,
+        start_date=today + timedelta(days=50))
+
+    product = Product.objects.select_related('current_status').get(
+        pk=product.pk)
+    with CaptureQueriesContext(connection) as queries:
+        assert product.status() == status2
+    assert len(queries) == 0
+
+    # the status is looked up once the next status starts, without
+    # writing, and the pointer is moved on by the daily task
+    class Later(date):
+        @classmethod
+        def today(cls):
+            return status3.start_date
+
+    with patch('dashboard.apps.dashboard.models.product.date', Later):
+        with CaptureQueriesContext(connection) as queries:
+            assert product.status() == status3
+        assert len(queries) == 1
+        assert not queries[0]['sql'].startswith('UPDATE')
+        product.refresh_from_db()
+        assert product.current_status == status2
+        with patch('dashboard.apps.dashboard.tasks.date', Later):
+            refresh_current_statuses()
+    product.refresh_from_db()
+    assert product.current_status == status3
+    assert product.current_status_until is None
+
+    status2.delete()
+    status3.delete()
+    product.refresh_from_db()
+    assert product.status() == status1
+
+
 @pytest.mark.django_db
 def test_product_budget():
     product = make_product()
@@ -313,6 +437,12 @@ def test_product_budget():
     assert product.budget(on=today + timedelta(days=25)) == budget2.budget
     assert product.budget(on=today + timedelta(days=75)) == budget3.budget
 
+    with unit_of_work(), CaptureQueriesContext(connection) as queries:
+        assert product.budget(on=date_1) == budget1.budget
+        assert product.budget(on=date_2) == budget2.budget
+        assert product.budget(on=date_3) == budget3.budget
+    assert len(queries) == 1
+
 
 @pytest.mark.django_db
 def test_product_cost():
@@ -741,4 +871,23 @@ def test_last_updated(admin_client):
         action_flag=CHANGE,
         change_message='Changed something again',
     )
+    product.refresh_from_db()
     assert product.last_updated == latest_log_entry.action_time
+
+
+@pytest.mark.django_db
+def test_last_updated_ignores_log_entry_without_content_type(admin_user):
+
+    from django.contrib.admin.models import LogEntry, CHANGE
+    product = make_product()
+
+    LogEntry.objects.create(
+        user=admin_user,
+        content_type=None,
+        object_id=product.pk,
+        object_repr=repr(product),
+        action_flag=CHANGE,
+        change_message='Changed something',
+    )
+    product.refresh_from_db()
+    assert product.last_updated is None
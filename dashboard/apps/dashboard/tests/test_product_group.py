@@ -1,10 +1,18 @@
+from datetime import date
 from decimal import Decimal
+from unittest.mock import patch
 
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 import pytest
 from model_mommy import mommy
 
-from dashboard.apps.dashboard.models import ProductGroup, Area
+from dashboard.apps.dashboard.models import (
+    ProductGroup, Area, Budget, Product)
+from dashboard.apps.dashboard.models.unit_of_work import unit_of_work
 from .test_product import make_product
+from .test_views import LOCMEM_CACHES
 
 
 @pytest.mark.django_db
@@ -40,6 +48,77 @@ def test_product_group():
     assert profile['service_area'] == {'id': area1.id, 'name': area1.name}
 
 
+@pytest.mark.django_db
+def test_product_group_budget():
+    p1 = make_product()
+    p2 = make_product()
+    pg = mommy.make(ProductGroup)
+    pg.products.add(p1, p2)
+    assert pg.budget() == 0
+
+    mommy.make(Budget, product=p1, budget=1000, start_date=date(2016, 1, 1))
+    mommy.make(Budget, product=p1, budget=1500, start_date=date(2016, 6, 1))
+    mommy.make(Budget, product=p2, budget=200, start_date=date(2016, 3, 1))
+    mommy.make(Budget, product=p2, budget=300, start_date=date(2016, 6, 1))
+
+    days = [date(2015, 12, 31), date(2016, 1, 1), date(2016, 3, 1),
+            date(2016, 5, 31), date(2016, 6, 1), date(2017, 1, 1)]
+    expected = [Decimal(amount) for amount in
+                ['0', '1000', '1200', '1200', '1800', '1800']]
+    assert [pg.budget(on=day) for day in days] == expected
+
+    with unit_of_work(), CaptureQueriesContext(connection) as queries:
+        assert [pg.budget(on=day) for day in days] == expected
+    # the budgets of the products
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+@override_settings(CACHES=LOCMEM_CACHES)
+def test_product_group_stats_in_windows():
+    cache.clear()
+    p1 = make_product()
+    p2 = make_product()
+    pg = mommy.make(ProductGroup)
+    pg.products.add(p1, p2)
+    mommy.make(Budget, product=p2, budget=5000, start_date=date(2016, 1, 1))
+    time_windows = [(date(2016, 1, 1), date(2016, 1, 31)),
+                    (date(2016, 1, 1), date(2016, 1, 15))]
+
+    stats = pg.stats_in_windows(time_windows, ignore_cache=True)
+    for start_date, end_date in time_windows:
+        assert stats[(start_date, end_date)] == pg.stats_between(
+            start_date, end_date, ignore_cache=True)
+
+    # the stats of the products are taken from their cache
+    with patch.object(Product, 'compute_stats_in_windows') as compute:
+        assert pg.stats_in_windows(time_windows, ignore_cache=True) == stats
+    assert not compute.called
+
+
+@pytest.mark.django_db
+def test_product_group_products_loaded_once():
+    area1 = mommy.make(Area, name='area1')
+    p1 = make_product()
+    p2 = make_product()
+    p1.area = area1
+    p2.area = area1
+    p1.save()
+    p2.save()
+    pg = mommy.make(ProductGroup)
+    pg.products.add(p1, p2)
+
+    with unit_of_work(), CaptureQueriesContext(connection) as queries:
+        assert pg.area == area1
+        assert pg.area == area1
+        assert pg.first_date == min(p1.first_date, p2.first_date)
+        assert pg.last_date == max(p1.last_date, p2.last_date)
+        pg.people_costs(date(2016, 1, 1), date(2016, 1, 31))
+    # the products of the group are loaded once
+    assert len([query for query in queries
+                if 'dashboard_productgroup_products' in query['sql']]) == 1
+
+
 @pytest.mark.django_db
 def test_product_group_area():
     area1 = mommy.make(Area, name='area1')
@@ -7,7 +7,10 @@ from django.test import TestCase
 from model_mommy import mommy
 
 from dashboard.libs.rate_converter import RATE_TYPES
-from ..models import Person, Rate
+from ..constants import COST_TYPES
+from ..models import Person, Rate, PersonCost, Task
+from ..models.rates import PersonRates
+from ..models.unit_of_work import current_unit_of_work, unit_of_work
 
 
 class RateTestCase(TestCase):
@@ -52,6 +55,50 @@ class RateTestCase(TestCase):
         self.assertDecimalEqual(self.person.rate_between(
             date(2016, 5, 24), date(2020, 5, 30)), '231.26')
 
+    def test_person_rates(self):
+        self._add_rate(RATE_TYPES.MONTH, 4600, date(2016, 5, 26))
+        self._add_rate(RATE_TYPES.DAY, 300, date(2016, 6, 1))
+        mommy.make(PersonCost, person=self.person, type=COST_TYPES.MONTHLY,
+                   cost=Decimal('500'), start_date=date(2016, 5, 1),
+                   end_date=date(2016, 5, 31))
+        contractor = mommy.make(Person, is_contractor=True)
+        Rate.objects.create(rate_type=RATE_TYPES.DAY, rate=400,
+                            start_date=date(2016, 5, 1), person=contractor)
+        people = [self.person, contractor, mommy.make(Person)]
+
+        with self.assertNumQueries(2):
+            rates = PersonRates(people)
+        for person in people:
+            self.assertEqual(rates.rate_type(person), person.rate_type)
+            for on in [date(2016, 5, 25), date(2016, 5, 27),
+                       date(2016, 6, 15), date(2017, 1, 1)]:
+                with self.assertNumQueries(0):
+                    base_rate = rates.base_rate_on(person, on)
+                    rate = rates.rate_on(person, on)
+                self.assertEqual(base_rate, person.base_rate_on(on))
+                self.assertEqual(rate, person.rate_on(on))
+
+    def test_unit_of_work(self):
+        self._add_rate(RATE_TYPES.DAY, 300, date(2016, 6, 1))
+        tasks = [
+            mommy.make(Task, person=self.person, days=5,
+                       start_date=date(2016, 6, 6), end_date=date(2016, 6, 10))
+            for _ in range(3)
+        ]
+        expected = [task.people_costs() for task in tasks]
+
+        self.assertIsNone(current_unit_of_work())
+        with unit_of_work() as unit:
+            with unit_of_work() as nested:
+                self.assertIs(nested, unit)
+            # the person, rates and costs
+            with self.assertNumQueries(3):
+                costs = [task.people_costs() for task in tasks]
+            self.assertEqual(costs, expected)
+            with self.assertNumQueries(0):
+                costs = [task.people_costs() for task in tasks]
+        self.assertIsNone(current_unit_of_work())
+
     def test_rate_string(self):
         rate = self._add_rate(RATE_TYPES.MONTH, 4600, date(2016, 5, 26))
         expected = '"{}" @ "4600 Monthly salary" from "2016-05-26"'.format(
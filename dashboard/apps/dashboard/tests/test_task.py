@@ -7,6 +7,7 @@ from faker import Faker
 import pytest
 
 from dashboard.apps.dashboard.models import Person, Product, Task, Rate
+from dashboard.apps.dashboard.models.task_index import TaskIndex
 from dashboard.libs.date_tools import parse_date, to_datetime
 
 
@@ -436,6 +437,23 @@ class TestTaskManager(TestCase):
         self.assert_tasks_equals(
             second_half_year_tasks, self.second_half_year_tasks)
 
+    def test_task_index(self):
+        with self.assertNumQueries(1):
+            index = TaskIndex(Task.objects.all())
+        time_windows = [
+            (year_start, first_half_end),
+            (second_half_start, year_end),
+            (year_start, year_end),
+            (parse_date('2016-03-15'), parse_date('2016-03-21')),
+            (parse_date('2016-06-20'), parse_date('2016-07-10')),
+            (parse_date('2017-01-01'), parse_date('2017-01-31')),
+        ]
+        for start_date, end_date in time_windows:
+            with self.assertNumQueries(0):
+                tasks = index.between(start_date, end_date)
+            self.assert_tasks_equals(
+                tasks, Task.objects.between(start_date, end_date))
+
 
 @pytest.mark.parametrize("sday,eday,expected", [
     ('2017-03-27', '2017-03-31', 5),
@@ -2,25 +2,39 @@
 """
 unit tests views.py
 """
+import gzip
+import io
 import json
 import urllib
+from datetime import date
+from decimal import Decimal
 from unittest.mock import patch
 
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client
-from django.test.utils import override_settings
+from django.test.utils import override_settings, CaptureQueriesContext
 from django.core.urlresolvers import reverse
 from django.contrib.auth.models import User
+from django.contrib.admin.models import LogEntry, CHANGE
+from django.contrib.contenttypes.models import ContentType
 import pytest
 from faker import Faker
+from openpyxl import load_workbook
 from model_mommy import mommy
+from rest_framework import exceptions
 from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
 
 from dashboard.apps.dashboard.views import (
     product_html, product_json, service_html, service_json,
-    product_group_html, product_group_json, DepartmentViewSet,
+    product_group_html, product_group_json, services_json, DepartmentViewSet,
     SkillViewSet, sync_from_float)
 from dashboard.apps.dashboard.models import (
-    Area, Product, ProductGroup, Department, Person, Skill)
+    Area, Product, ProductGroup, Department, Person, Skill, Task)
+from dashboard.apps.dashboard.management.commands.cache import Command
+from dashboard.libs.date_tools import parse_date
+from dashboard.libs.cache_tools import mark_data_version, LAST_SYNC_KEY
 
 
 def make_login_client():
@@ -82,6 +96,21 @@ def test_product_json_with_valid_id():
     assert rsp['Content-Type'] == 'application/json'
 
 
+@pytest.mark.django_db
+def test_product_json_with_fields():
+    client = make_login_client()
+    product = mommy.make(Product)
+    url = reverse(product_json, kwargs={'id': product.id})
+    rsp = client.get(url, {'fields': 'financial_rag,budget'})
+    assert rsp.status_code == 200
+    assert set(rsp.json().keys()) == {
+        'id', 'name', 'type', 'financial_rag', 'budget', 'meta'}
+
+    rsp = client.get(url, {'fields': 'budget,unknown'})
+    assert rsp.status_code == 400
+    assert rsp.json() == {'error': 'unknown fields unknown'}
+
+
 @pytest.mark.django_db
 def test_product_json_with_invalid_id():
     client = make_login_client()
@@ -180,6 +209,104 @@ def test_product_group_json_with_non_existing_id():
     assert rsp['Content-Type'] == 'application/json'
 
 
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+    }
+}
+
+
+@pytest.mark.django_db
+@override_settings(CACHES=LOCMEM_CACHES)
+def test_product_json_not_modified():
+    client = make_login_client()
+    product = mommy.make(Product)
+    url = reverse(product_json, kwargs={'id': product.id})
+    mark_data_version(LAST_SYNC_KEY)
+    rsp = client.get(url)
+    assert rsp.status_code == 200
+    etag = rsp['ETag']
+
+    rsp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert rsp.status_code == 304
+
+    # a different query string is a different resource
+    rsp = client.get(url, {'startDate': '2016-01-01'},
+                     HTTP_IF_NONE_MATCH=etag)
+    assert rsp.status_code == 200
+
+    # a change made in the admin
+    LogEntry.objects.log_action(
+        mommy.make(User).id, ContentType.objects.get_for_model(product).pk,
+        product.id, str(product), CHANGE)
+    rsp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert rsp.status_code == 200
+    assert rsp['ETag'] != etag
+
+
+@pytest.mark.django_db
+@override_settings(CACHES=LOCMEM_CACHES)
+def test_product_json_not_modified_after_permission_check():
+    product = mommy.make(Product)
+    url = reverse(product_json, kwargs={'id': product.id})
+    mark_data_version(LAST_SYNC_KEY)
+    client = Client()
+    rsp = client.get(url)
+    assert rsp.status_code == 200
+    etag = rsp['ETag']
+
+    with patch.object(APIView, 'check_permissions',
+                      side_effect=exceptions.PermissionDenied):
+        rsp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert rsp.status_code == 403
+    assert 'ETag' not in rsp
+
+    # errors have no etag either
+    url = reverse(product_json, kwargs={'id': product.id + 1})
+    rsp = client.get(url)
+    assert rsp.status_code == 404
+    assert 'ETag' not in rsp
+
+
+@pytest.mark.django_db
+@override_settings(CACHES=LOCMEM_CACHES)
+def test_product_json_served_from_rendered_cache():
+    cache.clear()
+    client = make_login_client()
+    product = mommy.make(Product)
+    url = reverse(product_json, kwargs={'id': product.id})
+    rsp = client.get(url)
+    assert rsp.status_code == 200
+    content = rsp.json()
+
+    with patch('dashboard.apps.dashboard.views.TimedJSONRenderer.render',
+               return_value=b'{}') as render:
+        rsp = client.get(url)
+        assert rsp.json() == content
+        rsp = client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        assert rsp['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(rsp.content).decode()) == content
+        assert not render.called
+
+    # rendered again once the cache is generated again
+    Command.generate(product)
+    with patch('dashboard.apps.dashboard.views.TimedJSONRenderer.render',
+               return_value=b'{}') as render:
+        rsp = client.get(url)
+        assert render.called
+        assert rsp.json() == {}
+
+
+@pytest.mark.django_db
+@override_settings(CACHES=LOCMEM_CACHES)
+def test_services_json_without_sync():
+    cache.clear()
+    client = make_login_client()
+    rsp = client.get(reverse(services_json))
+    assert rsp.status_code == 200
+    assert not rsp.has_header('ETag')
+
+
 @pytest.mark.django_db
 @override_settings(CELERY_EAGER_PROPAGATES_EXCEPTIONS=True,
                    CELERY_ALWAYS_EAGER=True,
@@ -198,6 +325,60 @@ def test_sync_float(mock_sync_float):
     assert rsp.json() == {'status': 'STARTED'}
 
 
+@pytest.mark.django_db
+def test_person_product_list_view():
+    client = make_login_client()
+    person = mommy.make(Person)
+    products = mommy.make(Product, _quantity=3)
+    for product, (sdate, edate) in zip(products, [
+            ('2017-01-02', '2017-01-06'),
+            ('2017-01-09', '2017-01-13'),
+            ('2016-01-04', '2016-01-08')]):
+        mommy.make(Task, person=person, product=product, days=5,
+                   start_date=parse_date(sdate), end_date=parse_date(edate))
+    mommy.make(Task, person=person, product=products[0], days=1,
+               start_date=date(2017, 1, 16), end_date=date(2017, 1, 16))
+    mommy.make(Task, person=person, product=products[1], days=1,
+               start_date=date(2017, 1, 3), end_date=date(2017, 1, 3),
+               repeat_state=1, repeat_end=date(2017, 1, 31))
+    url = reverse('person_products', kwargs={'person_id': person.id})
+    rsp = client.get(url, {'start_date': '2017-01-01',
+                           'end_date': '2017-01-31'})
+    assert rsp.status_code == 200
+    days = {p['id']: Decimal(p['time_spent']['days'])
+            for p in rsp.json()['results']}
+    assert days == {
+        products[0].id: Decimal('6'),
+        products[1].id: Decimal('10'),
+        products[2].id: Decimal('0'),
+    }
+    for product in products:
+        assert days[product.id] == person.time_on_product(
+            product, date(2017, 1, 1), date(2017, 1, 31))
+
+    url = reverse('person_products', kwargs={'person_id': person.id + 1})
+    assert client.get(url).status_code == 404
+
+
+@pytest.mark.django_db
+def test_products_spreadsheet():
+    client = make_login_client()
+    products = mommy.make(Product, _quantity=3)
+    rsp = client.get(reverse('products_spreadsheet', kwargs={'show': 'all'}))
+    assert rsp.status_code == 200
+    assert rsp.streaming
+    workbook = load_workbook(io.BytesIO(b''.join(rsp.streaming_content)))
+    assert workbook.sheetnames == ['Products info']
+    rows = list(workbook.active.rows)
+    assert [cell.value for cell in rows[0][:2]] == ['Id', 'Name']
+    assert {row[0].value for row in rows[1:]} == {p.id for p in products}
+
+    url = reverse('products_spreadsheet', kwargs={'show': products[0].id})
+    rsp = client.get(url)
+    workbook = load_workbook(io.BytesIO(b''.join(rsp.streaming_content)))
+    assert workbook.sheetnames == ['Products info', 'Monthly spend']
+
+
 @pytest.mark.django_db
 def test_department_list_view():
     departments = [mommy.make(Department) for _ in range(5)]
@@ -210,6 +391,32 @@ def test_department_list_view():
     assert 'persons' in results[0]
 
 
+def list_queries(viewset):
+    view = viewset.as_view(actions={'get': 'list'})
+    with CaptureQueriesContext(connection) as queries:
+        rsp = view(APIRequestFactory().get(''))
+        assert rsp.status_code == 200
+    return len(queries)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('viewset', [DepartmentViewSet, SkillViewSet])
+def test_department_and_skill_list_view_queries(viewset):
+    skills = mommy.make(Skill, _quantity=2)
+    departments = mommy.make(Department, _quantity=2)
+    for department in departments:
+        for person in mommy.make(Person, department=department, _quantity=2):
+            person.skills.add(*skills)
+    num_queries = list_queries(viewset)
+
+    skills += mommy.make(Skill, _quantity=3)
+    departments += mommy.make(Department, _quantity=3)
+    for department in departments:
+        for person in mommy.make(Person, department=department, _quantity=3):
+            person.skills.add(*skills)
+    assert list_queries(viewset) == num_queries
+
+
 @pytest.mark.django_db
 def test_department_detail_view():
     departments = [mommy.make(Department) for _ in range(5)]
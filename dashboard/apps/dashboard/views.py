@@ -1,25 +1,46 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime
 from collections import OrderedDict
-
-from django.shortcuts import render, redirect
-from django.http import Http404, HttpResponse
+from functools import wraps
+from hashlib import sha1
+import gzip
+import tempfile
+
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import (
+    Http404, HttpResponse, HttpResponseNotModified, FileResponse, JsonResponse)
+from django.core.exceptions import PermissionDenied
 from django.core.urlresolvers import reverse
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
 from django.views.decorators.http import require_http_methods
 from rest_framework.decorators import api_view
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework import viewsets, generics
+from rest_framework.settings import api_settings
 
 from dashboard.libs.date_tools import parse_date
 from dashboard.libs import swagger_tools
+from dashboard.libs.instrumentation import timer, route_stats
+from dashboard.libs.cache_tools import (
+    get_data_version, LAST_SYNC_KEY, CACHE_GENERATION_KEY,
+    method_cache_key, rendered_cache_key, get_or_render)
 from .models import Product, Area, ProductGroup, Person, Department, Skill
-from .tasks import sync_float
+from .models.product import PROFILE_FIELDS
+from .constants import EXPORT_STATUSES
+from .models.export import ExportJob
+from .models.unit_of_work import unit_of_work
+from .tasks import sync_float, run_export_job
 from .serializers import (
     PersonSerializer, PersonProductSerializer, DepartmentSerializer,
-    SkillSerializer)
-from . import spreadsheets
+    SkillSerializer, current_persons)
+from . import exports
 
 
 def _product_meta(request, product):
@@ -30,6 +51,121 @@ def _product_meta(request, product):
     return meta
 
 
+def _data_versions(request):
+    """
+    times of the last sync from float, the last cache generation or change
+    made in the admin or by a payroll upload, and the start of today. the
+    data behind the json endpoints only changes with one of these.
+    the result is kept on the request so it is worked out once.
+    :returns: a list of datetime objects or None if the time of the
+    last sync is unknown
+    """
+    if not hasattr(request, 'data_versions'):
+        request.data_versions = None
+        last_sync = get_data_version(LAST_SYNC_KEY)
+        if last_sync:
+            start_of_today = timezone.now().replace(
+                hour=0, minute=0, second=0, microsecond=0)
+            request.data_versions = [
+                version for version in [
+                    last_sync,
+                    get_data_version(CACHE_GENERATION_KEY),
+                    start_of_today
+                ]
+                if version
+            ]
+    return request.data_versions
+
+
+def _json_etag(request):
+    """
+    etag for the json endpoints from the data versions, the url and the user
+    """
+    versions = _data_versions(request)
+    if not versions:
+        return None
+    key = (
+        request.path,
+        sorted(request.GET.lists()),
+        request.user.pk,
+        [version.isoformat() for version in versions]
+    )
+    return sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+def conditional_json(view):
+    """
+    answer a conditional GET of a json endpoint with 304 Not Modified when
+    the etag still matches, see `_json_etag`.
+    applied below `api_view`, so that it runs after the authentication and
+    permission checks of the view. only successful responses get an etag,
+    which depends on the user as the content does.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        etag = _json_etag(request)
+        if etag and request.method in ('GET', 'HEAD'):
+            etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+            if etag in etags or '*' in etags:
+                response = HttpResponseNotModified()
+                response['ETag'] = quote_etag(etag)
+                return response
+        response = view(request, *args, **kwargs)
+        if etag and response.status_code == 200:
+            response['ETag'] = quote_etag(etag)
+        return response
+    return wrapper
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    json renderer adding its time to the 'serialise' timing of the request
+    """
+
+    def render(self, *args, **kwargs):
+        with timer('serialise'):
+            return super().render(*args, **kwargs)
+
+
+# the default renderers of the rest framework views, timing the json one
+TIMED_RENDERER_CLASSES = [
+    TimedJSONRenderer if renderer is JSONRenderer else renderer
+    for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+]
+
+
+def _render_json(get_data):
+    with unit_of_work():
+        data = get_data()
+    return TimedJSONRenderer().render(data)
+
+
+def _cached_json_response(request, profile_key, get_data, **variant):
+    """
+    json response served from the rendered content in the cache.
+    the content is cached under the cache key of the profile in it and
+    removed when the profile is generated again, see the `cache` command.
+    :param profile_key: cache key of the profile, or a tuple of them
+    :param get_data: a callable returning the data for the response
+    :param variant: any other value the response depends on
+    :return: an HttpResponse object
+    """
+    content, compressed = get_or_render(
+        rendered_cache_key(profile_key),
+        lambda: _render_json(get_data),
+        timeout=settings.JSON_RESPONSE_CACHE_TIMEOUT,
+        compress=settings.JSON_RESPONSE_CACHE_GZIP,
+        **variant)
+    accepts_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if compressed and not accepts_gzip:
+        content = gzip.decompress(content)
+    response = HttpResponse(content, content_type='application/json')
+    if compressed and accepts_gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
 def product_html(request, id):
     if not id:
         id = Product.objects.visible().first().id
@@ -42,6 +178,7 @@ def product_html(request, id):
 
 
 @api_view(['GET'])
+@conditional_json
 def product_json(request, id):
     """
     detail view of a single product
@@ -59,15 +196,38 @@ def product_json(request, id):
     end_date = request_data.get('endDate')
     if end_date:
         end_date = parse_date(end_date)
+    time_frames_start = request_data.get('timeFramesStart')
+    if time_frames_start:
+        time_frames_start = parse_date(time_frames_start)
+    time_frames_end = request_data.get('timeFramesEnd')
+    if time_frames_end:
+        time_frames_end = parse_date(time_frames_end)
+    fields = request_data.get('fields')
+    if fields:
+        fields = tuple(sorted(set(fields.split(','))))
+        unknown = set(fields) - set(PROFILE_FIELDS)
+        if unknown:
+            error = 'unknown fields {}'.format(','.join(sorted(unknown)))
+            return Response({'error': error}, status=400)
+    else:
+        fields = None
     # get the profile of the product for each month
-    profile = product.profile(
-        start_date=start_date,
-        end_date=end_date,
-        freq='MS',
-        calculation_start_date=settings.PEOPLE_COST_CALCATION_STARTING_POINT
-    )
+    profile_kwargs = {
+        'start_date': start_date,
+        'end_date': end_date,
+        'freq': 'MS',
+        'calculation_start_date': settings.PEOPLE_COST_CALCATION_STARTING_POINT,
+        'fields': fields,
+        'time_frames_start': time_frames_start,
+        'time_frames_end': time_frames_end
+    }
     meta = _product_meta(request, product)
-    return Response({**profile, 'meta': meta})
+    return _cached_json_response(
+        request,
+        method_cache_key(Product.profile, product, **profile_kwargs),
+        lambda: {**product.profile(**profile_kwargs), 'meta': meta},
+        **meta
+    )
 
 
 def product_group_html(request, id):
@@ -82,6 +242,7 @@ def product_group_html(request, id):
 
 
 @api_view(['GET'])
+@conditional_json
 def product_group_json(request, id):
     """
     detail view of a single product group
@@ -94,11 +255,17 @@ def product_group_json(request, id):
         return Response({'error': error}, status=404)
 
     # get the profile of the product group for each month
-    profile = product_group.profile(
-        freq='MS',
-        calculation_start_date=settings.PEOPLE_COST_CALCATION_STARTING_POINT)
+    profile_kwargs = {
+        'freq': 'MS',
+        'calculation_start_date': settings.PEOPLE_COST_CALCATION_STARTING_POINT
+    }
     meta = _product_meta(request, product_group)
-    return Response({**profile, 'meta': meta})
+    return _cached_json_response(
+        request,
+        method_cache_key(ProductGroup.profile, product_group, **profile_kwargs),
+        lambda: {**product_group.profile(**profile_kwargs), 'meta': meta},
+        **meta
+    )
 
 
 class PersonViewSet(viewsets.ReadOnlyModelViewSet):
@@ -111,8 +278,10 @@ class PersonViewSet(viewsets.ReadOnlyModelViewSet):
     list:
     List view of persons
     """
-    queryset = Person.objects.all()
+    queryset = Person.objects.select_related(
+        'department').prefetch_related('skills')
     serializer_class = PersonSerializer
+    renderer_classes = TIMED_RENDERER_CLASSES
 
 
 @swagger_tools.additional_schema(
@@ -140,10 +309,17 @@ class PersonProductListView(generics.ListAPIView):
     """
 
     serializer_class = PersonProductSerializer
+    renderer_classes = TIMED_RENDERER_CLASSES
+
+    def get_person(self):
+        if not hasattr(self, 'person'):
+            self.person = get_object_or_404(
+                Person, id=self.kwargs.get('person_id'))
+        return self.person
 
     def get_queryset(self):
-        person = Person.objects.get(id=self.kwargs.get('person_id'))
-        return person.products
+        return Product.objects.filter(
+            tasks__person=self.get_person()).distinct()
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -153,10 +329,12 @@ class PersonProductListView(generics.ListAPIView):
         end_date = self.request.query_params.get('end_date')
         if end_date:
             end_date = parse_date(end_date)
+        person = self.get_person()
         return {
             'start_date': start_date,
             'end_date': end_date,
-            'person': Person.objects.get(id=self.kwargs.get('person_id')),
+            'person': person,
+            'time_on_products': person.time_on_products(start_date, end_date),
             **context
         }
 
@@ -173,6 +351,7 @@ def service_html(request, id):
 
 
 @api_view(['GET'])
+@conditional_json
 def service_json(request, id):
     """
     detail view of a single service area
@@ -183,9 +362,14 @@ def service_json(request, id):
         error = 'cannot find service area with id={}'.format(id)
         return Response({'error': error}, status=404)
     # get the profile of the service
-    profile = area.profile(
-        calculation_start_date=settings.PEOPLE_COST_CALCATION_STARTING_POINT)
-    return Response(profile)
+    profile_kwargs = {
+        'calculation_start_date': settings.PEOPLE_COST_CALCATION_STARTING_POINT
+    }
+    return _cached_json_response(
+        request,
+        method_cache_key(Area.profile, area, **profile_kwargs),
+        lambda: area.profile(**profile_kwargs)
+    )
 
 
 def portfolio_html(request):
@@ -193,17 +377,21 @@ def portfolio_html(request):
 
 
 @api_view(['GET'])
+@conditional_json
 def services_json(request):
     """
     list view of all service areas
     """
-    result = [
-        area.profile(
-            calculation_start_date=settings.PEOPLE_COST_CALCATION_STARTING_POINT
-        )
-        for area in Area.objects.filter(visible=True)
-    ]
-    return Response(result)
+    profile_kwargs = {
+        'calculation_start_date': settings.PEOPLE_COST_CALCATION_STARTING_POINT
+    }
+    areas = Area.objects.filter(visible=True)
+    return _cached_json_response(
+        request,
+        tuple(method_cache_key(Area.profile, area, **profile_kwargs)
+              for area in areas),
+        lambda: [area.profile(**profile_kwargs) for area in areas]
+    )
 
 
 @login_required
@@ -221,19 +409,67 @@ def sync_from_float(request):
 @require_http_methods(['GET'])
 def products_spreadsheet(request, **kwargs):
     show = kwargs.get('show', 'visible')
-    if show == 'visible':
-        products = Product.objects.visible()
-    elif show == 'all':
-        products = Product.objects.all()
-    else:
-        products = Product.objects.filter(pk=show)
-    spreadsheet = spreadsheets.Products(
-        products, settings.PEOPLE_COST_CALCATION_STARTING_POINT
-    )
-    response = HttpResponse(content_type="application/vnd.ms-excel")
-    response['Content-Disposition'] = 'attachment; filename={}_{}_{}.xlsx'.format(
-        'ProductData', show, datetime.now().strftime('%Y-%m-%d_%H:%M:%S'))
-    spreadsheet.workbook.save(response)
+    if request.GET.get('background'):
+        return start_export_job(request, 'products', {'show': show})
+    # the write only workbook is saved to a temporary file, which is
+    # streamed in chunks and removed when the response is closed.
+    xlsx = tempfile.TemporaryFile()
+    with unit_of_work():
+        spreadsheet, filename = exports.products_workbook({'show': show})
+        spreadsheet.save(xlsx)
+    xlsx.seek(0)
+    response = FileResponse(xlsx, content_type="application/vnd.ms-excel")
+    response['Content-Disposition'] = 'attachment; filename={}'.format(filename)
+    return response
+
+
+def start_export_job(request, kind, params):
+    """
+    get or create an export job and run it in the background when new
+    :return: a redirect to the page of the job
+    """
+    user = request.user if request.user.is_authenticated() else None
+    job, created = ExportJob.objects.request(kind, params, user=user)
+    if created:
+        # the job has to be committed before the worker can pick it up
+        transaction.on_commit(lambda: run_export_job.delay(job.id))
+    return redirect(reverse(export_job_html, kwargs={'id': job.id}))
+
+
+def _get_export_job(request, id):
+    job = get_object_or_404(ExportJob, id=id)
+    if not job.can_user_access(request.user):
+        raise PermissionDenied
+    return job
+
+
+@require_http_methods(['GET'])
+def export_job_html(request, id):
+    job = _get_export_job(request, id)
+    return render(request, 'export_job.html', {'job': job})
+
+
+@api_view(['GET'])
+def export_job_json(request, id):
+    """
+    status of an export job
+    """
+    job = _get_export_job(request, id)
+    result = job.as_dict()
+    if job.status == EXPORT_STATUSES.DONE:
+        result['download_url'] = reverse(
+            export_job_download, kwargs={'id': job.id})
+    return Response(result)
+
+
+@require_http_methods(['GET'])
+def export_job_download(request, id):
+    job = _get_export_job(request, id)
+    if job.status != EXPORT_STATUSES.DONE:
+        raise Http404
+    response = FileResponse(job.open(), content_type="application/vnd.ms-excel")
+    response['Content-Disposition'] = 'attachment; filename={}'.format(
+        job.filename)
     return response
 
 
@@ -247,8 +483,11 @@ class DepartmentViewSet(viewsets.ReadOnlyModelViewSet):
     list:
     List view of departments
     """
-    queryset = Department.objects.all()
+    queryset = Department.objects.prefetch_related(
+        Prefetch('persons', queryset=current_persons(),
+                 to_attr='current_persons'))
     serializer_class = DepartmentSerializer
+    renderer_classes = TIMED_RENDERER_CLASSES
 
 
 class SkillViewSet(viewsets.ReadOnlyModelViewSet):
@@ -261,5 +500,17 @@ class SkillViewSet(viewsets.ReadOnlyModelViewSet):
     list:
     List view of skills
     """
-    queryset = Skill.objects.all()
+    queryset = Skill.objects.prefetch_related(
+        Prefetch('persons', queryset=current_persons(),
+                 to_attr='current_persons'))
     serializer_class = SkillSerializer
+    renderer_classes = TIMED_RENDERER_CLASSES
+
+
+@staff_member_required
+def instrumentation_json(request):
+    """
+    count, p50 and p95 of the durations of each route handled by this
+    process, when the instrumentation middleware is enabled
+    """
+    return JsonResponse({'routes': route_stats()})
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 from datetime import date
-import re
 from dateutil.relativedelta import relativedelta
 from django.core.checks import messages
 from django.conf.urls import url
@@ -17,6 +16,7 @@ from dashboard.libs.rate_converter import last_date_in_month
 
 from dashboard.apps.dashboard.permissions import FinancePermissions
 from dashboard.apps.dashboard.models import Area
+from dashboard.apps.dashboard.views import start_export_job
 
 from reports.forms import PayrollUploadForm, ExportForm
 from reports.models import Report
@@ -69,7 +69,8 @@ class ReportsAdmin(admin.ModelAdmin, FinancePermissions):
             if form.is_valid():
                 form.save()
                 level = messages.INFO
-                message = 'Successfully uploaded %s payroll' % form.month
+                message = 'Successfully uploaded %s payroll: %s' % (
+                    form.month, form.summary)
             else:
                 level = messages.ERROR
                 message = 'Errors uploading %s payroll' % form.month
@@ -109,14 +110,10 @@ class ReportsAdmin(admin.ModelAdmin, FinancePermissions):
             form = ExportForm(data=request.POST, files=request.FILES,
                               initial=initial)
             if form.is_valid():
-                fname = '%s_%s_%s-%s.xlsm' % (
-                    form.cleaned_data['export_type'],
-                    re.sub(
-                        '[^0-9a-zA-Z]+',
-                        '-',
-                        form.cleaned_data['product'].name),
-                    form.cleaned_data['date_range'][0].year,
-                    form.cleaned_data['date_range'][0].month)
+                if request.POST.get('background'):
+                    return start_export_job(
+                        request, 'journal', form.job_params)
+                fname = form.filename
                 workbook = form.export()
                 response = HttpResponse(
                     content_type="application/vnd.ms-excel")
@@ -1,24 +1,26 @@
 # -*- coding: utf-8 -*-
-from collections import defaultdict
+from collections import Counter
 import copy
 import os
 from decimal import Decimal
 from datetime import datetime, date
 import re
+import time
 
 from django import forms
 from django.conf import settings
 from django.core.exceptions import ValidationError
-
-from openpyxl import load_workbook
-from openpyxl.cell import Cell
-from openpyxl.utils import get_column_letter
-from xlrd import open_workbook, XLRDError
+from django.db import transaction
+from django.db.models import Case, When, Value
 
 from dashboard.apps.dashboard.constants import COST_TYPES, PAYROLL_COSTS
 from dashboard.apps.dashboard.spreadsheets import Export, CURRENCY_FORMAT
-from dashboard.libs.date_tools import get_workdays
+from dashboard.libs.date_tools import get_workdays, parse_date
+from dashboard.libs.cache_tools import (
+    mark_data_version, CACHE_GENERATION_KEY)
 from dashboard.apps.dashboard.models import Person, Rate, Product, PersonCost
+from dashboard.apps.dashboard.models.rates import (
+    PersonRates, people_costs_breakdown)
 
 from .widgets import DateRangeWidget, RE_DATE_RANGE
 
@@ -91,40 +93,66 @@ class PayrollUploadForm(forms.Form):
         if dr:
             return dr[0].strftime('%Y-%m')
 
-    def get_person(self, row, data):
-        try:
-            return Person.objects.get(
-                staff_number=data['Staff'],
-            )
-        except Person.DoesNotExist:
-            pass
+    def load_people(self):
+        """
+        load all the people once and index them by staff number, and the
+        civil servants by upper case name for matching by surname
+        """
+        self.by_staff_number = {}
+        self.civil_servants = []
+        for person in Person.objects.all():
+            if person.staff_number:
+                self.by_staff_number[person.staff_number] = person
+            if not person.is_contractor:
+                self.civil_servants.append((person.name.upper(), person))
+        self.by_surname = {}
 
+    def with_surname(self, surname):
+        """
+        civil servants whose names contain the surname, case insensitive
+        """
+        surname = str(surname).upper()
+        if surname not in self.by_surname:
+            self.by_surname[surname] = [
+                person for name, person in self.civil_servants
+                if surname in name]
+        return self.by_surname[surname]
+
+    def get_person(self, row, data):
         try:
-            return Person.objects.get(
-                name__icontains=data.get('Surname'),
-                name__startswith=data.get('Init')[0],
-                is_contractor=False,
-            )
-        except Person.DoesNotExist:
-            try:
-                return Person.objects.get(
-                    name__icontains=data.get('Surname'),
-                    is_contractor=False,
-                )
-            except (Person.DoesNotExist, Person.MultipleObjectsReturned):
-                pass
+            person = self.by_staff_number.get(int(data['Staff']))
+        except (TypeError, ValueError):
+            person = None
+        if person:
+            self.matches['staff_number'] += 1
+            return person
+
+        surname = data.get('Surname')
+        with_surname = self.with_surname(surname)
+        with_initial = [
+            person for person in with_surname
+            if person.name.startswith(data.get('Init')[0])]
+        if len(with_initial) == 1:
+            self.matches['name'] += 1
+            return with_initial[0]
+        if len(with_initial) > 1:
             self.add_error(
                 'payroll_file',
-                'ERROR ROW %s: Civil Servant not found with Surname "%s" '
-                'and initials "%s"' %
-                (row, data.get('Surname'), data.get('Init')))
-        except Person.MultipleObjectsReturned:
+                'ERROR ROW %s: Multiple Civil Servants found with Surname '
+                '"%s"' % (row, surname))
+        elif len(with_surname) == 1:
+            self.matches['name'] += 1
+            return with_surname[0]
+        else:
             self.add_error(
                 'payroll_file',
-                'ERROR ROW %s: Multiple Civil Servants found with Surname '
-                '"%s"' % (row, data.get('Surname')))
+                'ERROR ROW %s: Civil Servant not found with Surname "%s" '
+                'and initials "%s"' %
+                (row, surname, data.get('Init')))
+        self.matches['not_found'] += 1
 
     def clean_payroll_file(self):
+        from xlrd import open_workbook, XLRDError
         start, end = self.cleaned_data.get('date_range')
         if not start or not end:
             raise ValidationError('No date supplied.')
@@ -149,6 +177,9 @@ class PayrollUploadForm(forms.Form):
                                   .join(missing_required))
 
         payroll = []
+        started = time.time()
+        self.matches = Counter(staff_number=0, name=0, not_found=0)
+        self.load_people()
 
         for row in range(2, ws.nrows):
             row_data = ws.row_values(row)
@@ -177,36 +208,88 @@ class PayrollUploadForm(forms.Form):
                         'additional': additional
                     })
 
+        self.seconds = time.time() - started
         return payroll
 
+    @property
+    def summary(self):
+        """
+        match counts and time taken by the upload
+        """
+        return '%s matched by staff number, %s by name, %s not found ' \
+            'in %.2f seconds' % (
+                self.matches['staff_number'], self.matches['name'],
+                self.matches['not_found'], self.seconds)
+
+    @transaction.atomic
     def save(self):
-        for pay in self.cleaned_data['payroll_file']:
+        """
+        create or update the rates and additional costs of the month
+        with a few queries for all the people
+        """
+        started = time.time()
+        payroll = self.cleaned_data['payroll_file']
+        if not payroll:
+            return
+        start, end = payroll[0]['start'], payroll[0]['end']
+
+        # the last row of a person wins, same as saving row by row
+        rates = {}
+        staff_numbers = {}
+        costs = {}
+        for pay in payroll:
             person = pay['person']
-            rate, created = Rate.objects.get_or_create(
-                person=person,
-                start_date=pay['start'],
-                defaults=dict(rate=pay['rate'],)
-            )
-
-            if not created:
-                rate.rate = pay['rate']
-                rate.save()
-
+            rates[person.id] = pay['rate']
             if not person.staff_number:
-                person.staff_number = pay['staff_number']
-                person.save()
-
+                staff_numbers[person.id] = pay['staff_number']
             for name, cost in pay['additional'].items():
-                additional, created = PersonCost.objects.get_or_create(
-                    person=person,
-                    start_date=pay['start'],
-                    end_date=pay['end'],
-                    type=COST_TYPES.MONTHLY,
-                    name=name,
-                    defaults=dict(cost=cost),
-                )
-                additional.cost = cost
-                additional.save()
+                costs[(person.id, name)] = cost
+
+        existing_rates = dict(Rate.objects.filter(
+            person_id__in=rates, start_date=start).values_list(
+                'person_id', 'id'))
+        update_in_bulk(Rate, 'rate', {
+            existing_rates[person_id]: rate
+            for person_id, rate in rates.items()
+            if person_id in existing_rates})
+        Rate.objects.bulk_create([
+            Rate(person_id=person_id, start_date=start, rate=rate)
+            for person_id, rate in rates.items()
+            if person_id not in existing_rates])
+
+        update_in_bulk(Person, 'staff_number', staff_numbers)
+
+        existing_costs = {
+            (cost.person_id, cost.name): cost.id
+            for cost in PersonCost.objects.filter(
+                person_id__in=rates, start_date=start, end_date=end,
+                type=COST_TYPES.MONTHLY)
+        }
+        update_in_bulk(PersonCost, 'cost', {
+            existing_costs[key]: cost for key, cost in costs.items()
+            if key in existing_costs})
+        PersonCost.objects.bulk_create([
+            PersonCost(person_id=person_id, name=name, start_date=start,
+                       end_date=end, type=COST_TYPES.MONTHLY, cost=cost)
+            for (person_id, name), cost in costs.items()
+            if (person_id, name) not in existing_costs])
+        # the rows are saved in bulk, without signals or admin log entries
+        mark_data_version(CACHE_GENERATION_KEY)
+        self.seconds += time.time() - started
+
+
+def update_in_bulk(model, field, values):
+    """
+    set a field to a different value for each of many rows in one query
+    :param model: a model class
+    :param field: name of the field
+    :param values: a dictionary of primary key to value
+    """
+    if not values:
+        return
+    model.objects.filter(pk__in=values).update(**{field: Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in values.items()],
+        output_field=model._meta.get_field(field))})
 
 
 EXPORTS = (
@@ -228,11 +311,31 @@ class ExportForm(forms.Form):
         export = ExportClass(cleaned_data=self.cleaned_data)
         return export.export()
 
+    @property
+    def filename(self):
+        return journal_filename(
+            self.cleaned_data['export_type'],
+            self.cleaned_data['product'],
+            self.cleaned_data['date_range'])
+
+    @property
+    def job_params(self):
+        """
+        parameters for running the export as an export job
+        """
+        return {
+            'export_type': self.cleaned_data['export_type'],
+            'product': self.cleaned_data['product'].pk,
+            'date_range': [
+                d.isoformat() for d in self.cleaned_data['date_range']],
+        }
+
 
 class TemplateExport(Export):
     template = 'xls/Journal_Template.xltm'
 
     def export(self):
+        from openpyxl import load_workbook
         wb = load_workbook(self._get_template(), keep_vba=True)
         self.write(wb)
         return wb
@@ -280,26 +383,33 @@ class TemplateExport(Export):
             ws.cell(row=self.row, column=7).value = product.hr_id
             self.row += 1
 
+        breakdown = people_costs_breakdown(
+            product.tasks.between(start_date, end_date).select_related(
+                'person'),
+            start_date, end_date, names=PAYROLL_COSTS + ['Write Offs'])
+
+        def total(key, contractor=None):
+            return sum(
+                (detail[key] for person, detail in breakdown.items()
+                 if contractor is None or person.is_contractor == contractor),
+                Decimal('0'))
+
         # Total Contractor costs
-        write_content_row('Agency', product.people_costs(
-            start_date, end_date, contractor_only=True))
+        write_content_row('Agency', total('total', contractor=True))
 
         # Total Salary Costs
-        write_content_row('Salary', product.non_contractor_salary_costs(
-            start_date, end_date))
+        write_content_row('Salary', total('total', contractor=False) -
+                          total('additional'))
 
         # Other Costs
         for cost_type in PAYROLL_COSTS:
-            write_content_row(cost_type, product.people_additional_costs(
-                start_date, end_date, name=cost_type))
+            write_content_row(cost_type, total(cost_type))
 
         # Total Write Offs
-        write_content_row('Write Offs', -product.people_additional_costs(
-            start_date, end_date, name='Write Offs'), 8)
+        write_content_row('Write Offs', -total('Write Offs'), 8)
 
         # Total People costs for project
-        write_content_row('Resource', product.people_costs(
-            start_date, end_date), 8)
+        write_content_row('Resource', total('total'), 8)
 
 
 class AdjustmentExport(TemplateExport):
@@ -324,22 +434,23 @@ class ProductDetailExport(TemplateExport):
         product = self.cleaned_data['product']
         start_date, end_date = self.cleaned_data['date_range']
 
-        details = defaultdict(lambda: defaultdict(Decimal))
+        tasks = list(product.tasks.between(
+            start_date, end_date).select_related('person'))
+        rates = PersonRates({task.person for task in tasks})
 
-        def add_cost(task):
-            s = max(task.start_date, start_date)
-            e = min(task.end_date, end_date)
-            if not task.person.is_contractor:
-                for name in PAYROLL_COSTS:
-                    details[task.person][name] += task.people_costs(
-                        s, e, additional_cost_name=name)
-            details[task.person]['total'] += task.people_costs(s, e)
-            details[task.person]['days'] += task.get_days(s, e)
-            details[task.person][BASE_SALARY_RATE_KEY] = \
-                task.person.base_rate_between(s, e) * \
-                details[task.person]['days']
+        def first_occurrence(task):
+            # each task is counted from its start to its end date in the
+            # time window, i.e. weekly repeating tasks only once
+            return max(task.start_date, start_date), min(task.end_date,
+                                                         end_date)
 
-        list(map(add_cost, product.tasks.between(start_date, end_date)))
+        details = people_costs_breakdown(
+            tasks, start_date, end_date, names=PAYROLL_COSTS, rates=rates,
+            task_window=first_occurrence)
+        # the salary is the base rate in the time window of the last task
+        # of each person times all their days
+        salary_windows = {
+            task.person: first_occurrence(task) for task in tasks}
 
         ws.cell(row=2, column=1).value = datetime.now().strftime('%d/%m/%Y %I:%M%p')
         ws.cell(row=3, column=7).value = '%s DRAFT' % \
@@ -360,14 +471,15 @@ class ProductDetailExport(TemplateExport):
             ws.cell(row=row, column=12).value = ''
 
             if person.is_contractor:
-                ws.cell(row=row, column=13).value = person.rate_between(
-                    start_date, end_date)
+                ws.cell(row=row, column=13).value = rates.rate_between(
+                    person, start_date, end_date)
             ws.cell(row=row, column=14).value = detail['total']
 
             ws.cell(row=row, column=15).value = ''
 
             if not person.is_contractor:
-                ws.cell(row=row, column=18).value = detail['Salary']
+                ws.cell(row=row, column=18).value = rates.base_rate_between(
+                    person, *salary_windows[person]) * detail['days']
                 ws.cell(row=row, column=19).value = detail['Misc.Allow.']
                 ws.cell(row=row, column=20).value = detail['ERNIC']
                 ws.cell(row=row, column=21).value = '?'
@@ -397,6 +509,29 @@ EXPORT_CLASSES = {
 }
 
 
+def journal_filename(export_type, product, date_range):
+    return '%s_%s_%s-%s.xlsm' % (
+        export_type,
+        re.sub('[^0-9a-zA-Z]+', '-', product.name),
+        date_range[0].year,
+        date_range[0].month)
+
+
+def journal_workbook(params):
+    """
+    render an export for an export job, see `ExportForm.job_params`
+    """
+    product = Product.objects.get(pk=params['product'])
+    date_range = tuple(parse_date(d) for d in params['date_range'])
+    export_type = params['export_type']
+    export = EXPORT_CLASSES[export_type](cleaned_data={
+        'export_type': export_type,
+        'product': product,
+        'date_range': date_range,
+    })
+    return export.export(), journal_filename(export_type, product, date_range)
+
+
 def insert_rows(ws, row_idx, cnt, above=False, copy_style=True,
                 fill_formulae=True):  # flake8: noqa  # pragma: no cover
     """Inserts new (empty) rows into worksheet at specified row index.
@@ -414,6 +549,8 @@ def insert_rows(ws, row_idx, cnt, above=False, copy_style=True,
     * insert_rows(2, 10, above=True, copy_style=False)
 
     """
+    from openpyxl.cell import Cell
+    from openpyxl.utils import get_column_letter
     RE_RANGE = re.compile(
         "(?P<s_col>[A-Z]+)(?P<s_row>\d+):(?P<e_col>[A-Z]+)(?P<e_row>\d+)")
 
@@ -2,6 +2,7 @@
 from datetime import date
 from decimal import Decimal
 from os.path import dirname, abspath, join
+from unittest.mock import patch
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
@@ -10,7 +11,8 @@ from django.utils.datastructures import MultiValueDict
 from model_mommy import mommy
 import pytest
 
-from dashboard.apps.dashboard.models import Person
+from dashboard.apps.dashboard.models import Person, Rate, PersonCost
+from dashboard.libs.cache_tools import CACHE_GENERATION_KEY
 
 from ..forms import PayrollUploadForm
 
@@ -62,8 +64,20 @@ def test_valid_upload_form():
                                                                  'Misc.Allow.': Decimal('1')}}]
     assert form.errors == {}
     assert form.month == '2016-01'
+    assert form.matches == {'staff_number': 0, 'name': 3, 'not_found': 0}
+    with patch('dashboard.apps.reports.forms.mark_data_version') as mark:
+        assert form.save() is None
+    # the json endpoints serve the new rates
+    mark.assert_called_once_with(CACHE_GENERATION_KEY)
     assert form.save() is None
-    assert form.save() is None
+    assert Rate.objects.filter(start_date=date(2016, 1, 1)).count() == 3
+    assert PersonCost.objects.filter(person=p1).count() == 5
+    assert PersonCost.objects.get(person=p1, name='Write Offs').cost == \
+        Decimal('-1')
+    assert sorted(Person.objects.exclude(staff_number=None).values_list(
+        'staff_number', flat=True)) == [123470, 123504, 123507]
+    assert form.summary.startswith(
+        '0 matched by staff number, 3 by name, 0 not found in ')
 
 
 @pytest.mark.django_db
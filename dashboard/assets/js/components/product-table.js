@@ -210,8 +210,8 @@ export function ExportProducts() {
     <div className="export-container">
       <h4 className="heading-medium">Download product data</h4>
       <ul>
-        <li><a href="/products/export/visible/" className="export-button">Excel (visible products only)</a></li>
-        <li><a href="/products/export/all/" className="export-button">Excel (all products)</a></li>
+        <li><a href="/products/export/visible/?background=1" className="export-button">Excel (visible products only)</a></li>
+        <li><a href="/products/export/all/?background=1" className="export-button">Excel (all products)</a></li>
       </ul>
     </div>
   )
@@ -352,7 +352,7 @@ export function ExportProduct({ productId }) {
     <div className="export-container">
       <h4 className="heading-medium">Download product data</h4>
       <ul>
-        <li><a href={ "/products/export/" + productId + "/" }
+        <li><a href={ "/products/export/" + productId + "/?background=1" }
                className="export-button">Excel</a></li>
       </ul>
     </div>
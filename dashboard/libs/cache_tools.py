@@ -5,15 +5,42 @@ utilities for cache
 import logging
 from hashlib import sha224
 from functools import wraps
+import gzip
 import pickle
 import inspect
 from collections import OrderedDict
 
 from django.core.cache import cache
 from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.utils import timezone
+
+from .instrumentation import record_cache
 
 logger = logging.getLogger('cache')
 
+# keys for the time of events which change the data served by the api.
+# the cache generation is also marked by changes made in the admin and
+# by payroll uploads
+LAST_SYNC_KEY = 'data-version-last-sync'
+CACHE_GENERATION_KEY = 'data-version-cache-generation'
+
+
+def mark_data_version(key):
+    """
+    record the current time against a data version key.
+    the value never expires.
+    :param key: LAST_SYNC_KEY or CACHE_GENERATION_KEY
+    """
+    cache.set(key, timezone.now(), None)
+
+
+def get_data_version(key):
+    """
+    :param key: LAST_SYNC_KEY or CACHE_GENERATION_KEY
+    :returns: a datetime object or None if not recorded
+    """
+    return cache.get(key)
+
 
 def cache_key(function, instance, args, kwargs):
     """
@@ -36,6 +63,8 @@ def cache_key(function, instance, args, kwargs):
     key_tuple = (
         function.__module__,
         function.__name__,
+        # methods shared by models, e.g. products and product groups
+        type(instance).__name__,
         instance.id,
         inspect_arguments(function, args, kwargs)
     )
@@ -44,6 +73,58 @@ def cache_key(function, instance, args, kwargs):
     return key
 
 
+def method_cache_key(method, instance, *args, **kwargs):
+    """
+    the key `method_cache` uses for a call of a method.
+    :param method: a method, decorated with `method_cache` or not
+    :param instance: the object the method is called on
+    :returns: str key
+    :raises: PickingError, ValueError, TypeError
+    """
+    method = getattr(method, '__wrapped__', method)
+    return cache_key(method, instance, (None,) + args, kwargs)
+
+
+def rendered_cache_key(key):
+    """
+    key for the rendered responses of the data cached under a key. all the
+    variants of the response are kept under this one key. it changes with
+    the data version of the last cache generation, so that nothing rendered
+    before the data is generated again is served after it.
+    :param key: cache key of the data, or a tuple of them
+    :returns: str key
+    """
+    version = get_data_version(CACHE_GENERATION_KEY)
+    return sha224(pickle.dumps(('rendered', key, version))).hexdigest()
+
+
+def get_or_render(key, render, timeout=DEFAULT_TIMEOUT, compress=False,
+                  **variant):
+    """
+    get rendered content from the cache. if not found, render it and
+    put it in the cache.
+    :param key: str key, see `rendered_cache_key`
+    :param render: a callable returning bytes
+    :param timeout: an integer for the timeout in seconds
+    :param compress: whether to gzip the content
+    :param variant: any other value the rendered content depends on
+    :returns: a tuple of the content in bytes and a boolean for whether
+    the content is gzipped
+    """
+    variant_key = tuple(sorted(variant.items()))
+    rendered = cache.get(key) or {}
+    record_cache('rendered', variant_key in rendered)
+    if variant_key in rendered:
+        logger.debug('rendered content found for key %s', key)
+        return rendered[variant_key]
+    content = render()
+    if compress:
+        content = gzip.compress(content)
+    rendered[variant_key] = (content, compress)
+    cache.set(key, rendered, timeout)
+    return content, compress
+
+
 def inspect_positional_arguments(parameters, args):
     """
     inspect positional arguments
@@ -180,6 +261,7 @@ class method_cache:
 
             if not ignore_cache and key in cache:
                 logger.debug('cache found for key %s', key)
+                record_cache(method.__qualname__, True)
                 return cache.get(key)
 
             if ignore_cache:
@@ -192,6 +274,7 @@ class method_cache:
                     kwargs
                 )
             else:
+                record_cache(method.__qualname__, False)
                 logger.info(
                     'cache missed.'
                     ' call function name: "%s", instance: "%s", *args: "%s", *kwargs: "%s")',
@@ -204,4 +287,49 @@ class method_cache:
             logger.debug('cache generated for key %s', key)
             cache.set(key, result, self.timeout)
             return result
+        wrapper.cache_timeout = self.timeout
         return wrapper
+
+
+def method_cache_many(method, instance, calls, compute, ignore_cache=False):
+    """
+    look up the results of many calls of a method decorated with
+    `method_cache` at once, in one round trip to the cache. the calls not
+    found in the cache are worked out together by `compute` and their
+    results are put in the cache in one more round trip, as if the method
+    had been called.
+    :param method: a method decorated with `method_cache`
+    :param instance: the object the method is called on
+    :param calls: a dictionary of an identifier of each call to a tuple
+    of the positional arguments and keyword arguments of the call
+    :param compute: a callable taking a list of identifiers of the calls
+    and returning a dictionary of identifier to result
+    :param ignore_cache: True to work out all the calls
+    :returns: a dictionary of identifier to result
+    """
+    try:
+        keys = {
+            call: method_cache_key(method, instance, *args, **kwargs)
+            for call, (args, kwargs) in calls.items()
+        }
+    except Exception:
+        logger.exception('generate cache_key failed')
+        return compute(list(calls))
+
+    result = {}
+    if not ignore_cache:
+        found = cache.get_many(list(keys.values()))
+        result = {call: found[key] for call, key in keys.items()
+                  if key in found}
+        record_cache(method.__qualname__, True, len(result))
+    missing = [call for call in calls if call not in result]
+    if missing:
+        if not ignore_cache:
+            record_cache(method.__qualname__, False, len(missing))
+        logger.info('cache missed for %s calls of "%s", instance: "%s"',
+                    len(missing), method.__name__, instance)
+        computed = compute(missing)
+        cache.set_many({keys[call]: computed[call] for call in missing},
+                       method.cache_timeout)
+        result.update(computed)
+    return result
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+dates of a frequency between two dates, the same as `pandas.date_range`
+for the offset aliases used by the dashboard:
+MS for month start, QS for quarter start, AS (or YS) for year start and
+W-MON, W-TUE etc for weeks on a day, W being W-SUN, all optionally with
+a multiple, e.g. 2QS for every two quarters.
+"""
+from datetime import date, timedelta
+import re
+
+WEEKDAYS = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']
+
+FREQ_PATTERN = re.compile(
+    r'^(?P<multiple>\d*)(?P<unit>MS|QS|AS|YS|W(?:-(?:{}))?)$'.format(
+        '|'.join(WEEKDAYS)))
+
+# months in a time frame of each unit starting in a month
+MONTHS = {'MS': 1, 'QS': 3, 'AS': 12, 'YS': 12}
+
+
+class Frequency():
+    """
+    an offset alias, see the module docstring
+    """
+
+    def __init__(self, freq):
+        """
+        :param freq: an offset alias, e.g. MS or 2QS
+        :raises: ValueError for an offset alias not supported
+        """
+        match = FREQ_PATTERN.match(freq)
+        if not match:
+            raise ValueError('invalid frequency: {}'.format(freq))
+        self.multiple = int(match.group('multiple') or 1)
+        unit = match.group('unit')
+        if unit == 'W':
+            unit = 'W-SUN'
+        if unit.startswith('W-'):
+            self.months = None
+            self.weekday = WEEKDAYS.index(unit[2:])
+        else:
+            self.months = MONTHS[unit]
+
+    def on_offset(self, day):
+        """
+        whether a date is the start of a time frame
+        """
+        if self.months is None:
+            return day.weekday() == self.weekday
+        return day.day == 1 and (day.month - 1) % self.months == 0
+
+    def _add_months(self, day, months):
+        # only for the first day of a month
+        month = day.month - 1 + months
+        return date(day.year + month // 12, month % 12 + 1, 1)
+
+    def rollback(self, day):
+        """
+        :return: the start of the time frame of a date
+        """
+        if self.months is None:
+            return day - timedelta(days=(day.weekday() - self.weekday) % 7)
+        return self._add_months(
+            day.replace(day=1), -((day.month - 1) % self.months))
+
+    def rollforward(self, day):
+        """
+        :return: the start of the next time frame of a date, or the date
+        if it is the start of a time frame
+        """
+        if self.on_offset(day):
+            return day
+        if self.months is None:
+            return day + timedelta(days=(self.weekday - day.weekday()) % 7)
+        return self._add_months(self.rollback(day), self.months)
+
+    def next(self, day):
+        """
+        :return: the date a multiple of time frames after the start of
+        a time frame
+        """
+        if self.months is None:
+            return day + timedelta(weeks=self.multiple)
+        return self._add_months(day, self.months * self.multiple)
+
+
+def date_range(start_date, end_date, freq):
+    """
+    same as `pandas.date_range(start_date, end_date, freq=freq)`
+    :param start_date: a date object
+    :param end_date: a date object
+    :param freq: an offset alias, see the module docstring
+    :return: a list of date objects
+    """
+    frequency = Frequency(freq)
+    dates = []
+    day = frequency.rollforward(start_date)
+    while day <= end_date:
+        dates.append(day)
+        day = frequency.next(day)
+    return dates
+
+
+def rollback(day, freq):
+    """
+    same as `pandas.date_range(end=day, periods=1, freq=freq)[0]`
+    """
+    return Frequency(freq).rollback(day)
+
+
+def rollforward(day, freq):
+    """
+    same as `pandas.date_range(start=day, periods=1, freq=freq)[0]`
+    """
+    return Frequency(freq).rollforward(day)
@@ -3,14 +3,13 @@
 """
 tools for dealing with dates
 """
+from bisect import bisect_left, bisect_right
 from datetime import date, datetime, timedelta
-from dateutil.rrule import rrule, MONTHLY
+from dateutil.rrule import rrule, MONTHLY, YEARLY, DAILY
 from functools import lru_cache
 import calendar
 
-from numpy import busday_count
-from pandas import date_range
-import requests
+from .date_slicer import date_range, rollback, rollforward
 
 BANK_HOLIDAY_URL = 'https://www.gov.uk/bank-holidays/england-and-wales.json'
 
@@ -41,6 +40,7 @@ def get_bank_holidays():
     :return: a dictionary of bank holidays with the date as key and more
     details as value
     """
+    import requests
     response = requests.get(BANK_HOLIDAY_URL)
     response.raise_for_status()
     return [parse_date(event['date']) for event in response.json()['events']]
@@ -53,11 +53,39 @@ def get_workdays(start_date, end_date):
     :param end_date: date object for the end date
     :return: an integer for the number of work days
     """
+    from numpy import busday_count
     days = int(busday_count(start_date, end_date + timedelta(days=1),
                             holidays=get_bank_holidays()))
     return max(0, days)
 
 
+@lru_cache(maxsize=None)
+def month_workdays(year, month):
+    """
+    get the workdays of a month, worked out once for each month
+    :param year: an integer for the year
+    :param month: an integer for the month
+    :return: a tuple of the days of the month which are workdays
+    """
+    bank_holidays = set(get_bank_holidays())
+    _, last_day = calendar.monthrange(year, month)
+    days = (date(year, month, day) for day in range(1, last_day + 1))
+    return tuple(d.day for d in days
+                 if d.weekday() < 5 and d not in bank_holidays)
+
+
+def get_month_workdays(start_date, end_date):
+    """
+    same as `get_workdays` for a date span in a month, see `month_workdays`
+    :param start_date: date object for the start date
+    :param end_date: date object for the end date in the same month
+    :return: an integer for the number of work days
+    """
+    days = month_workdays(start_date.year, start_date.month)
+    return max(0, bisect_right(days, end_date.day) -
+               bisect_left(days, start_date.day))
+
+
 def get_workdays_list(start_date, end_date):
     """
     get a list of workdays in a time window defined by start date and end date
@@ -117,7 +145,8 @@ def slice_time_window(start_date, end_date, freq, extend=False):
     slice a time window by frequency
     :param start_date: start of the time window
     :param end_date: end of the time window
-    :param freq: frequency string is an offset aliases supported by pandas
+    :param freq: frequency string is an offset alias supported by
+    `date_slicer`, e.g. MS, QS, AS, W-MON or 2QS
     :param extend: a boolean value. if it's true, the start_date and end_date
     will be extended to the previous and next value following the frequency.
     for example, if the freqency is 'MS', the start date is 2016/01/03,
@@ -126,9 +155,9 @@ def slice_time_window(start_date, end_date, freq, extend=False):
     """
     end_date = end_date + timedelta(days=1)
     if extend:
-        start_date = date_range(end=start_date, periods=1, freq=freq)[0].date()
-        end_date = date_range(start=end_date, periods=1, freq=freq)[0].date()
-    dates = [ts.date() for ts in date_range(start_date, end_date, freq=freq)]
+        start_date = rollback(start_date, freq)
+        end_date = rollforward(end_date, freq)
+    dates = date_range(start_date, end_date, freq)
     if start_date not in dates:
         dates.insert(0, start_date)
     if end_date not in dates:
@@ -160,10 +189,75 @@ def dates_between(start_date, end_date, freq, bymonthday=None, bysetpos=None,
                   byyearday=byyearday)]
 
 
+def _leap_years_to(year):
+    return year // 4 - year // 100 + year // 400
+
+
+def _day_in_month(year, month, monthday):
+    # days after the end of the month fall on the last day of the month,
+    # same as `dates_between`
+    return date(year, month, min(monthday, calendar.monthrange(year, month)[1]))
+
+
+def _day_in_year(year, yearday):
+    if yearday > 365 + calendar.isleap(year):
+        return None
+    return date(year, 1, 1) + timedelta(days=yearday - 1)
+
+
+def count_dates_between(start_date, end_date, freq, bymonthday=None,
+                        byyearday=None):
+    """
+    same as `len(dates_between(...))` without making the dates
+    :param start_date: date object - date to start on
+    :param end_date:  date object - date to end on
+    :param freq: int object - DAILY, MONTHLY with bymonthday or YEARLY with
+    byyearday
+    :param bymonthday: int object - day of the month
+    :param byyearday: int object - day of the year
+    :return: number of dates, an integer
+    """
+    if start_date > end_date:
+        return 0
+    if freq == DAILY and not bymonthday and not byyearday:
+        return (end_date - start_date).days + 1
+    if freq == MONTHLY and bymonthday:
+        count = ((end_date.year - start_date.year) * 12 +
+                 end_date.month - start_date.month + 1)
+        first = _day_in_month(start_date.year, start_date.month, bymonthday)
+        last = _day_in_month(end_date.year, end_date.month, bymonthday)
+    elif freq == YEARLY and byyearday:
+        if byyearday == 366:
+            count = (_leap_years_to(end_date.year) -
+                     _leap_years_to(start_date.year - 1))
+        else:
+            count = end_date.year - start_date.year + 1
+        first = _day_in_year(start_date.year, byyearday)
+        last = _day_in_year(end_date.year, byyearday)
+    else:
+        raise ValueError('frequency {} not supported'.format(freq))
+    if first and first < start_date:
+        count -= 1
+    if last and last > end_date:
+        count -= 1
+    return count
+
+
 def financial_year_tuple(year):
     return date(year, 4, 6), date(year + 1, 4, 5)
 
 
+def financial_year(day):
+    """
+    get the financial year a date falls in, e.g. 05 Apr 2017 is in the
+    financial year 2016 and 06 Apr 2017 in 2017
+    :param day: a date object
+    :return: an integer for the year the financial year starts in
+    """
+    start, _ = financial_year_tuple(day.year)
+    return day.year if day >= start else day.year - 1
+
+
 def get_weekly_repeat_time_windows(start_date, end_date, repeat_end):
     repeat_times = (repeat_end - start_date).days // 7 + 1
     time_windows = [
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+opt in timing and query count instrumentation of requests.
+enable it by setting INSTRUMENTATION=True in the environment.
+"""
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('instrumentation')
+
+_local = threading.local()
+
+# durations in milliseconds of the latest requests of each route handled
+# by this process. requests not resolved to a view, such as 404s, are
+# all kept under '<unresolved>' so unknown paths cannot add routes
+_durations = defaultdict(
+    lambda: deque(maxlen=settings.INSTRUMENTATION_SAMPLES))
+
+
+class Measurement():
+    """
+    what happens during a request
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.cache = Counter()
+        self.method_cache = defaultdict(Counter)
+        self.timings = Counter()
+
+
+def current():
+    """
+    :return: the measurement of the request being handled or None
+    """
+    return getattr(_local, 'measurement', None)
+
+
+def record_cache(name, hit, count=1):
+    """
+    record cache hits or misses for the current request
+    :param name: what is cached, e.g. the name of a method
+    :param hit: True for hits, False for misses
+    :param count: number of hits or misses
+    """
+    measurement = current()
+    if measurement is not None and count:
+        outcome = 'hits' if hit else 'misses'
+        measurement.cache[outcome] += count
+        measurement.method_cache[name][outcome] += count
+
+
+@contextmanager
+def timer(name):
+    """
+    add the time taken by a block to a timing of the current request
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        measurement = current()
+        if measurement is not None:
+            measurement.timings[name] += time.perf_counter() - started
+
+
+def percentile(values, percent):
+    """
+    nearest rank percentile
+    :param values: a sorted list of numbers
+    :param percent: a number between 0 and 100
+    """
+    if not values:
+        return None
+    rank = max(0, -(-len(values) * percent // 100) - 1)
+    return values[int(rank)]
+
+
+def route_stats():
+    """
+    :return: a dictionary of route to the count, p50 and p95 of the
+    durations in milliseconds
+    """
+    stats = {}
+    for route, durations in list(_durations.items()):
+        values = sorted(durations)
+        stats[route] = {
+            'count': len(values),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+        }
+    return stats
+
+
+class InstrumentationMiddleware():
+    """
+    measures wall time, database queries, cache hits and misses and other
+    timings of each request. they are sent back in a `Server-Timing` header
+    and logged as json by the 'instrumentation' logger.
+    """
+
+    def process_request(self, request):
+        _local.measurement = Measurement()
+        request._instrumentation_debug_cursor = connection.force_debug_cursor
+        request._instrumentation_queries = len(connection.queries_log)
+        connection.force_debug_cursor = True
+
+    def process_response(self, request, response):
+        measurement = current()
+        if measurement is None:
+            return response
+        _local.measurement = None
+        connection.force_debug_cursor = request._instrumentation_debug_cursor
+        queries = list(connection.queries_log)[
+            request._instrumentation_queries:]
+        duration = (time.perf_counter() - measurement.started) * 1000
+        db_time = sum(float(query['time']) for query in queries) * 1000
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else '<unresolved>'
+        _durations[route].append(round(duration, 1))
+
+        server_timing = [
+            'total;dur={:.1f}'.format(duration),
+            'db;dur={:.1f};desc="{} queries"'.format(db_time, len(queries)),
+            'cache;desc="{} hits, {} misses"'.format(
+                measurement.cache['hits'], measurement.cache['misses']),
+        ] + [
+            '{};dur={:.1f}'.format(name, seconds * 1000)
+            for name, seconds in sorted(measurement.timings.items())
+        ]
+        response['Server-Timing'] = ', '.join(server_timing)
+
+        logger.info(json.dumps({
+            'route': route,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_ms': round(duration, 1),
+            'queries': len(queries),
+            'db_ms': round(db_time, 1),
+            'cache': dict(measurement.cache),
+            'method_cache': {
+                name: dict(counts)
+                for name, counts in measurement.method_cache.items()},
+            'timings_ms': {
+                name: round(seconds * 1000, 1)
+                for name, seconds in measurement.timings.items()},
+        }, sort_keys=True))
+        return response
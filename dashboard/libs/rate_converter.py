@@ -2,12 +2,11 @@
 from calendar import monthrange
 from datetime import date
 from decimal import Decimal
+from functools import lru_cache
 
-from dateutil.rrule import rrule, MONTHLY
 from extended_choices import Choices
-import numpy as np
 
-from .date_tools import get_workdays
+from .date_tools import get_workdays, get_month_workdays, month_workdays
 
 
 RATE_TYPES = Choices(
@@ -41,24 +40,85 @@ def last_date_in_month(d):
     return date(d.year, d.month, number)
 
 
-def month_segments(converter, start_date, end_date):
+@lru_cache(maxsize=None)
+def year_workdays(year):
     """
-    Split in to segments of months between start_date and end_date
-    :param converter: RateConverter object
+    Returns number of workdays in a year
+    :param year: int object
+    :return: int object
+    """
+    return sum(len(month_workdays(year, month)) for month in range(1, 13))
+
+
+@lru_cache(maxsize=4096)
+def day_rate(rate, workdays):
+    """
+    Returns a rate divided between workdays
+    :param rate: Decimal object
+    :param workdays: int object - number of workdays
+    :return: Decimal object
+    """
+    return rate / workdays
+
+
+def window_workdays(start_date, end_date):
+    """
+    Returns number of workdays between start_date and end_date, counted
+    with the workdays of each month in the time window
+    :param start_date: date object - start date of time window
+    :param end_date: date object - end date of time window
+    :return: int object
+    """
+    workdays = 0
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        workdays += get_month_workdays(
+            max(start_date, date(year, month, 1)),
+            min(end_date, date(year, month, monthrange(year, month)[1])))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return workdays
+
+
+def month_weights(start_date, end_date):
+    """
+    Workdays from the same day as start_date in each month up to end_date
+    to the end of the month, and from the start of the last month to
+    end_date
     :param start_date: date object - start date of segments
     :param end_date: date object - end date of segments
-    :return: list of tuples with (start, end, rate) for each month
+    :return: generator of tuples with (year, month, workdays)
     """
-    def rate(d):
-        return converter.rate / dec_workdays(*converter.get_date_range(d))
-
-    months = [(dt.date(), last_date_in_month(dt), rate(dt.date())) for dt in
-              rrule(MONTHLY, dtstart=start_date, until=end_date)]
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        last_day = monthrange(year, month)[1]
+        # months without the day are skipped
+        if start_date.day <= last_day and \
+                date(year, month, start_date.day) <= end_date:
+            yield year, month, get_month_workdays(
+                date(year, month, start_date.day),
+                date(year, month, last_day))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
     # include last month
-    months.append(
-        (date(end_date.year, end_date.month, 1), end_date, rate(end_date))
-    )
-    return months
+    yield end_date.year, end_date.month, get_month_workdays(
+        end_date.replace(day=1), end_date)
+
+
+def weighted_average(rates_and_weights):
+    """
+    Returns average of rates weighted by integers, worked out with exact
+    Decimal arithmetic
+    :param rates_and_weights: iterable of tuples (rate (Decimal object),
+                                                  weight (int object))
+    :return: Decimal object rounded to pence or None if all weights are 0
+    """
+    total = Decimal('0')
+    weights = 0
+    for rate, weight in rates_and_weights:
+        if weight:
+            total += rate * weight
+            weights += weight
+    if weights:
+        return round(total / weights, 2)
 
 
 def average_rate_from_segments(segments, total_workdays):
@@ -70,19 +130,8 @@ def average_rate_from_segments(segments, total_workdays):
     :return: Decimal object - average day rate over segments
     """
     if total_workdays:
-        weights = []
-        rates = []
-
-        for start, end, rate in segments:
-            # numpy won't average decimals
-            # this seems close enough though
-            weight = dec_workdays(start, end) / total_workdays
-            if weight:
-                weights.append(float(weight))
-                rates.append(float(rate))
-
-        if rates and weights:
-            return round(Decimal(np.average(rates, weights=weights)), 2)
+        return weighted_average(
+            (rate, get_workdays(start, end)) for start, end, rate in segments)
 
 
 class RateConverter():
@@ -139,9 +188,18 @@ class RateConverter():
         if not on:
             on = today()
 
-        start_date, end_date = self.get_date_range(on)
-        # No point continuing although would be same result
-        return round(self.rate / dec_workdays(start_date, end_date), 2)
+        return round(self.day_rate_in(on.year, on.month), 2)
+
+    def day_rate_in(self, year, month):
+        """
+        Returns the day rate of a monthly or yearly rate in a month
+        param: year: int object
+        param: month: int object
+        return: Decimal object - unrounded day rate
+        """
+        if self.rate_type == RATE_TYPES.MONTH:
+            return day_rate(self.rate, len(month_workdays(year, month)))
+        return day_rate(self.rate, year_workdays(year))
 
     def rate_between(self, start_date, end_date):
         """
@@ -154,7 +212,11 @@ class RateConverter():
         if self.rate_type == RATE_TYPES.DAY:
             return self.rate
 
-        total_workdays = dec_workdays(start_date, end_date)
-        segments = month_segments(self, start_date, end_date)
+        # the weights of the months overlap and go past the time window,
+        # so they can add up to more than nothing when it has no workdays
+        if not window_workdays(start_date, end_date):
+            return None
 
-        return average_rate_from_segments(segments, total_workdays)
+        return weighted_average(
+            (self.day_rate_in(year, month), workdays)
+            for year, month, workdays in month_weights(start_date, end_date))
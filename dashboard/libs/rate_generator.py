@@ -1,9 +1,6 @@
 """
 random rate generator
 """
-import pandas as pd
-from numpy.random import randint
-from fuzzywuzzy import process
 
 
 DEFAULT_RATES = {
@@ -92,6 +89,7 @@ def get_reference_rate(job_title, is_contractor):
     :param is_contractor: boolean
     :return: daily rate in integer value
     """
+    from fuzzywuzzy import process
     extracts = process.extract(job_title, REFERENCE_RATES_BY_TITLE .keys())
     matched, probability = extracts[0]
     if probability > 60:
@@ -111,6 +109,8 @@ def gen_rates(start_date, end_date, freq, min_rate, max_rate):
     """
     generate rates in a date range with a frequency based on a reference rate
     """
+    import pandas as pd
+    from numpy.random import randint
     date_range = pd.date_range(start_date, end_date, freq=freq)
     rates = pd.Series(randint(min_rate, max_rate, len(date_range)),
                       index=date_range)
@@ -88,6 +88,16 @@ class DummyCache:
     def get(self, key):
         return self.cache[key]['value']
 
+    def delete(self, key):
+        self.cache.pop(key, None)
+
+    def get_many(self, keys):
+        return {key: self.get(key) for key in keys if key in self.cache}
+
+    def set_many(self, data, timeout):
+        for key, value in data.items():
+            self.set(key, value, timeout)
+
 
 @pytest.mark.django_db
 def test_generate_cache():
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from inspect import Parameter
 from collections import OrderedDict
+import gzip
 import tempfile
 
 import pytest
@@ -197,3 +198,70 @@ def test_non_picklable_does_not_get_cached(logger):
         mock_obj.cached_method(mock_obj, *args, **kw)
     logger.exception.assert_called_with('generate cache_key failed')
     assert mock_obj.echo.call_count == 5
+
+
+def test_method_cache_key():
+    mock_obj = MockModel()
+    key = cache_tools.method_cache_key(
+        MockModel.cached_method, mock_obj, 1, 2, x=3)
+    assert key == cache_tools.cache_key(
+        MockModel.cached_method.__wrapped__, mock_obj, (None, 1, 2), {'x': 3})
+    assert key == cache_tools.method_cache_key(
+        MockModel.cached_method.__wrapped__, mock_obj, 1, 2, x=3)
+
+
+def test_method_cache_key_of_other_model_with_same_id():
+    class OtherModel(MockModel):
+        pass
+
+    mock_obj = MockModel()
+    other_obj = OtherModel()
+    other_obj.id = mock_obj.id
+    assert cache_tools.method_cache_key(
+        MockModel.cached_method, mock_obj, 1) != cache_tools.method_cache_key(
+        MockModel.cached_method, other_obj, 1)
+
+
+@patch.object(cache_tools, 'cache')
+def test_method_cache_many(cache):
+    mock_obj = MockModel()
+    keys = {n: cache_tools.method_cache_key(
+        MockModel.cached_method, mock_obj, n) for n in (1, 2)}
+    cache.get_many.return_value = {keys[1]: 'cached'}
+    compute = Mock(return_value={2: 'computed'})
+    result = cache_tools.method_cache_many(
+        MockModel.cached_method, mock_obj,
+        {1: ((1,), {}), 2: ((2,), {})}, compute)
+    assert result == {1: 'cached', 2: 'computed'}
+    compute.assert_called_once_with([2])
+    # one round trip to look them up and one to store the missing ones
+    assert cache.get_many.call_count == 1
+    cache.set_many.assert_called_once_with(
+        {keys[2]: 'computed'}, MockModel.cached_method.cache_timeout)
+    assert not cache.get.called
+    assert not cache.set.called
+
+
+@patch.object(cache_tools, 'cache', locmem_cache)
+def test_get_or_render():
+    render = Mock(return_value=b'{"a": 1}')
+    key = cache_tools.rendered_cache_key('profile-key')
+    locmem_cache.delete(key)
+    for _ in range(3):
+        assert cache_tools.get_or_render(key, render, can_edit=True) == (
+            b'{"a": 1}', False)
+    assert render.call_count == 1
+
+    # another variant is kept under the same key
+    content, compressed = cache_tools.get_or_render(
+        key, render, compress=True, can_edit=False)
+    assert compressed
+    assert gzip.decompress(content) == b'{"a": 1}'
+    assert render.call_count == 2
+
+    # neither is served once the cache is generated again
+    cache_tools.mark_data_version(cache_tools.CACHE_GENERATION_KEY)
+    key = cache_tools.rendered_cache_key('profile-key')
+    cache_tools.get_or_render(key, render, can_edit=True)
+    cache_tools.get_or_render(key, render, can_edit=False)
+    assert render.call_count == 4
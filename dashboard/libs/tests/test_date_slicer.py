@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+from itertools import product
+
+import pandas
+import pytest
+
+from dashboard.libs.date_slicer import (
+    date_range, rollback, rollforward, Frequency)
+
+
+FREQS = ['MS', 'QS', 'AS', 'W-MON', '2QS', '3MS', 'W-FRI', '2W-MON', 'W',
+         '2W']
+
+DATES = [
+    date(2015, 1, 1),
+    date(2015, 1, 31),
+    date(2015, 12, 31),
+    date(2016, 2, 29),
+    date(2016, 4, 4),  # a monday
+    date(2016, 7, 1),
+    date(2016, 10, 15),
+]
+
+
+@pytest.mark.parametrize('freq, start_date, days', product(
+    FREQS, DATES, [0, 1, 6, 30, 91, 400, 1000]))
+def test_date_range_same_as_pandas(freq, start_date, days):
+    end_date = start_date + timedelta(days=days)
+    expected = [ts.date() for ts in pandas.date_range(
+        start_date, end_date, freq=freq)]
+    assert date_range(start_date, end_date, freq) == expected
+
+
+@pytest.mark.parametrize('freq, day', product(FREQS, DATES))
+def test_rollback_and_rollforward_same_as_pandas(freq, day):
+    assert rollback(day, freq) == pandas.date_range(
+        end=day, periods=1, freq=freq)[0].date()
+    assert rollforward(day, freq) == pandas.date_range(
+        start=day, periods=1, freq=freq)[0].date()
+
+
+@pytest.mark.parametrize('freq', ['D', 'M', 'W-', 'W-FOO', 'QS-JAN', 'xMS'])
+def test_unsupported_frequency(freq):
+    with pytest.raises(ValueError):
+        Frequency(freq)
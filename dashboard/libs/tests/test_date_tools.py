@@ -1,12 +1,14 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
 from dateutil.rrule import MONTHLY, YEARLY
+from hypothesis import given, strategies as st
 import pytest
 
 from dashboard.libs.date_tools import (
     get_workdays, get_workdays_list, get_bank_holidays, get_overlap,
     parse_date, to_datetime, slice_time_window, dates_between,
-    financial_year_tuple, get_weekly_repeat_time_windows,
+    count_dates_between,
+    financial_year_tuple, financial_year, get_weekly_repeat_time_windows,
     get_weekday)
 
 
@@ -152,6 +154,34 @@ def test_slice_on_date(start_date, end_date, freq, bymonthday, expected):
     assert dates == expected
 
 
+dates = st.dates(min_value=date(2000, 1, 1), max_value=date(2030, 12, 31))
+
+
+@given(dates, st.integers(min_value=0, max_value=1000), st.integers(1, 31))
+def test_count_monthly_dates_between(start_date, days, monthday):
+    end_date = start_date + timedelta(days=days)
+    expected = len(dates_between(
+        start_date, end_date, MONTHLY, bymonthday=monthday))
+    assert count_dates_between(
+        start_date, end_date, MONTHLY, bymonthday=monthday) == expected
+
+
+@given(dates, st.integers(min_value=0, max_value=3000), st.integers(1, 366))
+def test_count_yearly_dates_between(start_date, days, yearday):
+    end_date = start_date + timedelta(days=days)
+    expected = len(dates_between(
+        start_date, end_date, YEARLY, byyearday=yearday))
+    assert count_dates_between(
+        start_date, end_date, YEARLY, byyearday=yearday) == expected
+
+
+@given(dates, st.integers(min_value=1, max_value=1000))
+def test_count_dates_between_backwards(end_date, days):
+    start_date = end_date + timedelta(days=days)
+    assert count_dates_between(
+        start_date, end_date, MONTHLY, bymonthday=start_date.day) == 0
+
+
 @pytest.mark.parametrize("year, expected", [
     [2014, (date(2014, 4, 6), date(2015, 4, 5))],
     [2999, (date(2999, 4, 6), date(3000, 4, 5))],
@@ -160,6 +190,16 @@ def test_financial_year_tuple(year, expected):
     assert financial_year_tuple(year) == expected
 
 
+@pytest.mark.parametrize("day, expected", [
+    [date(2016, 4, 5), 2015],
+    [date(2016, 4, 6), 2016],
+    [date(2016, 12, 31), 2016],
+    [date(2017, 1, 1), 2016],
+])
+def test_financial_year(day, expected):
+    assert financial_year(day) == expected
+
+
 @pytest.mark.parametrize("start_date, end_date, repeat_end, expected", [
    ('2017-04-24', '2017-04-24', '2017-04-24', [
        ('2017-04-24', '2017-04-24')
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import json
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.urlresolvers import reverse
+from django.test import Client, override_settings
+import pytest
+
+from dashboard.libs import cache_tools, instrumentation
+from dashboard.libs.tests.test_cache_tools import MockModel
+
+INSTRUMENTED_MIDDLEWARE = [
+    'dashboard.libs.instrumentation.InstrumentationMiddleware',
+] + settings.MIDDLEWARE_CLASSES
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert instrumentation.percentile(values, 50) == 50
+    assert instrumentation.percentile(values, 95) == 95
+    assert instrumentation.percentile([3], 95) == 3
+    assert instrumentation.percentile([], 50) is None
+
+
+@patch.object(cache_tools, 'cache', caches['caching-test'])
+def test_record_method_cache():
+    caches['caching-test'].clear()
+    instrumentation._local.measurement = instrumentation.Measurement()
+    try:
+        obj = MockModel()
+        obj.cached_method(1)
+        obj.cached_method(1)
+        with instrumentation.timer('work'):
+            pass
+        measurement = instrumentation.current()
+    finally:
+        instrumentation._local.measurement = None
+    assert measurement.cache == {'hits': 1, 'misses': 1}
+    assert measurement.method_cache['MockModel.cached_method'] == {
+        'hits': 1, 'misses': 1}
+    assert measurement.timings['work'] >= 0
+
+
+@pytest.mark.django_db
+@override_settings(MIDDLEWARE_CLASSES=INSTRUMENTED_MIDDLEWARE)
+def test_instrumentation_middleware():
+    User.objects.create_superuser('admin', 'admin@example.com', 'Admin123')
+    client = Client()
+    client.login(username='admin', password='Admin123')
+    with patch.object(instrumentation.logger, 'info') as log:
+        rsp = client.get(reverse('services_json'))
+    assert rsp.status_code == 200
+    timing = rsp['Server-Timing']
+    assert timing.startswith('total;dur=')
+    assert 'queries' in timing
+    logged = json.loads(log.call_args[0][0])
+    assert logged['route'] == 'services_json'
+    assert logged['queries'] > 0
+
+    rsp = client.get(reverse('instrumentation_json'))
+    routes = json.loads(rsp.content.decode('utf-8'))['routes']
+    assert routes['services_json']['count'] >= 1
+    assert routes['services_json']['p95'] >= routes['services_json']['p50']
+
+
+@pytest.mark.django_db
+@override_settings(MIDDLEWARE_CLASSES=INSTRUMENTED_MIDDLEWARE)
+def test_instrumentation_of_api_views():
+    User.objects.create_superuser('admin', 'admin@example.com', 'Admin123')
+    client = Client()
+    client.login(username='admin', password='Admin123')
+    with patch.object(instrumentation.logger, 'info') as log:
+        rsp = client.get(reverse('skill-list'), HTTP_ACCEPT='application/json')
+    assert rsp.status_code == 200
+    assert 'serialise;dur=' in rsp['Server-Timing']
+    assert 'serialise' in json.loads(log.call_args[0][0])['timings_ms']
+
+    with patch.object(instrumentation.logger, 'info') as log:
+        for path in ['/no-such-page', '/nor-this-one']:
+            client.get(path)
+    assert json.loads(log.call_args[0][0])['route'] == '<unresolved>'
+    routes = instrumentation.route_stats()
+    assert '/no-such-page' not in routes
+    assert routes['<unresolved>']['count'] >= 2
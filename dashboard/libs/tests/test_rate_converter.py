@@ -5,7 +5,7 @@ from unittest.mock import patch
 
 import pytest
 
-from ..rate_converter import RateConverter, RATE_TYPES
+from ..rate_converter import RateConverter, RATE_TYPES, weighted_average
 
 DAY = RATE_TYPES.DAY
 MONTH = RATE_TYPES.MONTH
@@ -78,3 +78,48 @@ def test_cross_month_average(start_date, end_date, rate, rate_type, expected):
     assert converter.rate_between(
         start_date=date(*start_date),
         end_date=date(*end_date)) == Decimal(expected)
+
+
+@pytest.mark.parametrize('rates_and_weights, expected', [
+    ([('230', 20)], '230.00'),
+    ([('230', 20), ('219.05', 0)], '230.00'),
+    ([('1282.25', 1), ('1115', 1)], '1198.62'),  # half a penny
+    ([('100', 1), ('200', 2)], '166.67'),
+    ([('230', 0)], None),
+    ([], None),
+])
+def test_weighted_average(rates_and_weights, expected):
+    average = weighted_average(
+        (Decimal(rate), weight) for rate, weight in rates_and_weights)
+    assert average == (expected and Decimal(expected))
+
+
+@pytest.mark.parametrize('start_date, end_date, rate, rate_type, expected', [
+    # exact half pennies, rounded half to even. the float average used
+    # before gave 379.57, 830.73, 1950.97, 2720.93, 395.71, 304.69 and
+    # 957.03
+    ((2015, 2, 25), (2015, 4, 6), '7953', MONTH, '379.58'),
+    ((2014, 3, 21), (2014, 4, 30), '16779', MONTH, '830.72'),
+    ((2014, 11, 13), (2014, 12, 23), '40365', MONTH, '1950.98'),
+    ((2015, 7, 4), (2015, 8, 13), '57546', MONTH, '2720.92'),
+    ((2017, 1, 15), (2017, 2, 24), '8029', MONTH, '395.72'),
+    ((2016, 10, 20), (2017, 1, 28), '76923', YEAR, '304.70'),
+    ((2014, 2, 6), (2014, 5, 17), '19348', MONTH, '957.04'),
+])
+def test_half_penny_average(start_date, end_date, rate, rate_type, expected):
+    converter = RateConverter(Decimal(rate), rate_type)
+
+    assert converter.rate_between(
+        start_date=date(*start_date),
+        end_date=date(*end_date)) == Decimal(expected)
+
+
+@pytest.mark.parametrize('start_date, end_date', [
+    ((2016, 1, 30), (2016, 1, 31)),  # weekend
+    ((2016, 8, 27), (2016, 8, 29)),  # weekend and bank holiday
+])
+def test_no_workdays_average(start_date, end_date):
+    converter = RateConverter(Decimal('4600'), MONTH)
+
+    assert converter.rate_between(
+        start_date=date(*start_date), end_date=date(*end_date)) is None
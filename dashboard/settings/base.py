@@ -52,12 +52,28 @@ FLOAT_TASK_SYNC_START_FROM_DAYS_PRIOR_TO_TODAY = 90
 # default number of weeks
 DEFAULT_TASK_SYNC_WEEKS = 104
 
+# the rendered json of the product, product group and service area
+# profiles is cached for as long as the profiles themselves.
+# gzip it in the cache to use less memory in redis.
+JSON_RESPONSE_CACHE_TIMEOUT = 24 * 60 * 60
+JSON_RESPONSE_CACHE_GZIP = True
+
 
 # Build paths inside the product like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 location = lambda x: os.path.abspath(os.path.join(
     os.path.dirname(os.path.realpath(__file__)), '..', x))
 
+# large spreadsheets are rendered by celery into the export storage.
+# an identical export requested again within the reuse period is
+# served from the file already generated.
+EXPORT_STORAGE = 'django.core.files.storage.FileSystemStorage'
+EXPORT_STORAGE_OPTIONS = {'location': location('../var/exports')}
+EXPORT_JOB_REUSE_SECONDS = 10 * 60
+# a job running for longer is taken as failed and not reused
+EXPORT_JOB_TIMEOUT_SECONDS = 30 * 60
+
+
 sys.path.insert(0, location('apps'))
 
 
@@ -123,6 +139,14 @@ MIDDLEWARE_CLASSES = [
 
 ]
 
+# opt in timing and query count of requests, see dashboard.libs.instrumentation
+if os.environ.get('INSTRUMENTATION', 'False') == 'True':
+    MIDDLEWARE_CLASSES = [
+        'dashboard.libs.instrumentation.InstrumentationMiddleware',
+    ] + MIDDLEWARE_CLASSES
+# number of the latest requests of each route kept for the percentiles
+INSTRUMENTATION_SAMPLES = 1000
+
 ROOT_URLCONF = 'dashboard.urls'
 
 TEMPLATES = [
@@ -258,6 +282,11 @@ LOGGING = {
             'handlers': ['console', 'file'],
             'level': 'INFO'
         },
+        'instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False
+        },
         'command': {
             'handlers': ['command'],
             'level': 'INFO'
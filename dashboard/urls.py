@@ -24,7 +24,8 @@ from dashboard.apps.dashboard.views import (
     service_html, service_json, product_html, product_json,
     product_group_json, product_group_html, portfolio_html, services_json,
     sync_from_float, PersonViewSet, PersonProductListView,
-    DepartmentViewSet, SkillViewSet, products_spreadsheet)
+    DepartmentViewSet, SkillViewSet, products_spreadsheet, export_job_html,
+    export_job_json, export_job_download, instrumentation_json)
 
 
 schema_view = get_swagger_view(title='Product Dashboard')
@@ -35,6 +36,9 @@ urlpatterns = [
     url(r'^services/(?P<id>[0-9]+)?$', service_html, name='service_html'),
     url(r'^products/export/(?P<show>[all|visible|0-9]+)?/$',
         products_spreadsheet, name='products_spreadsheet'),
+    url(r'^exports/(?P<id>[0-9]+)/$', export_job_html, name='export_job'),
+    url(r'^exports/(?P<id>[0-9]+)/download$', export_job_download,
+        name='export_job_download'),
     url(r'^products/(?P<id>[0-9]+)?$', product_html, name='product_html'),
     url(r'^product-groups/(?P<id>[0-9]+)?$', product_group_html,
         name='product_group'),
@@ -44,6 +48,8 @@ urlpatterns = [
         name='ping_json'),
     url(r'^healthcheck.json$', HealthcheckView.as_view(),
         name='healthcheck_json'),
+    url(r'^instrumentation.json$', instrumentation_json,
+        name='instrumentation_json'),
     url(r'^login/$', 'django.contrib.auth.views.login', {'template': 'login.html'}),
     url(r'^logout/$', 'django.contrib.auth.views.logout',
         {'next_page': '/'}),
@@ -69,6 +75,8 @@ apis = [
     url(r'^api/services/(?P<id>[0-9]+)?$', service_json, name='service_json'),
 
     url(r'^api/actions/sync$', sync_from_float, name='sync'),
+    url(r'^api/exports/(?P<id>[0-9]+)$', export_job_json,
+        name='export_job_json'),
     url(r'^api/docs', schema_view),
 ]
 